@@ -0,0 +1,119 @@
+try:
+    import unreal
+    _HAS_UNREAL = True
+except Exception:
+    unreal = None
+    _HAS_UNREAL = False
+import VmdSkeletonInfo
+import VmdTrace
+
+
+def mesh_skeleton(skeletal_mesh):
+    try:
+        return skeletal_mesh.get_editor_property("skeleton")
+    except Exception:
+        return None
+
+
+def mesh_morph_target_names(skeletal_mesh) -> set:
+    info = VmdSkeletonInfo.skeleton_info(skeletal_mesh)
+    return set(info.morph_target_names) if info is not None else set()
+
+
+def mesh_bone_names(skeletal_mesh):
+    # メッシュのボーン名。取れなければ None
+    info = VmdSkeletonInfo.skeleton_info(skeletal_mesh)
+    if info is None or not info.bone_names:
+        return None
+    return set(info.bone_names)
+
+
+def asset_label(asset) -> str:
+    try:
+        return asset.get_name()
+    except Exception:
+        return str(asset)
+
+
+def unique_asset_name(folder: str, base_name: str, suffix: str = "_Anim") -> str:
+    asset_name = f"{base_name}{suffix}"
+    if unreal.EditorAssetLibrary.does_asset_exist(f"{folder}/{asset_name}"):
+        i = 1
+        while True:
+            asset_name = f"{base_name}{suffix}_{i:02d}"
+            if not unreal.EditorAssetLibrary.does_asset_exist(f"{folder}/{asset_name}"):
+                break
+            i += 1
+    return asset_name
+
+
+def create_anim_sequence(folder: str, base_name: str, skeleton, skeletal_mesh):
+    # <base_name>_Anim (既にあれば _01, _02 ...) を作る。作れなければ None
+    asset_name = unique_asset_name(folder, base_name)
+
+    factory = unreal.AnimSequenceFactory()
+    try:
+        factory.target_skeleton = skeleton
+    except Exception:
+        try:
+            factory.set_editor_property("target_skeleton", skeleton)
+        except Exception:
+            pass
+    try:
+        factory.preview_skeletal_mesh = skeletal_mesh
+    except Exception:
+        try:
+            factory.set_editor_property("preview_skeletal_mesh", skeletal_mesh)
+        except Exception:
+            pass
+
+    anim_seq = unreal.AssetToolsHelpers.get_asset_tools().create_asset(
+        asset_name=asset_name,
+        package_path=folder,
+        asset_class=unreal.AnimSequence,
+        factory=factory,
+    )
+    if anim_seq is None:
+        return None
+
+    try:
+        anim_seq.set_editor_property("interpolation", unreal.AnimInterpolationType.LINEAR)
+    except Exception:
+        pass
+    return anim_seq
+
+
+def set_frame_range(ctrl, fps, num_frames: int):
+    try:
+        if float(fps).is_integer():
+            ctrl.set_frame_rate(unreal.FrameRate(int(fps), 1), False)
+        else:
+            ctrl.set_frame_rate(unreal.FrameRate(int(round(float(fps) * 1000)), 1000), False)
+    except Exception:
+        pass
+    try:
+        ctrl.set_number_of_frames(unreal.FrameNumber(num_frames), False)
+    except Exception:
+        try:
+            ctrl.set_number_of_frames(num_frames, False)
+        except Exception:
+            pass
+
+
+def save_assets(assets) -> bool:
+    # まとめて 1 回で保存する。使えない版では 1 つずつ保存する
+    assets = [a for a in assets if a is not None]
+    if not assets:
+        return True
+    with VmdTrace.span("save", assets=len(assets)):
+        try:
+            return bool(unreal.EditorAssetLibrary.save_loaded_assets(assets, False))
+        except Exception:
+            pass
+        ok = True
+        for a in assets:
+            try:
+                unreal.EditorAssetLibrary.save_loaded_asset(a)
+            except Exception:
+                ok = False
+        return ok
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+import uuid
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+import numpy as np
+from VmdReader import cache_dir, _hash_file
+import VmdBaked
+
+# ベイク結果のディスクキャッシュ。
+# キーは VMD の中身のハッシュ + 使うボーンの参照ポーズ位置 + fps + ベイクオプション。
+# 1 エントリ = 1 フォルダで、列ごとに .npy を置き np.load(mmap_mode="r") でそのまま開く。
+CACHE_FORMAT = 1
+PRECISIONS = ("float32", "float16", "int16")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_META = "meta.json"
+_COLUMNS = ("bone_names", "bone_kind", "bone_start", "bone_pos", "bone_rot",
+            "morph_names", "morph_start", "morph_time", "morph_value")
+_Q = 32767.0
+
+_digest_lock = threading.Lock()
+_digests = {}
+
+
+def default_cache_dir() -> str:
+    return cache_dir("bake")
+
+
+def hash_file(path: str) -> str:
+    # 同じセッションで同じファイル (サイズと更新時刻が同じ) は読み直さない
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        d = _digests.get(memo)
+    if d is not None:
+        return d
+    d = _hash_file(path)
+    with _digest_lock:
+        _digests[memo] = d
+    return d
+
+
+def make_key(vmd_digest: str, ref_offsets, fps: float, options=None) -> str:
+    # ref_offsets: {ボーン名: (x, y, z)}。VMD に出てくるボーンの分だけ渡す
+    h = hashlib.sha256()
+    h.update(vmd_digest.encode("ascii"))
+    for name in sorted(ref_offsets or {}):
+        h.update(name.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(struct.pack("<3d", *ref_offsets[name]))
+    h.update(json.dumps({
+        "format": CACHE_FORMAT,
+        "baked": VmdBaked.BAKED_VERSION,
+        "fps": float(fps),
+        "options": options or {},
+    }, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _rows_per_bone(baked):
+    start = np.asarray(baked["bone_start"], dtype=np.int64)
+    return np.diff(start)
+
+
+def _encode(baked: dict, precision: str) -> dict:
+    cols = {k: np.asarray(baked[k]) for k in _COLUMNS}
+    cols["morph_time"] = cols["morph_time"].astype(np.float32)
+    cols["morph_value"] = cols["morph_value"].astype(np.float32)
+    pos = np.asarray(baked["bone_pos"], dtype=np.float64)
+    rot = np.asarray(baked["bone_rot"], dtype=np.float64)
+    if precision == "float16":
+        cols["bone_pos"] = pos.astype(np.float16)
+        cols["bone_rot"] = rot.astype(np.float16)
+    elif precision == "int16":
+        # 位置はボーンごとの範囲で、回転は [-1, 1] を int16 に詰める
+        rows = _rows_per_bone(baked)
+        start = np.asarray(baked["bone_start"], dtype=np.int64)[:-1]
+        if len(rows):
+            lo = np.minimum.reduceat(pos, start, axis=0) if len(pos) else np.zeros((len(rows), 3))
+            hi = np.maximum.reduceat(pos, start, axis=0) if len(pos) else np.zeros((len(rows), 3))
+        else:
+            lo = np.zeros((0, 3))
+            hi = np.zeros((0, 3))
+        scale = (hi - lo) / (2.0 * _Q)
+        scale[scale == 0.0] = 1.0
+        mid = (hi + lo) * 0.5
+        q = np.rint((pos - np.repeat(mid, rows, axis=0)) / np.repeat(scale, rows, axis=0))
+        cols["bone_pos"] = np.clip(q, -_Q, _Q).astype(np.int16)
+        cols["bone_pos_mid"] = mid
+        cols["bone_pos_scale"] = scale
+        cols["bone_rot"] = np.clip(np.rint(rot * _Q), -_Q, _Q).astype(np.int16)
+    else:
+        cols["bone_pos"] = pos.astype(np.float32)
+        cols["bone_rot"] = rot.astype(np.float32)
+    return cols
+
+
+def _decode(cols: dict, precision: str) -> dict:
+    baked = {k: cols[k] for k in _COLUMNS}
+    if precision == "int16":
+        rows = _rows_per_bone(baked)
+        pos = cols["bone_pos"].astype(np.float64)
+        baked["bone_pos"] = (pos * np.repeat(cols["bone_pos_scale"], rows, axis=0)
+                             + np.repeat(cols["bone_pos_mid"], rows, axis=0))
+        baked["bone_rot"] = cols["bone_rot"].astype(np.float64) / _Q
+    return baked
+
+
+class BakeCache:
+    def __init__(self, root: str = None, max_bytes: int = DEFAULT_MAX_BYTES, precision: str = "float32"):
+        self.root = root or default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str):
+        d = self._entry_dir(key)
+        meta_path = os.path.join(d, _META)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if info.get("format") != CACHE_FORMAT:
+                raise ValueError("format")
+            names = list(_COLUMNS)
+            if info["precision"] == "int16":
+                names += ["bone_pos_mid", "bone_pos_scale"]
+            cols = {k: np.load(os.path.join(d, k + ".npy"), mmap_mode="r", allow_pickle=False) for k in names}
+            baked = _decode(cols, info["precision"])
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+        baked["meta"] = info["meta"]
+        try:
+            # 最終アクセス時刻を LRU の順番に使う
+            os.utime(meta_path, None)
+        except Exception:
+            pass
+        with self._lock:
+            self.hits += 1
+        return baked
+
+    def put(self, key: str, baked: dict):
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"不明な精度です: {self.precision}")
+        d = self._entry_dir(key)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            for k, arr in _encode(baked, self.precision).items():
+                np.save(os.path.join(tmp, k + ".npy"), arr, allow_pickle=False)
+            with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+                json.dump({"format": CACHE_FORMAT, "precision": self.precision, "created": time.time(),
+                           "meta": baked["meta"]}, f, ensure_ascii=False)
+            os.makedirs(os.path.dirname(d), exist_ok=True)
+            if os.path.isdir(d):
+                shutil.rmtree(d, ignore_errors=True)
+            os.replace(tmp, d)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+
+    def _entries(self):
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for shard in os.listdir(self.root):
+            sd = os.path.join(self.root, shard)
+            if shard.startswith(".") or not os.path.isdir(sd):
+                continue
+            for key in os.listdir(sd):
+                d = os.path.join(sd, key)
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(d) if e.is_file())
+                    used = os.stat(os.path.join(d, _META)).st_mtime
+                except Exception:
+                    size = 0
+                    used = 0.0
+                out.append((used, size, key, d))
+        return out
+
+    def size(self) -> int:
+        return sum(e[1] for e in self._entries())
+
+    def evict(self, keep: str = None) -> int:
+        # 古く使われたものから消して max_bytes 以下にする。消したエントリ数を返す
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for used, size, key, d in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "bytes": sum(e[1] for e in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_BAKE_CACHE = None
+
+
+def bake_cache() -> BakeCache:
+    global _BAKE_CACHE
+    if _BAKE_CACHE is None:
+        _BAKE_CACHE = BakeCache()
+    return _BAKE_CACHE
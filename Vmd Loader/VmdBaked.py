@@ -0,0 +1,220 @@
+import json
+import math
+import os
+import sys
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+import numpy as np
+from VmdReader import _infer_total_frames
+import VmdAsset
+import VmdBoneLoader
+import VmdMorphLoader
+import VmdTrace
+
+# ベイク済みモーション (.npz) の形式
+#   meta         : JSON 文字列 (version, fps, num_frames, source, header, model, options)
+#   bone_names   : ボーン名 (B,)
+#   bone_kind    : TRACK_CONSTANT / TRACK_ANIMATED (B,)
+#   bone_start   : 各ボーンの行の開始位置 (B + 1,)。定数トラックは 1 行、アニメーションは num_frames 行
+#   bone_pos     : UE 空間の位置 (R, 3)。ref_offsets を渡さなければ参照ポーズの位置は足していない
+#   bone_rot     : UE 空間の回転 (R, 4)
+#   morph_names  : モーフ名 (M,)
+#   morph_start  : 各モーフの行の開始位置 (M + 1,)
+#   morph_time   : 秒 (K,)
+#   morph_value  : 値 (K,)
+BAKED_VERSION = 2
+MMD_FPS = 30.0
+
+
+def baked_frame_count(vmd: dict, fps: float) -> int:
+    # MMD の 30fps で数えた長さを fps で数え直す
+    n30 = _infer_total_frames(vmd)
+    return int(math.floor((n30 - 1) * float(fps) / MMD_FPS + 1e-9)) + 1
+
+
+def bake_motion(vmd: dict, fps: float = MMD_FPS, pos_tolerance=None, angle_tolerance=None,
+                workers: int = 1, executor: str = "thread", source: str = "", ref_offsets=None,
+                bone_names=None, morph_tolerance=None) -> dict:
+    # unreal に触らずにボーンとモーフを全部ベイクし、save_baked で書ける dict を返す。
+    # ref_offsets ({ボーン名: (x, y, z)}) を渡すと参照ポーズの位置を足した状態でベイクする。
+    # bone_names を渡すとそこに含まれるボーンだけをベイクする (メッシュに当たらないものを先に落とす用)。
+    # モーフは同じ値の連続を畳み、全部 0 のカーブは入れない。morph_tolerance を渡すとその誤差以内で更に間引く
+    with VmdTrace.span("bake_motion"):
+        return _bake_motion(vmd, fps, pos_tolerance, angle_tolerance, workers, executor, source, ref_offsets,
+                            bone_names, morph_tolerance)
+
+
+def _bake_motion(vmd, fps, pos_tolerance, angle_tolerance, workers, executor, source, ref_offsets,
+                 bone_names, morph_tolerance) -> dict:
+    fps = float(fps)
+    num_frames = baked_frame_count(vmd, fps)
+    ref_offsets = ref_offsets or {}
+    bones = vmd.get("bones", {}) or {}
+    if bone_names is not None:
+        bone_names = set(bone_names)
+        bones = {bn: bones[bn] for bn in bones.keys() if bn in bone_names}
+    with VmdTrace.span("classify"):
+        classified = VmdBoneLoader.classify_tracks(bones)
+    jobs = [(name, kind, track, ref_offsets.get(name)) for name, (kind, track) in classified.items()
+            if kind != VmdBoneLoader.TRACK_IDENTITY]
+    with VmdTrace.span("bake", tracks=len(jobs), workers=workers):
+        results = VmdBoneLoader.bake_bones(jobs, num_frames, pos_tolerance, angle_tolerance, workers, executor,
+                                           frame_step=MMD_FPS / fps)
+
+    stats = {
+        "tracks": len(jobs),
+        "keys_baked": 0,
+        "keys_sent": 0,
+        "collapsed_tracks": 0,
+        VmdBoneLoader.TRACK_IDENTITY: 0,
+        VmdBoneLoader.TRACK_CONSTANT: 0,
+        VmdBoneLoader.TRACK_ANIMATED: 0,
+    }
+    for kind, _ in classified.values():
+        stats[kind] += 1
+    bone_names = []
+    bone_kind = []
+    bone_start = [0]
+    pos_blocks = []
+    rot_blocks = []
+    for (name, kind, _, _), (baked_p, baked_q, sent, collapsed) in zip(jobs, results):
+        bone_names.append(name)
+        bone_kind.append(VmdBoneLoader.TRACK_CONSTANT if collapsed else kind)
+        pos_blocks.append(np.asarray(baked_p, dtype=np.float64).reshape(-1, 3))
+        rot_blocks.append(np.asarray(baked_q, dtype=np.float64).reshape(-1, 4))
+        bone_start.append(bone_start[-1] + len(pos_blocks[-1]))
+        stats["keys_baked"] += num_frames if kind == VmdBoneLoader.TRACK_ANIMATED else 1
+        stats["keys_sent"] += sent
+        if collapsed:
+            stats["collapsed_tracks"] += 1
+
+    stats["morph_keys_in"] = 0
+    stats["zero_curves"] = 0
+    morph_names = []
+    morph_start = [0]
+    times = []
+    values = []
+    morphs = vmd.get("morphs", {}) or {}
+    with VmdTrace.span("morphs"):
+        for name in vmd.get("morph_order") or list(morphs.keys()):
+            keys = morphs.get(name)
+            if not name or not keys:
+                continue
+            # モーフのキーは MMD のフレーム位置のまま秒にする (出力 fps に合わせて打ち直さない)
+            t, v = VmdMorphLoader.bake_morph_curve(keys, MMD_FPS)
+            stats["morph_keys_in"] += len(t)
+            prepared = VmdMorphLoader.prepare_morph_curve(t, v, morph_tolerance)
+            if prepared is None:
+                stats["zero_curves"] += 1
+                continue
+            morph_names.append(name)
+            times.extend(prepared[0])
+            values.extend(prepared[1])
+            morph_start.append(len(times))
+    stats["morph_keys_out"] = len(times)
+
+    meta = {
+        "version": BAKED_VERSION,
+        "fps": fps,
+        "num_frames": num_frames,
+        "source": source,
+        "header": vmd.get("header", ""),
+        "model": vmd.get("model", ""),
+        "options": {"pos_tolerance": pos_tolerance, "angle_tolerance": angle_tolerance,
+                    "morph_tolerance": morph_tolerance},
+        "identity_bones": [name for name, (kind, _) in classified.items()
+                           if kind == VmdBoneLoader.TRACK_IDENTITY],
+        "stats": stats,
+    }
+    return {
+        "meta": meta,
+        "bone_names": np.array(bone_names, dtype=str),
+        "bone_kind": np.array(bone_kind, dtype=str),
+        "bone_start": np.array(bone_start, dtype=np.int64),
+        "bone_pos": np.concatenate(pos_blocks) if pos_blocks else np.zeros((0, 3), dtype=np.float64),
+        "bone_rot": np.concatenate(rot_blocks) if rot_blocks else np.zeros((0, 4), dtype=np.float64),
+        "morph_names": np.array(morph_names, dtype=str),
+        "morph_start": np.array(morph_start, dtype=np.int64),
+        "morph_time": np.array(times, dtype=np.float64),
+        "morph_value": np.array(values, dtype=np.float64),
+    }
+
+
+# ファイルには float32 で書く
+_FLOAT_COLUMNS = ("bone_pos", "bone_rot", "morph_time", "morph_value")
+
+
+def save_baked(path: str, baked: dict):
+    arrays = dict(baked)
+    for k in _FLOAT_COLUMNS:
+        arrays[k] = np.asarray(arrays[k], dtype=np.float32)
+    arrays["meta"] = np.array(json.dumps(baked["meta"], ensure_ascii=False))
+    d = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(d):
+        os.makedirs(d, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load_baked(path: str) -> dict:
+    with np.load(path, allow_pickle=False) as z:
+        baked = {k: z[k] for k in z.files}
+    baked["meta"] = json.loads(str(baked["meta"]))
+    if int(baked["meta"].get("version", 0)) != BAKED_VERSION:
+        raise ValueError(f"ベイク済みファイルの形式が違います: {path}")
+    return baked
+
+
+def with_ref_offsets(baked: dict, ref_offsets) -> dict:
+    # 参照ポーズの位置を足したコピーを返す。位置の差は一定なので、定数化の判定はベイク時のままでよい
+    rows = np.diff(np.asarray(baked["bone_start"], dtype=np.int64))
+    off = np.array([ref_offsets.get(str(n), (0.0, 0.0, 0.0)) for n in baked["bone_names"]],
+                   dtype=np.float64).reshape(-1, 3)
+    out = dict(baked)
+    out["bone_pos"] = np.asarray(baked["bone_pos"], dtype=np.float64) + np.repeat(off, rows, axis=0)
+    return out
+
+
+def iter_bone_tracks(baked: dict):
+    # (ボーン名, 位置 (K, 3), 回転 (K, 4))
+    start = baked["bone_start"]
+    for i, name in enumerate(baked["bone_names"]):
+        a = int(start[i])
+        b = int(start[i + 1])
+        yield str(name), baked["bone_pos"][a:b], baked["bone_rot"][a:b]
+
+
+def iter_morph_curves(baked: dict):
+    # (モーフ名, 秒 (K,), 値 (K,))
+    start = baked["morph_start"]
+    for i, name in enumerate(baked["morph_names"]):
+        a = int(start[i])
+        b = int(start[i + 1])
+        yield str(name), baked["morph_time"][a:b], baked["morph_value"][a:b]
+
+
+def apply_baked(ctrl, baked, skeletal_mesh=None, skeleton=None, morph_target_names=None) -> dict:
+    # エディタ側。ベイク済みモーション (パスか load_baked の dict) を 1 回のブラケットで AnimSequence に流し込む
+    if isinstance(baked, str):
+        baked = load_baked(baked)
+    meta = baked["meta"]
+    fps = meta["fps"]
+    num_frames = int(meta["num_frames"])
+    stats = {"tracks": 0, "curves": 0}
+    ctrl.open_bracket("VMDベイク済み取り込み", False)
+    try:
+        VmdAsset.set_frame_range(ctrl, fps, num_frames)
+        stats["tracks"] = VmdBoneLoader.apply_baked_bones(ctrl, iter_bone_tracks(baked), skeletal_mesh)
+        if skeleton is not None and morph_target_names:
+            stats["curves"] = VmdMorphLoader.apply_baked_morphs(
+                ctrl, iter_morph_curves(baked), skeleton, morph_target_names)
+    finally:
+        try:
+            ctrl.close_bracket(False)
+        except Exception:
+            pass
+    return stats
@@ -0,0 +1,153 @@
+import os
+import sys
+from collections import namedtuple
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+try:
+    import unreal
+    _HAS_UNREAL = True
+except Exception:
+    unreal = None
+    _HAS_UNREAL = False
+from VmdReader import VmdReader, VmdReadCancelled, _check_cancel
+import VmdAsset
+import VmdBaked
+import VmdBoneLoader
+import VmdMorphLoader
+import VmdTrace
+
+# 複数の VMD を複数のメッシュに一括で取り込む。
+# VMD は 1 回だけ解析・ベイクし、メッシュごとには参照ポーズの位置を足すだけにする。
+# アセットは 1 つのトランザクションの中で作り、最後にまとめて保存する。
+
+BatchResult = namedtuple("BatchResult", ["vmd_path", "mesh", "asset", "error"])
+
+
+def collect_vmd_files(paths) -> list:
+    # フォルダはその直下の .vmd に展開する。重複は除く
+    files = []
+    seen = set()
+    for p in paths:
+        if os.path.isdir(p):
+            names = [os.path.join(p, n) for n in sorted(os.listdir(p)) if n.lower().endswith(".vmd")]
+        else:
+            names = [p]
+        for n in names:
+            key = os.path.normcase(os.path.abspath(n))
+            if key not in seen:
+                seen.add(key)
+                files.append(n)
+    return files
+
+
+class _MeshTarget:
+    # メッシュごとに 1 回だけ調べるもの (スケルトン、モーフ名)。参照ポーズは VmdSkeletonInfo のキャッシュから引く
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.skeleton = VmdAsset.mesh_skeleton(mesh)
+        self.morph_target_names = VmdAsset.mesh_morph_target_names(mesh)
+        self.label = VmdAsset.asset_label(mesh)
+
+    def ref_offsets(self, bone_names) -> dict:
+        return VmdBoneLoader.ref_pose_offsets(self.mesh, bone_names)
+
+    def bone_names(self, vmd_bone_names, report: bool = True):
+        # {VMD のボーン名: メッシュのボーン名}。ボーン表が取れなければ None
+        return VmdBoneLoader.resolve_bone_names(self.mesh, vmd_bone_names, report)
+
+
+def run_batch(vmd_paths, meshes, folder: str, fps=30, pos_tolerance=None, angle_tolerance=None,
+              workers: int = 1, progress=None, cancel=None, parse_cache=None, item_done=None,
+              morph_tolerance=None) -> list:
+    # progress(完了数, 全体数, 説明) を各アイテムの前後で、item_done(BatchResult) を各アイテムの後で呼ぶ。
+    # 失敗したアイテムは error に理由を入れて続ける。cancel されたらそこまでに作ったものを保存して返す
+    folder = folder or "/Game"
+    targets = [_MeshTarget(m) for m in meshes]
+    targets = [t for t in targets if t.skeleton is not None]
+    total = len(vmd_paths) * len(targets)
+    done = 0
+    results = []
+    created = []
+
+    def report(label):
+        if progress is not None:
+            progress(done, total, label)
+
+    with unreal.ScopedEditorTransaction("VMD一括インポート"):
+        try:
+            for vmd_path in vmd_paths:
+                _check_cancel(cancel)
+                base_name = os.path.splitext(os.path.basename(vmd_path))[0]
+                report(f"ベイク中: {base_name}")
+                try:
+                    with VmdTrace.span("vmd", file=base_name), \
+                            VmdReader.open(vmd_path, cancel=cancel, cache=parse_cache) as vmd:
+                        # どのメッシュにも当たらないボーンはベイクしない
+                        names = [t.bone_names(list(vmd.get("bones", {}).keys())) for t in targets]
+                        keep = None
+                        if names and all(n is not None for n in names):
+                            keep = set().union(*names)
+                        baked = VmdBaked.bake_motion(vmd, fps, pos_tolerance, angle_tolerance, workers=workers,
+                                                     source=vmd_path, bone_names=keep,
+                                                     morph_tolerance=morph_tolerance)
+                except VmdReadCancelled:
+                    raise
+                except Exception as e:
+                    for t in targets:
+                        results.append(BatchResult(vmd_path, t.mesh, None, str(e)))
+                        done += 1
+                        if item_done is not None:
+                            item_done(results[-1])
+                    report(f"失敗: {base_name}")
+                    continue
+
+                bone_names = [str(n) for n in baked["bone_names"]]
+                for t in targets:
+                    _check_cancel(cancel)
+                    report(f"{base_name} → {t.label}")
+                    name = base_name if len(targets) == 1 else f"{base_name}_{t.label}"
+                    try:
+                        with VmdTrace.span("mesh", file=base_name, mesh=t.label):
+                            asset = _apply_to_mesh(baked, t, bone_names, folder, name)
+                        error = None if asset is not None else "アセットを作成できませんでした"
+                    except Exception as e:
+                        asset = None
+                        error = str(e)
+                    if asset is not None:
+                        created.append(asset)
+                    results.append(BatchResult(vmd_path, t.mesh, asset, error))
+                    done += 1
+                    if item_done is not None:
+                        item_done(results[-1])
+                    report(f"{base_name} → {t.label}")
+        except VmdReadCancelled:
+            pass
+
+    VmdAsset.save_assets(created)
+    return results
+
+
+def _apply_to_mesh(baked, target: _MeshTarget, bone_names, folder: str, name: str):
+    with VmdTrace.span("create_asset"):
+        anim_seq = VmdAsset.create_anim_sequence(folder, name, target.skeleton, target.mesh)
+    if anim_seq is None:
+        return None
+    shifted = VmdBaked.with_ref_offsets(baked, target.ref_offsets(bone_names))
+    ctrl = anim_seq.get_editor_property("controller")
+    ctrl.open_bracket("VMD一括取り込み", False)
+    try:
+        VmdAsset.set_frame_range(ctrl, baked["meta"]["fps"], int(baked["meta"]["num_frames"]))
+        VmdBoneLoader.apply_baked_bones(ctrl, VmdBaked.iter_bone_tracks(shifted),
+                                        names=target.bone_names(bone_names, report=False))
+        VmdMorphLoader.apply_baked_morphs(
+            ctrl, VmdBaked.iter_morph_curves(baked), target.skeleton, target.morph_target_names)
+    finally:
+        try:
+            ctrl.close_bracket(False)
+        except Exception:
+            pass
+    return anim_seq
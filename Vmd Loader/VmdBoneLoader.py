@@ -2,106 +2,103 @@ import os
 import struct
 import sys
 import math
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 try:
     import unreal
     _HAS_UNREAL = True
 except Exception:
     unreal = None
     _HAS_UNREAL = False
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    np = None
+    _HAS_NUMPY = False
+import VmdEngine
+import VmdNameMap
+import VmdSkeletonInfo
+import VmdTrace
 
 def _pos_mmd_to_ue(pos):
     return (float(pos[0]) * 10.0, -float(pos[2]) * 10.0, float(pos[1]) * 10.0)
 
 
-def _mat3_mul(a, b):
-    return [
-        [
-            a[0][0] * b[0][0] + a[0][1] * b[1][0] + a[0][2] * b[2][0],
-            a[0][0] * b[0][1] + a[0][1] * b[1][1] + a[0][2] * b[2][1],
-            a[0][0] * b[0][2] + a[0][1] * b[1][2] + a[0][2] * b[2][2],
-        ],
-        [
-            a[1][0] * b[0][0] + a[1][1] * b[1][0] + a[1][2] * b[2][0],
-            a[1][0] * b[0][1] + a[1][1] * b[1][1] + a[1][2] * b[2][1],
-            a[1][0] * b[0][2] + a[1][1] * b[1][2] + a[1][2] * b[2][2],
-        ],
-        [
-            a[2][0] * b[0][0] + a[2][1] * b[1][0] + a[2][2] * b[2][0],
-            a[2][0] * b[0][1] + a[2][1] * b[1][1] + a[2][2] * b[2][1],
-            a[2][0] * b[0][2] + a[2][1] * b[1][2] + a[2][2] * b[2][2],
-        ],
-    ]
-
-
-def _mat3_transpose(a):
-    return [
-        [a[0][0], a[1][0], a[2][0]],
-        [a[0][1], a[1][1], a[2][1]],
-        [a[0][2], a[1][2], a[2][2]],
-    ]
-
-
-def _quat_to_mat3(q):
-    x, y, z, w = q
-    xx = x * x
-    yy = y * y
-    zz = z * z
-    xy = x * y
-    xz = x * z
-    yz = y * z
-    wx = w * x
-    wy = w * y
-    wz = w * z
-    return [
-        [1 - 2 * (yy + zz), 2 * (xy - wz), 2 * (xz + wy)],
-        [2 * (xy + wz), 1 - 2 * (xx + zz), 2 * (yz - wx)],
-        [2 * (xz - wy), 2 * (yz + wx), 1 - 2 * (xx + yy)],
-    ]
-
-
-def _mat3_to_quat(m):
-    tr = m[0][0] + m[1][1] + m[2][2]
-    if tr > 0.0:
-        s = math.sqrt(tr + 1.0) * 2.0
-        w = 0.25 * s
-        x = (m[2][1] - m[1][2]) / s
-        y = (m[0][2] - m[2][0]) / s
-        z = (m[1][0] - m[0][1]) / s
-    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
-        s = math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2]) * 2.0
-        w = (m[2][1] - m[1][2]) / s
-        x = 0.25 * s
-        y = (m[0][1] + m[1][0]) / s
-        z = (m[0][2] + m[2][0]) / s
-    elif m[1][1] > m[2][2]:
-        s = math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2]) * 2.0
-        w = (m[0][2] - m[2][0]) / s
-        x = (m[0][1] + m[1][0]) / s
-        y = 0.25 * s
-        z = (m[1][2] + m[2][1]) / s
-    else:
-        s = math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1]) * 2.0
-        w = (m[1][0] - m[0][1]) / s
-        x = (m[0][2] + m[2][0]) / s
-        y = (m[1][2] + m[2][1]) / s
-        z = 0.25 * s
+def _quat_mmd_to_ue(rot):
+    # 基底変換 B = [[1,0,0],[0,0,-1],[0,1,0]] は回転なので、B R B^T はベクトル部に B を掛けるだけで済む。
+    # 符号は行列経由で変換していた頃と同じく、対角成分から選ばれる成分が正になるように揃える。
+    x, y, z, w = float(rot[0]), -float(rot[2]), float(rot[1]), float(rot[3])
     mag = math.sqrt(x * x + y * y + z * z + w * w)
-    if mag > 0.0:
-        inv = 1.0 / mag
-        return (x * inv, y * inv, z * inv, w * inv)
-    return (0.0, 0.0, 0.0, 1.0)
+    if mag <= 0.0:
+        return (0.0, 0.0, 0.0, 1.0)
+    inv = 1.0 / mag
+    x, y, z, w = x * inv, y * inv, z * inv, w * inv
+    d0 = 1.0 - 2.0 * (y * y + z * z)
+    d1 = 1.0 - 2.0 * (x * x + z * z)
+    d2 = 1.0 - 2.0 * (x * x + y * y)
+    if d0 + d1 + d2 > 0.0:
+        s = w
+    elif d0 > d1 and d0 > d2:
+        s = x
+    elif d1 > d2:
+        s = y
+    else:
+        s = z
+    if s < 0.0:
+        return (-x, -y, -z, -w)
+    return (x, y, z, w)
 
 
-def _quat_mmd_to_ue(rot):
-    B = [
-        [1.0, 0.0, 0.0],
-        [0.0, 0.0, -1.0],
-        [0.0, 1.0, 0.0],
-    ]
-    Bt = _mat3_transpose(B)
-    Rm = _quat_to_mat3((float(rot[0]), float(rot[1]), float(rot[2]), float(rot[3])))
-    Rue = _mat3_mul(_mat3_mul(B, Rm), Bt)
-    return _mat3_to_quat(Rue)
+def _pos_mmd_to_ue_np(pos):
+    pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+    return np.stack([pos[:, 0] * 10.0, -pos[:, 2] * 10.0, pos[:, 1] * 10.0], axis=1)
+
+
+def _quat_mmd_to_ue_np(rot):
+    rot = np.asarray(rot, dtype=np.float64).reshape(-1, 4)
+    q = np.stack([rot[:, 0], -rot[:, 2], rot[:, 1], rot[:, 3]], axis=1)
+    mag = np.sqrt((q * q).sum(axis=1))
+    zero = mag <= 0.0
+    q = q / np.where(zero, 1.0, mag)[:, None]
+    q[zero] = (0.0, 0.0, 0.0, 1.0)
+    x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    d0 = 1.0 - 2.0 * (y * y + z * z)
+    d1 = 1.0 - 2.0 * (x * x + z * z)
+    d2 = 1.0 - 2.0 * (x * x + y * y)
+    s = np.where(d0 + d1 + d2 > 0.0, w,
+                 np.where((d0 > d1) & (d0 > d2), x,
+                          np.where(d1 > d2, y, z)))
+    q[s < 0.0] *= -1.0
+    return q
+
+
+# キーを UE 空間へ一度だけ変換したもの。pos/rot は UE 座標、bezier は元の 16 バイト (無ければ None)。
+# NumPy があるときは frames (n,), pos (n, 3), rot (n, 4), bezier (n, 16) の配列で持ち、
+# 補間パラメータの無いキーは線形 (20, 20, 107, 107) で埋める。
+_BoneTrack = namedtuple("_BoneTrack", ["frames", "pos", "rot", "bezier"])
+
+_LINEAR_BEZIER = bytes([20] * 4 + [20] * 4 + [107] * 4 + [107] * 4)
+
+
+def _prepare_track(keys_sorted) -> _BoneTrack:
+    if _HAS_NUMPY:
+        n = len(keys_sorted)
+        frames = np.fromiter((int(k[0]) for k in keys_sorted), dtype=np.int64, count=n)
+        pos = _pos_mmd_to_ue_np([k[1] for k in keys_sorted])
+        rot = _quat_mmd_to_ue_np([k[2] for k in keys_sorted])
+        raw = []
+        for k in keys_sorted:
+            b = k[3] if len(k) >= 4 else None
+            raw.append(bytes(b[:16]) if b is not None and len(b) >= 16 else _LINEAR_BEZIER)
+        bezier = np.frombuffer(b"".join(raw), dtype=np.uint8).reshape(n, 16)
+        return _BoneTrack(frames, pos, rot, bezier)
+    frames = [int(k[0]) for k in keys_sorted]
+    bezier = [k[3] if len(k) >= 4 else None for k in keys_sorted]
+    pos = [_pos_mmd_to_ue(k[1]) for k in keys_sorted]
+    rot = [_quat_mmd_to_ue(k[2]) for k in keys_sorted]
+    return _BoneTrack(frames, pos, rot, bezier)
 
 
 def _quat_nlerp(a, b, t: float):
@@ -138,6 +135,301 @@ def _interpolate_bezier(x1, y1, x2, y2, x):
     return (3.0 * s * s * t * y1) + (3.0 * s * t * t * y2) + (t * t * t)
 
 
+# _interpolate_bezier_np は x(t) = x をニュートン法 (収束しないものは二分法) で 1e-7 まで解く。
+# _interpolate_bezier の二分法は |x(t) - x| < 1e-4 で打ち切るので、普通の曲線なら差は 1e-3 以内。
+# 端の接線がほぼ垂直な曲線 (x1 や x2 が 0 付近) では旧実装は x = 0 / 1 でも 0 / 1 を返さない
+# (例: (0, 127, 0, 127) の x = 0 で 0.0909)。新しい方はこの端の誤差を合わせずに直しているので、
+# 旧実装との差は最大でこの程度になる (0-127 の格子で測った最大は 0.0909)。
+# 確認: python -m bench accuracy
+BEZIER_NP_TOLERANCE = 0.1
+
+
+def _interpolate_bezier_np(x1, y1, x2, y2, x):
+    x1 = np.asarray(x1, dtype=np.float64)
+    y1 = np.asarray(y1, dtype=np.float64)
+    x2 = np.asarray(x2, dtype=np.float64)
+    y2 = np.asarray(y2, dtype=np.float64)
+    x = np.clip(np.asarray(x, dtype=np.float64), 0.0, 1.0)
+    x1, y1, x2, y2, x = np.broadcast_arrays(x1, y1, x2, y2, x)
+
+    t = x.copy()
+    for _ in range(8):
+        s = 1.0 - t
+        ft = 3.0 * s * s * t * x1 + 3.0 * s * t * t * x2 + t * t * t - x
+        dft = 3.0 * s * s * x1 + 6.0 * s * t * (x2 - x1) + 3.0 * t * t * (1.0 - x2)
+        ok = np.abs(dft) > 1e-6
+        t = np.where(ok, t - ft / np.where(ok, dft, 1.0), t)
+        np.clip(t, 0.0, 1.0, out=t)
+
+    s = 1.0 - t
+    ft = 3.0 * s * s * t * x1 + 3.0 * s * t * t * x2 + t * t * t - x
+    bad = np.abs(ft) > 1e-7
+    if bad.any():
+        bx1 = x1[bad]
+        bx2 = x2[bad]
+        bx = x[bad]
+        lo = np.zeros_like(bx)
+        hi = np.ones_like(bx)
+        for _ in range(30):
+            mid = (lo + hi) * 0.5
+            ms = 1.0 - mid
+            fm = 3.0 * ms * ms * mid * bx1 + 3.0 * ms * mid * mid * bx2 + mid * mid * mid - bx
+            lo = np.where(fm < 0.0, mid, lo)
+            hi = np.where(fm < 0.0, hi, mid)
+        t = t.copy()
+        t[bad] = (lo + hi) * 0.5
+        s = 1.0 - t
+
+    return 3.0 * s * s * t * y1 + 3.0 * s * t * t * y2 + t * t * t
+
+
+def _interpolate_bezier_exact(x1, y1, x2, y2, x):
+    # _interpolate_bezier_np の 1 点版 (同じ手順なので値も同じ)。NumPy が無いときの基準
+    x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else float(x))
+    t = x
+    for _ in range(8):
+        s = 1.0 - t
+        ft = 3.0 * s * s * t * x1 + 3.0 * s * t * t * x2 + t * t * t - x
+        dft = 3.0 * s * s * x1 + 6.0 * s * t * (x2 - x1) + 3.0 * t * t * (1.0 - x2)
+        if abs(dft) > 1e-6:
+            t -= ft / dft
+        t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+    s = 1.0 - t
+    ft = 3.0 * s * s * t * x1 + 3.0 * s * t * t * x2 + t * t * t - x
+    if abs(ft) > 1e-7:
+        lo = 0.0
+        hi = 1.0
+        for _ in range(30):
+            mid = (lo + hi) * 0.5
+            ms = 1.0 - mid
+            if 3.0 * ms * ms * mid * x1 + 3.0 * ms * mid * mid * x2 + mid * mid * mid - x < 0.0:
+                lo = mid
+            else:
+                hi = mid
+        t = (lo + hi) * 0.5
+        s = 1.0 - t
+    return 3.0 * s * s * t * y1 + 3.0 * s * t * t * y2 + t * t * t
+
+
+def _bezier_exact_key(key, x):
+    return _interpolate_bezier_exact(key[0] / 127.0, key[1] / 127.0, key[2] / 127.0, key[3] / 127.0, x)
+
+
+class BezierLutCache:
+    # MMD の補間パラメータは 0-127 に量子化されていて、実際のモーションでは同じ曲線が何千回も使われる。
+    # (x1, y1, x2, y2) のバイト値ごとに y(x) を resolution 等分でサンプルした表を作り、引いて線形補間する。
+    # モジュールごと保持されるので、エディタのセッション中はインポートをまたいで再利用される。
+    # 既定で有効。基準は NumPy の有無に関わらず厳密解 (_interpolate_bezier_np / _interpolate_bezier_exact)。
+    # 端や途中で接線がほぼ垂直な曲線は線形補間だと 1024 等分でも 0.1 ずれる区間があるので、
+    # 区間の中点で厳密解との差が CELL_TOLERANCE を超える区間 (普通は全体の 0.2% ほど) は表を使わず直接解く。
+    # これで厳密解との差は LUT_TOLERANCE 以内 (0-127 の格子で測った最大は 1.8e-4。python -m bench accuracy)
+    CELL_TOLERANCE = 1e-4
+    LUT_TOLERANCE = 2.5e-4
+    # 一括評価でこれより使われない曲線は表を作らずに直接解く (表の作成の方が高くつくため)
+    MIN_BATCH_USES = 64
+
+    def __init__(self, resolution: int = 1024, max_entries: int = 512):
+        self.resolution = max(2, int(resolution))
+        self.max_entries = max(1, int(max_entries))
+        self.enabled = True
+        self.compare_exact = False
+        self.hits = 0
+        self.misses = 0
+        self.max_error = 0.0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, resolution: int = None, max_entries: int = None, enabled: bool = None,
+                  compare_exact: bool = None):
+        if resolution is not None and max(2, int(resolution)) != self.resolution:
+            self.resolution = max(2, int(resolution))
+            self._tables.clear()
+        if max_entries is not None:
+            self.max_entries = max(1, int(max_entries))
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if compare_exact is not None:
+            self.compare_exact = bool(compare_exact)
+
+    def clear(self):
+        self._tables.clear()
+        self.hits = 0
+        self.misses = 0
+        self.max_error = 0.0
+
+    def settings(self) -> dict:
+        # configure() にそのまま渡せる設定 (プロセスプールのワーカーに同じ設定を渡す用)
+        return {"resolution": self.resolution, "max_entries": self.max_entries, "enabled": self.enabled,
+                "compare_exact": self.compare_exact}
+
+    def counters(self):
+        return self.hits, self.misses, self.max_error
+
+    def merge_counters(self, hits: int, misses: int, max_error: float):
+        # ワーカーで数えた分を足す
+        with self._lock:
+            self.hits += int(hits)
+            self.misses += int(misses)
+            self.max_error = max(self.max_error, float(max_error))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._tables),
+            "resolution": self.resolution,
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_error": self.max_error,
+        }
+
+    def table(self, key):
+        with self._lock:
+            tbl = self._tables.get(key)
+            if tbl is not None:
+                self.hits += 1
+                self._tables.move_to_end(key)
+                return tbl
+            self.misses += 1
+        tbl = self._build(key)
+        with self._lock:
+            self._tables[key] = tbl
+            if len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return tbl
+
+    def _build(self, key):
+        # (サンプル (n + 1,), 直接解く区間 (n,))
+        n = self.resolution
+        if _HAS_NUMPY:
+            x1, y1, x2, y2 = (v / 127.0 for v in key)
+            xs = np.arange(n + 1, dtype=np.float64) / float(n)
+            ys = _interpolate_bezier_np(x1, y1, x2, y2, xs)
+            mid = _interpolate_bezier_np(x1, y1, x2, y2, (np.arange(n, dtype=np.float64) + 0.5) / float(n))
+            return ys, np.abs(mid - (ys[:-1] + ys[1:]) * 0.5) > self.CELL_TOLERANCE
+        # NumPy が無いときはサンプルと区間の判定を必要になったところだけ埋める
+        return [None] * (n + 1), [None] * n
+
+    def _sample(self, ys, key, i: int) -> float:
+        y = ys[i]
+        if y is None:
+            y = _bezier_exact_key(key, i / float(self.resolution))
+            ys[i] = y
+        return float(y)
+
+    def evaluate(self, key, x: float) -> float:
+        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else float(x))
+        ys, exact_cells = self.table(key)
+        pos = x * self.resolution
+        i = min(int(pos), self.resolution - 1)
+        frac = pos - i
+        y0 = self._sample(ys, key, i)
+        y1 = self._sample(ys, key, i + 1)
+        direct = exact_cells[i]
+        if direct is None:
+            mid = _bezier_exact_key(key, (i + 0.5) / float(self.resolution))
+            direct = abs(mid - (y0 + y1) * 0.5) > self.CELL_TOLERANCE
+            exact_cells[i] = direct
+        if direct:
+            return _bezier_exact_key(key, x)
+        y = y0 + (y1 - y0) * frac
+        if self.compare_exact:
+            self.max_error = max(self.max_error, abs(_bezier_exact_key(key, x) - y))
+        return y
+
+    def evaluate_np(self, keys, x):
+        # keys: (n, 4) の x1, y1, x2, y2 バイト値、x: (n,)
+        keys = np.asarray(keys, dtype=np.uint32)
+        x = np.clip(np.asarray(x, dtype=np.float64), 0.0, 1.0)
+        if len(x) == 0:
+            return x.copy()
+        codes = keys[:, 0] | (keys[:, 1] << 8) | (keys[:, 2] << 16) | (keys[:, 3] << 24)
+        uniq, inverse, uses = np.unique(codes, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        use_lut = np.zeros(len(uniq), dtype=bool)
+        tables = np.zeros((len(uniq), self.resolution + 1), dtype=np.float64)
+        exact_cells = np.zeros((len(uniq), self.resolution), dtype=bool)
+        for u, c in enumerate(uniq.tolist()):
+            key = (c & 0xFF, (c >> 8) & 0xFF, (c >> 16) & 0xFF, (c >> 24) & 0xFF)
+            # 表を使うかどうかはキャッシュの状態に依らず決める (並列ベイクでも結果が変わらないように)
+            if self.enabled and uses[u] >= self.MIN_BATCH_USES:
+                tables[u], exact_cells[u] = self.table(key)
+                use_lut[u] = True
+
+        y = np.empty_like(x)
+        lut = use_lut[inverse]
+        if lut.any():
+            pos = x[lut] * self.resolution
+            i = np.minimum(pos.astype(np.int64), self.resolution - 1)
+            frac = pos - i
+            rows = inverse[lut]
+            y0 = tables[rows, i]
+            y[lut] = y0 + (tables[rows, i + 1] - y0) * frac
+            # 表では誤差が大きい区間に入ったものは直接解く
+            steep = np.flatnonzero(lut)[exact_cells[rows, i]]
+            lut[steep] = False
+        direct = ~lut
+        k = keys.astype(np.float64) / 127.0
+        if direct.any():
+            kd = k[direct]
+            y[direct] = _interpolate_bezier_np(kd[:, 0], kd[:, 1], kd[:, 2], kd[:, 3], x[direct])
+        if self.compare_exact and lut.any():
+            kl = k[lut]
+            exact = _interpolate_bezier_np(kl[:, 0], kl[:, 1], kl[:, 2], kl[:, 3], x[lut])
+            self.max_error = max(self.max_error, float(np.abs(exact - y[lut]).max()))
+        return y
+
+
+_BEZIER_LUT = BezierLutCache()
+
+
+def bezier_lut_cache() -> BezierLutCache:
+    return _BEZIER_LUT
+
+
+def _bezier_key(bezier16: bytes, kind: int):
+    if not bezier16 or len(bezier16) < 16:
+        return None
+    return (bezier16[kind], bezier16[4 + kind], bezier16[8 + kind], bezier16[12 + kind])
+
+
+def _bezier_weight(bezier16: bytes, kind: int, t: float) -> float:
+    key = _bezier_key(bezier16, kind)
+    if key is None:
+        return t
+    if _BEZIER_LUT.enabled:
+        return _BEZIER_LUT.evaluate(key, t)
+    return _bezier_exact_key(key, t)
+
+
+def _track_bezier_weights(track: _BoneTrack, f):
+    # 最初と最後のキーの間にあるフレーム f の (tx, ty, tz, tr) をまとめて求める
+    frames = track.frames
+    f = np.asarray(f, dtype=np.float64)
+    j = np.searchsorted(frames, f, side="right") - 1
+    f0 = frames[j]
+    f1 = frames[j + 1]
+    t = (f - f0) / (f1 - f0).astype(np.float64)
+
+    seg = j + 1
+    out = np.empty((len(f), 4), dtype=np.float64)
+    for kind in range(4):
+        params = track.bezier[:, [kind, 4 + kind, 8 + kind, 12 + kind]]
+        # x1 == y1 かつ x2 == y2 の曲線は直線なので解く必要がない
+        curved = ((params[:, 0] != params[:, 1]) | (params[:, 2] != params[:, 3]))[seg]
+        w = t.copy()
+        if curved.any():
+            pc = params[seg[curved]]
+            if _BEZIER_LUT.enabled:
+                w[curved] = _BEZIER_LUT.evaluate_np(pc, t[curved])
+            else:
+                pc = pc.astype(np.float64) / 127.0
+                w[curved] = _interpolate_bezier_np(pc[:, 0], pc[:, 1], pc[:, 2], pc[:, 3], t[curved])
+        out[:, kind] = w
+    return out
+
+
 def _bezier_params(bezier16: bytes, kind: int):
     if not bezier16 or len(bezier16) < 16:
         return None
@@ -172,128 +464,459 @@ def _quat_slerp(q0, q1, t):
     return (x0 * s0 + x1 * s1, y0 * s0 + y1 * s1, z0 * s0 + z1 * s1, w0 * s0 + w1 * s1)
 
 
-def apply_bones(ctrl, bones, fps, num_frames, skeletal_mesh=None):
-    ref_pos_map = {}
-    comp = None
-    if unreal is not None and skeletal_mesh is not None:
-        try:
-            comp = unreal.SkeletalMeshComponent()
-        except Exception:
-            comp = None
-    if comp is not None:
-        set_ok = False
-        if hasattr(comp, 'set_skeletal_mesh_asset'):
-            try:
-                comp.set_skeletal_mesh_asset(skeletal_mesh)
-                set_ok = True
-            except Exception:
-                set_ok = False
-        if not set_ok:
-            for prop in ('skeletal_mesh', 'skinned_asset', 'skeletal_mesh_asset', 'SkeletalMesh'):
-                try:
-                    comp.set_editor_property(prop, skeletal_mesh)
-                    set_ok = True
-                    break
-                except Exception:
-                    pass
-        if set_ok:
-            for bn in bones.keys():
-                try:
-                    bi = comp.get_bone_index(bn)
-                except Exception:
-                    bi = -1
-                if bi is None or int(bi) < 0:
-                    continue
-                try:
-                    rp = comp.get_ref_pose_position(int(bi))
-                except Exception:
-                    rp = None
-                if rp is not None:
-                    ref_pos_map[bn] = rp
+def _quat_slerp_np(q0, q1, t):
+    # _quat_slerp の配列版 (半球の反転、dot > 0.9995 での nlerp、sin = 0 の扱いも同じ)
+    t = np.clip(np.asarray(t, dtype=np.float64), 0.0, 1.0)
+    dot = np.einsum("ij,ij->i", q0, q1)
+    q1 = q1 * np.where(dot < 0.0, -1.0, 1.0)[:, None]
+    dot = np.abs(dot)
+    out = np.empty_like(q0)
+
+    near = dot > 0.9995
+    if near.any():
+        a = q0[near]
+        nl = a + (q1[near] - a) * t[near][:, None]
+        mag = np.sqrt(np.einsum("ij,ij->i", nl, nl))
+        ok = mag > 0.0
+        nl[ok] /= mag[ok][:, None]
+        nl[~ok] = (0.0, 0.0, 0.0, 1.0)
+        out[near] = nl
+
+    far = ~near
+    if far.any():
+        d = dot[far]
+        theta_0 = np.arccos(d)
+        sin_theta_0 = np.sin(theta_0)
+        zero = sin_theta_0 == 0.0
+        sin_theta_0[zero] = 1.0
+        theta = theta_0 * t[far]
+        sin_theta = np.sin(theta)
+        s0 = np.cos(theta) - d * sin_theta / sin_theta_0
+        s1 = sin_theta / sin_theta_0
+        s0[zero] = 1.0
+        s1[zero] = 0.0
+        out[far] = q0[far] * s0[:, None] + q1[far] * s1[:, None]
+    return out
+
+
+def _bake_track_np(track: _BoneTrack, num_frames: int, frame_step: float = 1.0):
+    # 全フレームの位置 (N, 3) と回転 (N, 4) を一度に求める。i 番目のサンプルは MMD の i * frame_step フレーム
+    frames = track.frames
+    pos = track.pos
+    rot = track.rot
+    first_f = int(frames[0])
+    last_f = int(frames[-1])
+
+    out_p = np.empty((num_frames, 3), dtype=np.float64)
+    out_q = np.empty((num_frames, 4), dtype=np.float64)
+    # f <= first_f は最初のキー、f >= last_f は最後のキーで埋める (フレームは昇順なので前後の区間になる)
+    if frame_step == 1.0:
+        fs = None
+        lo = min(max(first_f + 1, 0), num_frames)
+        hi = min(max(last_f, lo), num_frames)
+    else:
+        fs = np.arange(num_frames, dtype=np.float64) * frame_step
+        lo = int(np.searchsorted(fs, first_f, side="right"))
+        hi = max(int(np.searchsorted(fs, last_f, side="left")), lo)
+    out_p[:lo] = pos[0]
+    out_q[:lo] = rot[0]
+    out_p[hi:] = pos[-1]
+    out_q[hi:] = rot[-1]
+
+    if hi > lo:
+        fm = np.arange(lo, hi, dtype=np.int64) if fs is None else fs[lo:hi]
+        j = np.searchsorted(frames, fm, side="right") - 1
+        w = _track_bezier_weights(track, fm)
+        p0 = pos[j]
+        # UE の (x, y, z) は MMD の (x, -z, y) なので、補間曲線も x, z, y の順に対応する
+        out_p[lo:hi] = p0 + (pos[j + 1] - p0) * w[:, [0, 2, 1]]
+        out_q[lo:hi] = _quat_slerp_np(rot[j], rot[j + 1], w[:, 3])
+    return out_p, out_q
+
+
+def _bake_track_py(track: _BoneTrack, num_frames: int, frame_step: float = 1.0):
+    frames = track.frames
+    first_f = frames[0]
+    last_f = frames[-1]
+    out_p = []
+    out_q = []
+    j = 0
+    for i in range(num_frames):
+        f = i if frame_step == 1.0 else i * frame_step
+        if f <= first_f:
+            p = track.pos[0]
+            q = track.rot[0]
+        elif f >= last_f:
+            p = track.pos[-1]
+            q = track.rot[-1]
+        else:
+            while j + 1 < len(frames) and frames[j + 1] <= f:
+                j += 1
+            f0 = frames[j]
+            f1 = frames[j + 1]
+            if f1 == f0:
+                p = track.pos[j]
+                q = track.rot[j]
+            else:
+                t = float(f - f0) / float(f1 - f0)
+                bez = track.bezier[j + 1]
+                tx = t
+                ty = t
+                tz = t
+                tr = t
+                if bez is not None:
+                    tx = _bezier_weight(bez, 0, t)
+                    ty = _bezier_weight(bez, 1, t)
+                    tz = _bezier_weight(bez, 2, t)
+                    tr = _bezier_weight(bez, 3, t)
+                # UE の (x, y, z) は MMD の (x, -z, y) なので、補間曲線も x, z, y の順に対応する
+                p0 = track.pos[j]
+                p1 = track.pos[j + 1]
+                p = (
+                    p0[0] + (p1[0] - p0[0]) * tx,
+                    p0[1] + (p1[1] - p0[1]) * tz,
+                    p0[2] + (p1[2] - p0[2]) * ty,
+                )
+                q = _quat_slerp(track.rot[j], track.rot[j + 1], tr)
+        out_p.append(p)
+        out_q.append(q)
+    return out_p, out_q
+
+
+def _is_constant_track(pos, rot, pos_tolerance: float, angle_tolerance: float) -> bool:
+    # 全フレームが先頭フレームから位置は pos_tolerance (cm)、回転は angle_tolerance (度) 以内か
+    cos_half = math.cos(math.radians(angle_tolerance) * 0.5)
+    if _HAS_NUMPY:
+        pos = np.asarray(pos, dtype=np.float64)
+        rot = np.asarray(rot, dtype=np.float64)
+        return bool(np.all(np.linalg.norm(pos - pos[0], axis=1) <= pos_tolerance)
+                    and np.all(np.minimum(np.abs(rot @ rot[0]), 1.0) >= cos_half))
+    p0 = pos[0]
+    q0 = rot[0]
+    for p, q in zip(pos, rot):
+        if math.sqrt(sum((float(p[c]) - float(p0[c])) ** 2 for c in range(3))) > pos_tolerance:
+            return False
+        if min(abs(sum(float(q[c]) * float(q0[c]) for c in range(4))), 1.0) < cos_half:
+            return False
+    return True
+
+
+TRACK_IDENTITY = "identity"
+TRACK_CONSTANT = "constant"
+TRACK_ANIMATED = "animated"
 
+# 分類に使う許容誤差。位置は UE 空間 (cm)、回転は 1 - |dot|
+_CLASSIFY_POS_EPS = 1e-4
+_CLASSIFY_ROT_EPS = 1e-7
+
+
+def classify_track(track: _BoneTrack) -> str:
+    # 全キーが同じなら定数、さらに位置 0 / 回転が単位なら恒等
+    if _HAS_NUMPY:
+        pos = track.pos
+        rot = track.rot
+        constant = bool(
+            np.all(np.abs(pos - pos[0]).max(axis=1) <= _CLASSIFY_POS_EPS)
+            and np.all(1.0 - np.abs(rot @ rot[0]) <= _CLASSIFY_ROT_EPS)
+        )
+        if not constant:
+            return TRACK_ANIMATED
+        if np.abs(pos[0]).max() <= _CLASSIFY_POS_EPS and 1.0 - abs(float(rot[0][3])) <= _CLASSIFY_ROT_EPS:
+            return TRACK_IDENTITY
+        return TRACK_CONSTANT
+
+    p0 = track.pos[0]
+    q0 = track.rot[0]
+    for p, q in zip(track.pos, track.rot):
+        if max(abs(p[c] - p0[c]) for c in range(3)) > _CLASSIFY_POS_EPS:
+            return TRACK_ANIMATED
+        if 1.0 - abs(sum(q[c] * q0[c] for c in range(4))) > _CLASSIFY_ROT_EPS:
+            return TRACK_ANIMATED
+    if max(abs(v) for v in p0) <= _CLASSIFY_POS_EPS and 1.0 - abs(q0[3]) <= _CLASSIFY_ROT_EPS:
+        return TRACK_IDENTITY
+    return TRACK_CONSTANT
+
+
+def classify_tracks(bones) -> dict:
+    # ボーン名 -> (分類, _BoneTrack)。キーの無いボーンは含まない
+    result = {}
     for bone_name, keys in bones.items():
         if not keys:
             continue
-        keys_sorted = sorted(keys, key=lambda x: x[0])
-        add_ok = True
-        try:
-            if hasattr(ctrl, "insert_bone_track"):
-                ctrl.insert_bone_track(bone_name, 0, False)
-            else:
-                ctrl.add_bone_track(bone_name, False)
-        except Exception:
-            add_ok = False
-        if not add_ok:
-            continue
+        track = _prepare_track(sorted(keys, key=lambda x: x[0]))
+        result[bone_name] = (classify_track(track), track)
+    return result
 
-        pos_keys = []
-        rot_keys = []
-        scl_keys = []
-        first_f = int(keys_sorted[0][0])
-        last_f = int(keys_sorted[-1][0])
-
-        j = 0
-        for f in range(num_frames):
-            if f <= first_f:
-                frame, pos, rot = keys_sorted[0][0], keys_sorted[0][1], keys_sorted[0][2]
-                p = _pos_mmd_to_ue(pos)
-                q = _quat_mmd_to_ue(rot)
-            elif f >= last_f:
-                frame, pos, rot = keys_sorted[-1][0], keys_sorted[-1][1], keys_sorted[-1][2]
-                p = _pos_mmd_to_ue(pos)
-                q = _quat_mmd_to_ue(rot)
-            else:
-                while j + 1 < len(keys_sorted) and int(keys_sorted[j + 1][0]) <= f:
-                    j += 1
-                f0, pos0, rot0 = keys_sorted[j][0], keys_sorted[j][1], keys_sorted[j][2]
-                f1, pos1, rot1 = keys_sorted[j + 1][0], keys_sorted[j + 1][1], keys_sorted[j + 1][2]
-                f0 = int(f0)
-                f1 = int(f1)
-                if f1 == f0:
-                    p = _pos_mmd_to_ue(pos0)
-                    q = _quat_mmd_to_ue(rot0)
-                else:
-                    t = float(f - f0) / float(f1 - f0)
-                    bez = None
-                    if len(keys_sorted[j + 1]) >= 4:
-                        bez = keys_sorted[j + 1][3]
-                    tx = t
-                    ty = t
-                    tz = t
-                    tr = t
-                    if bez is not None:
-                        px = _bezier_params(bez, 0)
-                        py = _bezier_params(bez, 1)
-                        pz = _bezier_params(bez, 2)
-                        pr = _bezier_params(bez, 3)
-                        if px is not None:
-                            tx = _interpolate_bezier(px[0], px[1], px[2], px[3], t)
-                        if py is not None:
-                            ty = _interpolate_bezier(py[0], py[1], py[2], py[3], t)
-                        if pz is not None:
-                            tz = _interpolate_bezier(pz[0], pz[1], pz[2], pz[3], t)
-                        if pr is not None:
-                            tr = _interpolate_bezier(pr[0], pr[1], pr[2], pr[3], t)
-                    m0 = pos0
-                    m1 = pos1
-                    pos_mmd = (
-                        float(m0[0]) + (float(m1[0]) - float(m0[0])) * tx,
-                        float(m0[1]) + (float(m1[1]) - float(m0[1])) * ty,
-                        float(m0[2]) + (float(m1[2]) - float(m0[2])) * tz,
-                    )
-                    p = _pos_mmd_to_ue(pos_mmd)
-                    q0 = _quat_mmd_to_ue(rot0)
-                    q1 = _quat_mmd_to_ue(rot1)
-                    q = _quat_slerp(q0, q1, tr)
-
-            if bone_name in ref_pos_map:
-                rp = ref_pos_map[bone_name]
-                p = (p[0] + float(rp.x), p[1] + float(rp.y), p[2] + float(rp.z))
-            pos_keys.append(unreal.Vector(p[0], p[1], p[2]))
-            rot_keys.append(unreal.Quat(q[0], q[1], q[2], q[3]))
-            scl_keys.append(unreal.Vector(1.0, 1.0, 1.0))
-
-        try:
-            ctrl.set_bone_track_keys(bone_name, pos_keys, rot_keys, scl_keys, False)
-        except Exception:
-            continue
+
+def bake_bone(kind: str, track: _BoneTrack, num_frames: int, ref_offset=None,
+              pos_tolerance=None, angle_tolerance=None, frame_step: float = 1.0):
+    # unreal に触らない純粋な計算。(位置 (K, 3), 回転 (K, 4), 送るキー数 K, 1 キーに畳んだか) を返す。
+    # NumPy があれば配列、無ければタプルのリストになる。frame_step は出力 1 フレームあたりの MMD フレーム数 (30 / fps)。
+    if kind == TRACK_CONSTANT:
+        baked_p = [tuple(float(v) for v in track.pos[0])]
+        baked_q = [tuple(float(v) for v in track.rot[0])]
+        if ref_offset is not None:
+            p = baked_p[0]
+            baked_p = [(p[0] + ref_offset[0], p[1] + ref_offset[1], p[2] + ref_offset[2])]
+        if _HAS_NUMPY:
+            baked_p = np.array(baked_p, dtype=np.float64)
+            baked_q = np.array(baked_q, dtype=np.float64)
+        return baked_p, baked_q, 1, False
+
+    if _HAS_NUMPY:
+        baked_p, baked_q = _bake_track_np(track, num_frames, frame_step)
+        if ref_offset is not None:
+            baked_p += ref_offset
+    else:
+        baked_p, baked_q = _bake_track_py(track, num_frames, frame_step)
+        if ref_offset is not None:
+            rx, ry, rz = ref_offset
+            baked_p = [(p[0] + rx, p[1] + ry, p[2] + rz) for p in baked_p]
+
+    if pos_tolerance is None and angle_tolerance is None:
+        return baked_p, baked_q, len(baked_p), False
+    # AnimSequence のボーントラックは等間隔サンプルなので、キー数は 1 (定数) か全フレームしか渡せない。
+    # 許容誤差は 1 キーに畳めるかの判定だけに使う
+    pos_tolerance = 0.01 if pos_tolerance is None else float(pos_tolerance)
+    angle_tolerance = 0.05 if angle_tolerance is None else float(angle_tolerance)
+    if _is_constant_track(baked_p, baked_q, pos_tolerance, angle_tolerance):
+        return baked_p[:1], baked_q[:1], 1, True
+    return baked_p, baked_q, len(baked_p), False
+
+
+def _bake_job(job, num_frames, pos_tolerance, angle_tolerance, frame_step=1.0):
+    name, kind, track, ref_offset = job
+    return bake_bone(kind, track, num_frames, ref_offset, pos_tolerance, angle_tolerance, frame_step)
+
+
+def _init_bake_worker(lut_settings):
+    # プロセスプールのワーカーは新しくモジュールを読み込むので、親の補間テーブルの設定をここで合わせる
+    _BEZIER_LUT.configure(**lut_settings)
+
+
+def _bake_into_shared(shm_name: str, row: int, job, num_frames, pos_tolerance, angle_tolerance, frame_step=1.0):
+    # プロセスプール側。結果は親が確保した共有メモリの row 行目から (x, y, z, qx, qy, qz, qw) で書く。
+    # 補間テーブルのヒット数などはこのジョブの分を返し、親で足す
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        hits, misses, _ = _BEZIER_LUT.counters()
+        _BEZIER_LUT.max_error = 0.0
+        baked_p, baked_q, _, collapsed = _bake_job(job, num_frames, pos_tolerance, angle_tolerance, frame_step)
+        n = len(baked_p)
+        out = np.ndarray((row + n, 7), dtype=np.float64, buffer=shm.buf)
+        out[row:row + n, :3] = baked_p
+        out[row:row + n, 3:] = baked_q
+        del out
+        h, m, err = _BEZIER_LUT.counters()
+        return n, collapsed, (h - hits, m - misses, err)
+    finally:
+        shm.close()
+
+
+def _worker_python():
+    # エディタ内では sys.executable が UnrealEditor なので、同梱の python を探す
+    if not _HAS_UNREAL:
+        return sys.executable
+    names = ("python.exe", "python3.exe") if os.name == "nt" else ("bin/python3", "bin/python")
+    for root in (sys.exec_prefix, sys.prefix):
+        for n in names:
+            path = os.path.join(root, n)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _bake_bones_process(jobs, num_frames, pos_tolerance, angle_tolerance, workers: int, frame_step=1.0):
+    import multiprocessing
+    from multiprocessing import shared_memory
+
+    rows = [num_frames if kind != TRACK_CONSTANT else 1 for _, kind, _, _ in jobs]
+    starts = []
+    total = 0
+    for r in rows:
+        starts.append(total)
+        total += r
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total) * 7 * 8)
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        ctx.set_executable(_worker_python())
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_bake_worker,
+                                 initargs=(_BEZIER_LUT.settings(),)) as ex:
+            futures = [
+                ex.submit(_bake_into_shared, shm.name, start, job, num_frames, pos_tolerance, angle_tolerance,
+                          frame_step)
+                for start, job in zip(starts, jobs)
+            ]
+            done = [f.result() for f in futures]
+        out = np.ndarray((max(1, total), 7), dtype=np.float64, buffer=shm.buf)
+        results = []
+        for start, (n, collapsed, lut_counts) in zip(starts, done):
+            _BEZIER_LUT.merge_counters(*lut_counts)
+            block = out[start:start + n].copy()
+            results.append((block[:, :3], block[:, 3:], n, collapsed))
+        del out
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def bake_bones(jobs, num_frames: int, pos_tolerance=None, angle_tolerance=None, workers: int = 1,
+               executor: str = "thread", frame_step: float = 1.0):
+    # jobs: [(ボーン名, 分類, _BoneTrack, 参照ポーズの位置オフセット (x, y, z) か None), ...]
+    # ボーン単位で並列にベイクし、jobs と同じ順で bake_bone の結果を返す。
+    # 各ボーンは独立に同じ計算をするので、ワーカー数に関係なく結果は同じになる。
+    jobs = list(jobs)
+    workers = max(1, int(workers or 1))
+    if workers <= 1 or len(jobs) < 2:
+        return [_bake_job(job, num_frames, pos_tolerance, angle_tolerance, frame_step) for job in jobs]
+    if executor == "process" and _HAS_NUMPY and _worker_python():
+        return _bake_bones_process(jobs, num_frames, pos_tolerance, angle_tolerance, workers, frame_step)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(lambda job: _bake_job(job, num_frames, pos_tolerance, angle_tolerance, frame_step),
+                           jobs))
+
+
+def _bone_resolver(info):
+    # スケルトンの版が分かるときはそれをキーに、分からなければボーン名一式でキャッシュする
+    key = (info.mesh_path, info.version) if info.version not in (None, "dirty") else None
+    return VmdNameMap.resolver_for(VmdNameMap.KIND_BONE, info.bone_names, key)
+
+
+def resolve_bone_names(skeletal_mesh, bone_names, report: bool = True):
+    # {VMD のボーン名: メッシュのボーン名}。メッシュに当たらない名前は含めない。
+    # メッシュのボーン表が取れなければ None (名前はそのまま使う)
+    info = VmdSkeletonInfo.skeleton_info(skeletal_mesh)
+    if info is None or not info.bone_names:
+        return None
+    resolved, rep = _bone_resolver(info).resolve_all([bn for bn in bone_names if bn])
+    if report:
+        VmdNameMap.print_report("ボーン", rep)
+    return resolved
+
+
+def ref_pose_offsets(skeletal_mesh, bone_names):
+    # {VMD のボーン名: 参照ポーズの位置 (x, y, z)}。メッシュに無いボーンは含めない。
+    # ボーン表はメッシュごとに VmdSkeletonInfo にキャッシュされる
+    info = VmdSkeletonInfo.skeleton_info(skeletal_mesh)
+    if info is None:
+        return {}
+    resolver = _bone_resolver(info)
+    targets = {}
+    for bn in bone_names:
+        target = resolver.resolve(bn)
+        if target is not None:
+            targets[bn] = target
+    # 参照ポーズはここで要るボーンの分だけ取る (取ったものはキャッシュに残る)
+    offsets = info.ref_offsets(set(targets.values()))
+    return {bn: offsets[t] for bn, t in targets.items()}
+
+
+def _set_bone_track(ctrl, bone_name: str, baked_p, baked_q, one) -> bool:
+    # トラックを作ってキーを流し込む。トラックが作れないかキーを入れられなければ False
+    try:
+        if hasattr(ctrl, "insert_bone_track"):
+            VmdEngine.call("ctrl.insert_bone_track", ctrl.insert_bone_track, bone_name, 0, False)
+        else:
+            VmdEngine.call("ctrl.add_bone_track", ctrl.add_bone_track, bone_name, False)
+    except Exception:
+        return False
+
+    if _HAS_NUMPY:
+        baked_p = np.asarray(baked_p).tolist()
+        baked_q = np.asarray(baked_q).tolist()
+    pos_keys = VmdEngine.construct("new.Vector", unreal.Vector, baked_p)
+    rot_keys = VmdEngine.construct("new.Quat", unreal.Quat, baked_q)
+    scl_keys = [one] * len(pos_keys)
+
+    try:
+        VmdEngine.call("ctrl.set_bone_track_keys", ctrl.set_bone_track_keys,
+                       bone_name, pos_keys, rot_keys, scl_keys, False)
+    except Exception as e:
+        print(f"ボーン {bone_name} のキーを設定できませんでした: {e}")
+        return False
+    return True
+
+
+def _unit_scale():
+    return VmdEngine.construct("new.Vector", unreal.Vector, [(1.0, 1.0, 1.0)])[0]
+
+
+def apply_bones(ctrl, bones, fps, num_frames, skeletal_mesh=None, pos_tolerance=None, angle_tolerance=None,
+                workers: int = 1, executor: str = "thread"):
+    with VmdTrace.span("apply_bones", bones=len(bones)):
+        # メッシュに当たらないボーンはベイクの前に落とす
+        with VmdTrace.span("resolve"):
+            names = resolve_bone_names(skeletal_mesh, list(bones.keys()))
+        if names is not None:
+            bones = {bn: bones[bn] for bn in bones.keys() if bn in names}
+        with VmdTrace.span("classify"):
+            classified = classify_tracks(bones)
+        with VmdTrace.span("ref_pose"):
+            ref_pos_map = ref_pose_offsets(
+                skeletal_mesh, [bn for bn, (kind, _) in classified.items() if kind != TRACK_IDENTITY])
+
+        stats = {
+            "tracks": 0,
+            "keys_baked": 0,
+            "keys_sent": 0,
+            "collapsed_tracks": 0,
+            TRACK_IDENTITY: 0,
+            TRACK_CONSTANT: 0,
+            TRACK_ANIMATED: 0,
+        }
+        jobs = []
+        for bone_name, (kind, track) in classified.items():
+            stats[kind] += 1
+            if kind == TRACK_IDENTITY:
+                # キーが全部恒等ならトラックを作らず、リファレンスポーズのままにする
+                continue
+            jobs.append((bone_name, kind, track, ref_pos_map.get(bone_name)))
+
+        with VmdTrace.span("bake", tracks=len(jobs), workers=workers):
+            results = bake_bones(jobs, num_frames, pos_tolerance, angle_tolerance, workers, executor)
+
+        with VmdTrace.span("submit"):
+            one = _unit_scale()
+            for (bone_name, kind, track, _), (baked_p, baked_q, sent, collapsed) in zip(jobs, results):
+                target = names.get(bone_name, bone_name) if names is not None else bone_name
+                if not _set_bone_track(ctrl, target, baked_p, baked_q, one):
+                    continue
+                stats["tracks"] += 1
+                stats["keys_baked"] += num_frames if kind == TRACK_ANIMATED else 1
+                stats["keys_sent"] += sent
+                if collapsed:
+                    stats["collapsed_tracks"] += 1
+        return stats
+
+
+def apply_baked_bones(ctrl, tracks, skeletal_mesh=None, names=None) -> int:
+    # ベイク済みのトラック [(ボーン名, 位置 (K, 3), 回転 (K, 4)), ...] をそのまま流し込む。
+    # skeletal_mesh を渡すと参照ポーズの位置をここで足す (メッシュ無しでベイクしたもの用)。
+    # names ({VMD のボーン名: メッシュのボーン名}) を渡すか skeletal_mesh から引けたときは、
+    # そこに無いトラックを飛ばして名前を付け替える。作れたトラック数を返す
+    with VmdTrace.span("apply_baked_bones"):
+        tracks = list(tracks)
+        if names is None and skeletal_mesh is not None:
+            with VmdTrace.span("resolve"):
+                names = resolve_bone_names(skeletal_mesh, [t[0] for t in tracks])
+        if names is not None:
+            tracks = [t for t in tracks if t[0] in names]
+        with VmdTrace.span("ref_pose"):
+            ref_pos_map = ref_pose_offsets(skeletal_mesh, [t[0] for t in tracks])
+        count = 0
+        with VmdTrace.span("submit", tracks=len(tracks)):
+            one = _unit_scale()
+            for bone_name, baked_p, baked_q in tracks:
+                ref_offset = ref_pos_map.get(bone_name)
+                if ref_offset is not None:
+                    if _HAS_NUMPY:
+                        baked_p = np.asarray(baked_p, dtype=np.float64) + ref_offset
+                    else:
+                        baked_p = [(p[0] + ref_offset[0], p[1] + ref_offset[1], p[2] + ref_offset[2])
+                                   for p in baked_p]
+                target = names.get(bone_name, bone_name) if names is not None else bone_name
+                if _set_bone_track(ctrl, target, baked_p, baked_q, one):
+                    count += 1
+        return count
@@ -0,0 +1,349 @@
+import math
+import os
+import sys
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+try:
+    import unreal
+    _HAS_UNREAL = True
+except Exception:
+    unreal = None
+    _HAS_UNREAL = False
+import numpy as np
+import VmdAsset
+import VmdBoneLoader
+
+# MMD のカメラモーションを Level Sequence の CineCameraActor に焼き込む。
+# MMD のカメラは 注視点 (位置)、注視点からの距離、オイラー角 (Y → X → Z)、視野角 (縦, 度) を持ち、
+# 補間は チャンネルごと (X, Y, Z, 回転, 距離, 視野角) の 4 バイト (x1, x2, y1, y2) × 6 = 24 バイト。
+# 回転はオイラー角のまま補間する (slerp ではない)。
+# 全フレームの値をまとめて計算してから、位置 (cm) と角度 (度) の許容誤差でキーを間引き、
+# 残ったキーをチャンネルごとにシーケンサーに書き込む。Python から触れる float チャンネルには
+# まとめて書く API が無い (add_key だけ) ので、書き込みは 1 キーずつ add_key を呼ぶ。
+# 隣り合うフレーム (N, N + 1) のキーはカット割りなので、その間は補間せずに切り替える。
+MMD_FPS = 30.0
+# CineCamera の既定のフィルムバック (16:9 Digital Film) の縦幅 (mm)
+DEFAULT_SENSOR_HEIGHT = 13.365
+
+# 基底変換 (VmdBoneLoader と同じ)。UE = B · MMD、長さは 10 倍
+_B = np.array([[1.0, 0.0, 0.0], [0.0, 0.0, -1.0], [0.0, 1.0, 0.0]])
+_SCALE = 10.0
+
+
+def _camera_columns(keys):
+    # VmdSections.camera_keys() の結果を列にする (フレーム順、同じフレームは後のキー)
+    frame = np.array([k[0] for k in keys], dtype=np.int64)
+    last = np.r_[frame[1:] != frame[:-1], True] if len(frame) else np.zeros(0, dtype=bool)
+    keys = [k for k, keep in zip(keys, last) if keep]
+    return {
+        "frame": frame[last],
+        "distance": np.array([k[1] for k in keys], dtype=np.float64),
+        "pos": np.array([k[2] for k in keys], dtype=np.float64).reshape(-1, 3),
+        "rot": np.array([k[3] for k in keys], dtype=np.float64).reshape(-1, 3),
+        "interp": np.frombuffer(b"".join(k[4] for k in keys), dtype=np.uint8).reshape(-1, 6, 4),
+        "fov": np.array([k[5] for k in keys], dtype=np.float64),
+        "perspective": np.array([k[6] for k in keys], dtype=bool),
+    }
+
+
+def _sample_channels(cols, num_frames: int, frame_step: float):
+    # 出力フレームごとの (注視点 (N, 3), 回転 (N, 3), 距離 (N,), 視野角 (N,))
+    frames = cols["frame"].astype(np.float64)
+    f = np.arange(num_frames, dtype=np.float64) * frame_step
+    n = len(frames)
+    if n == 1:
+        rep = lambda a: np.repeat(a[:1], num_frames, axis=0)
+        return rep(cols["pos"]), rep(cols["rot"]), rep(cols["distance"]), rep(cols["fov"])
+    # f が入る区間 [k0, k1]。最後のキーより後は最後のキーのまま
+    k1 = np.clip(np.searchsorted(frames, f, side="right"), 1, n - 1)
+    k0 = k1 - 1
+    span = frames[k1] - frames[k0]
+    t = np.clip((f - frames[k0]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+    # カット (1 フレーム差のキー) の間に入る出力フレーム (fps が 30 でないとき) は前のキーのまま
+    t[span <= 1] = 0.0
+
+    # 補間パラメータは区間の終わりのキーが持つ。(x1, x2, y1, y2) → (x1, y1, x2, y2)
+    ip = cols["interp"][k1][:, :, [0, 2, 1, 3]]
+    lut = VmdBoneLoader.bezier_lut_cache()
+    w = np.empty((num_frames, 6), dtype=np.float64)
+    for c in range(6):
+        w[:, c] = lut.evaluate_np(ip[:, c, :], t)
+
+    def lerp(a, weight):
+        return a[k0] + (a[k1] - a[k0]) * weight
+
+    pos = np.stack([lerp(cols["pos"][:, c], w[:, c]) for c in range(3)], axis=1)
+    rot = lerp(cols["rot"], w[:, 3:4])
+    dist = lerp(cols["distance"], w[:, 4])
+    fov = lerp(cols["fov"], w[:, 5])
+    return pos, rot, dist, fov
+
+
+def _rot_mmd(rot):
+    # MMD のカメラの回転行列 R = Ry · Rx · Rz (N, 3, 3)
+    rx, ry, rz = rot[:, 0], rot[:, 1], rot[:, 2]
+    cx, sx = np.cos(rx), np.sin(rx)
+    cy, sy = np.cos(ry), np.sin(ry)
+    cz, sz = np.cos(rz), np.sin(rz)
+    n = len(rot)
+    one = np.ones(n)
+    zero = np.zeros(n)
+    Rx = np.stack([one, zero, zero, zero, cx, -sx, zero, sx, cx], axis=1).reshape(n, 3, 3)
+    Ry = np.stack([cy, zero, sy, zero, one, zero, -sy, zero, cy], axis=1).reshape(n, 3, 3)
+    Rz = np.stack([cz, -sz, zero, sz, cz, zero, zero, zero, one], axis=1).reshape(n, 3, 3)
+    return Ry @ Rx @ Rz
+
+
+def _camera_transform(center, rot, dist):
+    # UE 空間のカメラ位置 (cm) と回転 (roll, pitch, yaw 度)
+    R = _rot_mmd(rot)
+    # カメラは注視点からローカル z 方向に distance (普通は負) 離れ、ローカル +z を向き +y が上
+    eye = center + R[:, :, 2] * dist[:, None]
+    loc = (eye @ _B.T) * _SCALE
+    fwd = R[:, :, 2] @ _B.T
+    up = R[:, :, 1] @ _B.T
+    right = np.cross(up, fwd)
+
+    # FMatrix::Rotator と同じ分解
+    pitch = np.arctan2(fwd[:, 2], np.sqrt(fwd[:, 0] ** 2 + fwd[:, 1] ** 2))
+    yaw = np.arctan2(fwd[:, 1], fwd[:, 0])
+    sy_axis = np.stack([-np.sin(yaw), np.cos(yaw), np.zeros_like(yaw)], axis=1)
+    roll = np.arctan2((up * sy_axis).sum(axis=1), (right * sy_axis).sum(axis=1))
+    # 角度は連続にしておく (チャンネルごとに線形補間されるので ±180 で飛ばないように)
+    euler = np.degrees(np.unwrap(np.stack([roll, pitch, yaw], axis=1), axis=0))
+    return loc, euler
+
+
+def _reduce_camera_np(loc, euler, anchors, pos_tolerance: float, angle_tolerance: float):
+    # 位置と各オイラー角をチャンネルごとに線形補間したときに許容誤差に収まるように間引く
+    n = len(loc)
+    keep = np.zeros(n, dtype=bool)
+    keep[anchors] = True
+    stack = [(int(a), int(b)) for a, b in zip(anchors[:-1], anchors[1:])]
+    pos_tolerance = max(pos_tolerance, 1e-12)
+    angle_tolerance = max(angle_tolerance, 1e-12)
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        idx = np.arange(a + 1, b)
+        t = ((idx - a) / float(b - a))[:, None]
+        pos_err = np.sqrt(((loc[idx] - (loc[a] + (loc[b] - loc[a]) * t)) ** 2).sum(axis=1))
+        ang_err = np.abs(euler[idx] - (euler[a] + (euler[b] - euler[a]) * t)).max(axis=1)
+        score = np.maximum(pos_err / pos_tolerance, ang_err / angle_tolerance)
+        m = int(np.argmax(score))
+        if score[m] <= 1.0:
+            continue
+        m = int(idx[m])
+        keep[m] = True
+        stack.append((a, m))
+        stack.append((m, b))
+    return np.flatnonzero(keep)
+
+
+def _cut_frames(cols, num_frames: int, frame_step: float):
+    # カットの直前の出力フレーム。ここから次のキーへは補間せずに切り替える
+    frames = cols["frame"]
+    starts = frames[1:][np.diff(frames) <= 1].astype(np.float64)
+    cut = np.ceil(starts / frame_step - 1e-9).astype(np.int64) - 1
+    return np.unique(cut[(cut >= 0) & (cut < num_frames - 1)])
+
+
+def _reduce_scalar_np(v, anchors, tolerance: float):
+    n = len(v)
+    keep = np.zeros(n, dtype=bool)
+    keep[anchors] = True
+    stack = [(int(a), int(b)) for a, b in zip(anchors[:-1], anchors[1:])]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        idx = np.arange(a + 1, b)
+        t = (idx - a) / float(b - a)
+        err = np.abs(v[idx] - (v[a] + (v[b] - v[a]) * t))
+        m = int(np.argmax(err))
+        if err[m] <= tolerance:
+            continue
+        m = int(idx[m])
+        keep[m] = True
+        stack.append((a, m))
+        stack.append((m, b))
+    return np.flatnonzero(keep)
+
+
+def bake_camera(keys, fps: float = MMD_FPS, pos_tolerance=None, angle_tolerance=None) -> dict:
+    # unreal に触らない純粋な計算。keys は VmdSections.camera_keys() の結果。
+    # pos_tolerance (cm) / angle_tolerance (度) を渡すとキーを間引く (視野角も angle_tolerance 以内)。
+    # 元の MMD のキーのフレームとカットの前後は必ず残す (カット割りが崩れないように)。
+    # cut_frames はカットの直前のフレームで、そこのキーは補間を CONSTANT で書く
+    if not keys:
+        return None
+    fps = float(fps)
+    frame_step = MMD_FPS / fps
+    cols = _camera_columns(keys)
+    last = int(cols["frame"][-1])
+    num_frames = int(math.floor(last / frame_step + 1e-9)) + 1
+
+    center, rot, dist, fov = _sample_channels(cols, num_frames, frame_step)
+    loc, euler = _camera_transform(center, rot, dist)
+
+    anchors = np.unique(np.clip(np.rint(cols["frame"] / frame_step).astype(np.int64), 0, num_frames - 1))
+    cuts = _cut_frames(cols, num_frames, frame_step)
+    anchors = np.union1d(np.union1d(anchors, [0, num_frames - 1]), np.union1d(cuts, cuts + 1))
+    if pos_tolerance is not None and angle_tolerance is not None:
+        frames = _reduce_camera_np(loc, euler, anchors, float(pos_tolerance), float(angle_tolerance))
+        fov_frames = _reduce_scalar_np(fov, anchors, float(angle_tolerance))
+    else:
+        frames = np.arange(num_frames)
+        fov_frames = frames
+    if np.ptp(fov) == 0.0:
+        fov_frames = fov_frames[:1]
+
+    return {
+        "fps": fps,
+        "num_frames": num_frames,
+        "frames": frames,
+        "location": loc[frames],
+        "rotation": euler[frames],
+        "fov_frames": fov_frames,
+        "fov": fov[fov_frames],
+        "cut_frames": cuts,
+        "stats": {
+            "source_keys": len(cols["frame"]),
+            "baked_keys": num_frames,
+            "transform_keys": len(frames),
+            "fov_keys": len(fov_frames),
+            "cuts": len(cuts),
+            "orthographic_keys": int((~cols["perspective"]).sum()),
+        },
+    }
+
+
+def focal_length(fov_deg, sensor_height: float = DEFAULT_SENSOR_HEIGHT):
+    # 縦の視野角 (度) → 焦点距離 (mm)
+    half = np.radians(np.clip(np.asarray(fov_deg, dtype=np.float64), 1.0, 179.0)) * 0.5
+    return sensor_height / (2.0 * np.tan(half))
+
+
+# ---- ここから unreal 側 ----
+
+def _push_keys(channel, frames, values, step_frames=()) -> int:
+    # MovieSceneScriptingFloatChannel には一括の書き込みが無いので add_key で 1 キーずつ書く。step_frames のフレームは CONSTANT、
+    # それ以外は LINEAR。書けたキー数を返す
+    step_frames = set(int(f) for f in step_frames)
+    linear = unreal.MovieSceneKeyInterpolation.LINEAR
+    constant = unreal.MovieSceneKeyInterpolation.CONSTANT
+    count = 0
+    for f, v in zip(frames, values):
+        f = int(f)
+        try:
+            channel.add_key(unreal.FrameNumber(f), float(v), 0.0, unreal.SequenceTimeUnit.DISPLAY_RATE,
+                            constant if f in step_frames else linear)
+            count += 1
+        except Exception:
+            pass
+    return count
+
+
+def _add_track(owner, track_class):
+    for name in ("add_track", "add_master_track"):
+        fn = getattr(owner, name, None)
+        if fn is not None:
+            try:
+                return fn(track_class)
+            except Exception:
+                pass
+    return None
+
+
+def _binding_id(seq, binding):
+    for fn in (lambda: seq.get_portable_binding_id(seq, binding),
+               lambda: seq.make_binding_id(binding, unreal.MovieSceneObjectBindingSpace.LOCAL),
+               lambda: seq.get_binding_id(binding)):
+        try:
+            return fn()
+        except Exception:
+            pass
+    return None
+
+
+def create_camera_sequence(folder: str, base_name: str, baked: dict):
+    # <base_name>_Camera の Level Sequence を作り、スポーンする CineCameraActor に焼き込む。
+    # (シーケンス, 書いたキー数) を返す。作れなければ (None, 0)
+    asset_name = VmdAsset.unique_asset_name(folder, base_name, "_Camera")
+    seq = unreal.AssetToolsHelpers.get_asset_tools().create_asset(
+        asset_name=asset_name,
+        package_path=folder,
+        asset_class=unreal.LevelSequence,
+        factory=unreal.LevelSequenceFactoryNew(),
+    )
+    if seq is None:
+        return None, 0
+
+    fps = baked["fps"]
+    num_frames = int(baked["num_frames"])
+    try:
+        if float(fps).is_integer():
+            seq.set_display_rate(unreal.FrameRate(int(fps), 1))
+        else:
+            seq.set_display_rate(unreal.FrameRate(int(round(float(fps) * 1000)), 1000))
+    except Exception:
+        pass
+    try:
+        seq.set_playback_start(0)
+        seq.set_playback_end(num_frames)
+    except Exception:
+        pass
+
+    binding = seq.add_spawnable_from_class(unreal.CineCameraActor)
+    written = 0
+
+    cut_track = _add_track(seq, unreal.MovieSceneCameraCutTrack)
+    if cut_track is not None:
+        try:
+            cut = cut_track.add_section()
+            cut.set_range(0, num_frames)
+            binding_id = _binding_id(seq, binding)
+            if binding_id is not None:
+                cut.set_camera_binding_id(binding_id)
+        except Exception as e:
+            print(f"カメラカットを設定できませんでした: {e}")
+
+    transform = binding.add_track(unreal.MovieScene3DTransformTrack)
+    section = transform.add_section()
+    section.set_range(0, num_frames)
+    # Location X/Y/Z, Rotation X (roll) / Y (pitch) / Z (yaw), Scale X/Y/Z
+    channels = section.get_all_channels()
+    frames = baked["frames"]
+    loc = baked["location"]
+    rot = baked["rotation"]
+    cuts = baked.get("cut_frames", ())
+    for c in range(3):
+        written += _push_keys(channels[c], frames, loc[:, c], cuts)
+        written += _push_keys(channels[3 + c], frames, rot[:, c], cuts)
+
+    sensor_height = DEFAULT_SENSOR_HEIGHT
+    comp = None
+    try:
+        comp = binding.get_object_template().get_cine_camera_component()
+        sensor_height = float(comp.filmback.sensor_height)
+    except Exception:
+        pass
+    if comp is not None:
+        try:
+            comp_binding = seq.add_possessable(comp)
+            comp_binding.set_parent(binding)
+        except Exception:
+            comp_binding = None
+        if comp_binding is not None:
+            focal = comp_binding.add_track(unreal.MovieSceneFloatTrack)
+            focal.set_property_name_and_path("Current Focal Length", "CurrentFocalLength")
+            fsec = focal.add_section()
+            fsec.set_range(0, num_frames)
+            written += _push_keys(fsec.get_all_channels()[0], baked["fov_frames"],
+                                  focal_length(baked["fov"], sensor_height), cuts)
+    return seq, written
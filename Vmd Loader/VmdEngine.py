@@ -0,0 +1,142 @@
+import fnmatch
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+
+# ローダーからエンジンへの呼び出しとオブジェクト生成の入口。
+# VmdBoneLoader / VmdMorphLoader はコントローラやスケルトンのメソッド、unreal.Vector などの生成をここ経由で行う。
+# 既定の UnrealBackend はそのまま呼ぶだけ。RecordingBackend に差し替えると操作ごとの回数と時間を数え、
+# check() で上限 (コール予算) を確かめられる。
+# 操作名は "ctrl.insert_bone_track" "skeleton.get_curve_identifier" "new.Vector" のように
+# 相手の種類とメソッド名 (生成は new.クラス名) で付ける。予算のキーには fnmatch のパターン ("ctrl.*") も使える
+
+
+class CallBudgetExceeded(AssertionError):
+    pass
+
+
+class UnrealBackend:
+    def call(self, op: str, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def construct(self, op: str, factory, rows) -> list:
+        # rows の各要素を factory(*row) に渡して作ったものを返す
+        return [factory(*row) for row in rows]
+
+
+class RecordingBackend(UnrealBackend):
+    # inner に処理を回しつつ、操作ごとの回数・生成したオブジェクト数・時間を数える
+    def __init__(self, inner: UnrealBackend = None):
+        self.inner = inner if inner is not None else UnrealBackend()
+        self.calls = Counter()
+        self.objects = Counter()
+        self.seconds = Counter()
+
+    def call(self, op: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self.inner.call(op, fn, *args, **kwargs)
+        finally:
+            self.seconds[op] += time.perf_counter() - t0
+            self.calls[op] += 1
+
+    def construct(self, op: str, factory, rows) -> list:
+        t0 = time.perf_counter()
+        try:
+            out = self.inner.construct(op, factory, rows)
+        finally:
+            self.seconds[op] += time.perf_counter() - t0
+            self.calls[op] += 1
+        self.objects[op] += len(out)
+        return out
+
+    def reset(self):
+        self.calls.clear()
+        self.objects.clear()
+        self.seconds.clear()
+
+    def count(self, pattern: str) -> int:
+        # パターンに当たる操作の回数の合計。生成 (new.*) は作ったオブジェクトの数で数える
+        total = 0
+        for op in set(self.calls) | set(self.objects):
+            if fnmatch.fnmatchcase(op, pattern):
+                total += self.objects[op] if op in self.objects else self.calls[op]
+        return total
+
+    def stats(self) -> dict:
+        ops = sorted(set(self.calls) | set(self.objects))
+        return {op: {"calls": self.calls[op], "objects": self.objects[op], "seconds": self.seconds[op]}
+                for op in ops}
+
+    def check(self, budgets: dict) -> list:
+        # {パターン: 上限} のうち超えたものを [(パターン, 実際, 上限), ...] で返す
+        over = []
+        for pattern, limit in budgets.items():
+            n = self.count(pattern)
+            if n > limit:
+                over.append((pattern, n, limit))
+        return over
+
+    def assert_budget(self, budgets: dict):
+        over = self.check(budgets)
+        if over:
+            lines = [f"{p}: {n} 回 (上限 {limit})" for p, n, limit in over]
+            raise CallBudgetExceeded("エンジン呼び出しが予算を超えました: " + ", ".join(lines))
+
+    def summary(self, limit: int = 8) -> str:
+        stats = self.stats()
+        total = sum(s["seconds"] for s in stats.values())
+        top = sorted(stats.items(), key=lambda kv: kv[1]["seconds"], reverse=True)[:limit]
+        parts = []
+        for op, s in top:
+            n = s["objects"] if s["objects"] else s["calls"]
+            parts.append(f"{op} {n} ({s['seconds'] * 1000:.1f}ms)")
+        return f"エンジン呼び出し {sum(self.calls.values())} 回 / {total * 1000:.1f}ms: " + ", ".join(parts)
+
+
+_BACKEND = UnrealBackend()
+
+
+def backend() -> UnrealBackend:
+    return _BACKEND
+
+
+def set_backend(b: UnrealBackend) -> UnrealBackend:
+    # 前のバックエンドを返す
+    global _BACKEND
+    prev = _BACKEND
+    _BACKEND = b if b is not None else UnrealBackend()
+    return prev
+
+
+@contextmanager
+def use_backend(b: UnrealBackend):
+    prev = set_backend(b)
+    try:
+        yield b
+    finally:
+        set_backend(prev)
+
+
+@contextmanager
+def recording(inner: UnrealBackend = None):
+    # with recording() as rec: ... の間の呼び出しを数える。inner を省くと今のバックエンドを包む
+    rec = RecordingBackend(inner if inner is not None else _BACKEND)
+    with use_backend(rec):
+        yield rec
+
+
+def call(op: str, fn, *args, **kwargs):
+    return _BACKEND.call(op, fn, *args, **kwargs)
+
+
+def construct(op: str, factory, rows) -> list:
+    return _BACKEND.construct(op, factory, rows)
@@ -8,35 +8,248 @@ try:
 except Exception:
     unreal = None
     _HAS_UNREAL = False
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    np = None
+    _HAS_NUMPY = False
+import VmdEngine
+import VmdNameMap
+import VmdTrace
 
+# これ以下の値は 0 とみなす (全部 0 のカーブは作らない)
+_ZERO_EPS = 1e-6
 
-def apply_morphs(ctrl, morphs, skeleton, morph_target_names, fps):
-    for name, keys in morphs.items():
-        if not name:
-            continue
-        if name.startswith("__"):
+INTERP_LINEAR = "linear"
+INTERP_CONSTANT = "constant"
+
+
+def bake_morph_curve(keys, fps):
+    # unreal に触らない純粋な計算。[(frame, weight), ...] を (秒のリスト, 値のリスト) にする
+    times = []
+    values = []
+    for frame, w in keys:
+        times.append(float(frame) / float(fps))
+        values.append(float(w))
+    return times, values
+
+
+def _prepare_curve_np(times, values, tolerance):
+    t = np.asarray(times, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64)
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    v = v[order]
+    # 同じ時刻のキーは後のものを使う
+    last = np.r_[t[1:] != t[:-1], True]
+    t = t[last]
+    v = v[last]
+    if not (np.abs(v) > _ZERO_EPS).any():
+        return None
+    # 同じ値が続くところは両端だけ残す (線形補間なので中は要らない)
+    if len(v) > 2:
+        inner = (v[1:-1] == v[:-2]) & (v[1:-1] == v[2:])
+        keep = np.r_[True, ~inner, True]
+        t = t[keep]
+        v = v[keep]
+    if tolerance and len(v) > 2:
+        keep = _reduce_curve_np(t, v, float(tolerance))
+        t = t[keep]
+        v = v[keep]
+    flat = np.abs(np.diff(v)) <= (float(tolerance) if tolerance else 0.0)
+    interps = [INTERP_CONSTANT if f else INTERP_LINEAR for f in flat.tolist()] + [INTERP_LINEAR]
+    return t.tolist(), v.tolist(), interps
+
+
+def _reduce_curve_np(t, v, tolerance: float):
+    # 線形補間で tolerance 以内に収まるように Douglas-Peucker で間引く。残すキーの位置を返す
+    n = len(t)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = True
+    keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
             continue
-        if name not in morph_target_names:
+        idx = np.arange(a + 1, b)
+        u = (t[idx] - t[a]) / (t[b] - t[a])
+        err = np.abs(v[idx] - (v[a] + (v[b] - v[a]) * u))
+        m = int(np.argmax(err))
+        if err[m] <= tolerance:
             continue
+        m = int(idx[m])
+        keep[m] = True
+        stack.append((a, m))
+        stack.append((m, b))
+    return np.flatnonzero(keep)
+
+
+def _prepare_curve_py(times, values, tolerance):
+    by_time = {}
+    for t, v in zip(times, values):
+        by_time[float(t)] = float(v)
+    keys = sorted(by_time.items())
+    if not any(abs(v) > _ZERO_EPS for _, v in keys):
+        return None
+    if len(keys) > 2:
+        keys = [keys[0]] + [keys[i] for i in range(1, len(keys) - 1)
+                            if not (keys[i][1] == keys[i - 1][1] and keys[i][1] == keys[i + 1][1])] + [keys[-1]]
+    if tolerance and len(keys) > 2:
+        keep = {0, len(keys) - 1}
+        stack = [(0, len(keys) - 1)]
+        while stack:
+            a, b = stack.pop()
+            worst = None
+            worst_err = float(tolerance)
+            for i in range(a + 1, b):
+                u = (keys[i][0] - keys[a][0]) / (keys[b][0] - keys[a][0])
+                err = abs(keys[i][1] - (keys[a][1] + (keys[b][1] - keys[a][1]) * u))
+                if err > worst_err:
+                    worst = i
+                    worst_err = err
+            if worst is not None:
+                keep.add(worst)
+                stack.append((a, worst))
+                stack.append((worst, b))
+        keys = [keys[i] for i in sorted(keep)]
+    tol = float(tolerance) if tolerance else 0.0
+    interps = [INTERP_CONSTANT if abs(keys[i + 1][1] - keys[i][1]) <= tol else INTERP_LINEAR
+               for i in range(len(keys) - 1)] + [INTERP_LINEAR]
+    return [k[0] for k in keys], [k[1] for k in keys], interps
+
+
+def prepare_morph_curve(times, values, tolerance=None):
+    # unreal に触らない純粋な計算。(秒, 値, 各キーから次のキーまでの補間) を返す。全部 0 なら None。
+    # 同じ値の連続は両端だけにし、tolerance を渡すとその誤差以内で更に間引く。
+    # 値が変わらない区間は定数補間にする (見た目は線形と同じで、評価が軽い)
+    if len(times) == 0:
+        return None
+    if _HAS_NUMPY:
+        return _prepare_curve_np(times, values, tolerance)
+    return _prepare_curve_py(times, values, tolerance)
+
+
+# スケルトンごとのカーブ ID。{スケルトンのパス: {名前: カーブ ID (使えない名前は None)}}
+_CURVE_IDS = {}
+
+
+def _skeleton_key(skeleton):
+    try:
+        return str(skeleton.get_path_name())
+    except Exception:
+        return id(skeleton)
+
+
+def clear_curve_id_cache():
+    _CURVE_IDS.clear()
+
+
+def _curve_id(skeleton, name):
+    ids = _CURVE_IDS.setdefault(_skeleton_key(skeleton), {})
+    if name in ids:
+        return ids[name]
+    curve_id = VmdEngine.call("skeleton.get_curve_identifier", skeleton.get_curve_identifier,
+                              name, unreal.RawCurveTrackTypes.RCT_FLOAT)
+    try:
+        if hasattr(curve_id, "get_name") and curve_id.get_name() == "__CURVE_CONTROL":
+            curve_id = None
+    except Exception:
+        pass
+    ids[name] = curve_id
+    return curve_id
 
-        curve_id = skeleton.get_curve_identifier(name, unreal.RawCurveTrackTypes.RCT_FLOAT)
-        try:
-            if hasattr(curve_id, "get_name") and curve_id.get_name() == "__CURVE_CONTROL":
+
+def _curve_key(t, v):
+    return unreal.RichCurveKey(time=t, value=v)
+
+
+def _curve_key_interp(t, v, m):
+    return unreal.RichCurveKey(time=t, value=v, interp_mode=m)
+
+
+def _rich_curve_keys(times, values, interps):
+    if interps is None:
+        return VmdEngine.construct("new.RichCurveKey", _curve_key, zip(times, values))
+    try:
+        modes = {
+            INTERP_LINEAR: unreal.RichCurveInterpMode.RCIM_LINEAR,
+            INTERP_CONSTANT: unreal.RichCurveInterpMode.RCIM_CONSTANT,
+        }
+        return VmdEngine.construct("new.RichCurveKey", _curve_key_interp,
+                                   zip(times, values, [modes[m] for m in interps]))
+    except Exception:
+        return VmdEngine.construct("new.RichCurveKey", _curve_key, zip(times, values))
+
+
+def _set_morph_curve(ctrl, skeleton, name, times, values, interps=None) -> bool:
+    curve_id = _curve_id(skeleton, name)
+    if curve_id is None:
+        return False
+
+    try:
+        VmdEngine.call("ctrl.add_curve", ctrl.add_curve, curve_id, 4, False)
+    except Exception:
+        pass
+
+    curve_keys = _rich_curve_keys(times, values, interps)
+
+    try:
+        VmdEngine.call("ctrl.set_curve_keys", ctrl.set_curve_keys, curve_id, curve_keys, False)
+    except Exception:
+        return False
+    return True
+
+
+def resolve_morph_names(morph_names, morph_target_names, report: bool = True) -> dict:
+    # {VMD のモーフ名: メッシュのモーフ名}。当たらない名前は含めない
+    resolver = VmdNameMap.resolver_for(VmdNameMap.KIND_MORPH, morph_target_names or ())
+    resolved, rep = resolver.resolve_all([n for n in morph_names if n and not n.startswith("__")])
+    if report:
+        VmdNameMap.print_report("モーフ", rep)
+    return resolved
+
+
+def _apply_curves(ctrl, curves, skeleton, morph_target_names, tolerance) -> dict:
+    curves = list(curves)
+    with VmdTrace.span("resolve"):
+        names = resolve_morph_names([c[0] for c in curves], morph_target_names)
+    stats = {"curves": 0, "zero_curves": 0, "keys_in": 0, "keys_out": 0}
+    prepared_curves = []
+    with VmdTrace.span("reduce"):
+        for name, times, values in curves:
+            target = names.get(name)
+            if target is None:
                 continue
-        except Exception:
-            pass
-
-        try:
-            ctrl.add_curve(curve_id, 4, False)
-        except Exception:
-            pass
-
-        curve_keys = []
-        for frame, w in keys:
-            t = float(frame) / float(fps)
-            curve_keys.append(unreal.RichCurveKey(time=t, value=float(w)))
-
-        try:
-            ctrl.set_curve_keys(curve_id, curve_keys, False)
-        except Exception:
-            continue
+            stats["keys_in"] += len(times)
+            prepared = prepare_morph_curve(times, values, tolerance)
+            if prepared is None:
+                stats["zero_curves"] += 1
+                continue
+            prepared_curves.append((target, prepared))
+    with VmdTrace.span("submit", curves=len(prepared_curves)):
+        for target, prepared in prepared_curves:
+            if _set_morph_curve(ctrl, skeleton, target, *prepared):
+                stats["curves"] += 1
+                stats["keys_out"] += len(prepared[0])
+    return stats
+
+
+def apply_morphs(ctrl, morphs, skeleton, morph_target_names, fps, tolerance=None) -> dict:
+    # {"curves", "zero_curves", "keys_in", "keys_out"} を返す。tolerance は値の許容誤差 (None なら厳密)
+    with VmdTrace.span("apply_morphs", morphs=len(morphs)):
+        curves = []
+        with VmdTrace.span("bake"):
+            for name, keys in morphs.items():
+                if not name:
+                    continue
+                times, values = bake_morph_curve(keys, fps)
+                curves.append((name, times, values))
+        return _apply_curves(ctrl, curves, skeleton, morph_target_names, tolerance)
+
+
+def apply_baked_morphs(ctrl, curves, skeleton, morph_target_names, tolerance=None) -> int:
+    # ベイク済みのカーブ [(モーフ名, 秒 (K,), 値 (K,)), ...] を流し込む。作れたカーブ数を返す
+    with VmdTrace.span("apply_baked_morphs"):
+        return _apply_curves(ctrl, curves, skeleton, morph_target_names, tolerance)["curves"]
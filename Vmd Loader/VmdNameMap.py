@@ -0,0 +1,256 @@
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+
+# VMD のボーン名・モーフ名をスケルトン側の名前に引き当てる。
+# 1. 完全一致  2. 対応表 (CSV / JSON)  3. 正規化した名前どうしの一致
+# 正規化は NFKC (全角英数 → 半角、半角カナ → 全角)、大文字小文字、区切り文字の除去、
+# 左/右 と L/R・Left/Right の表記を左右の印にまとめる。
+# 対応表は左右無しの名前 (例: 腕,Arm) を書けば 左腕 → Arm_L のように左右付きにも効く。
+# 対象の名前一式ごとに表を 1 回作ってキャッシュし、引くのは辞書 1 回か 2 回で済む。
+# 複数の VMD の名前が同じ対象に当たったときは、完全一致 > 対応表 > 正規化、同じなら先に出た名前を残し、
+# 残りは捨てて報告する (同じトラックに上書きさせない)。
+#
+# 対応表の場所: このフォルダの name_maps/ と環境変数 VMDLOADER_NAME_MAPS (os.pathsep 区切り)
+#   CSV : mmd名,ue名[,bone|morph]   (# で始まる行は無視。種類を省くと両方)
+#   JSON: {"bones": {mmd名: ue名}, "morphs": {...}} か {mmd名: ue名} (両方)
+KIND_BONE = "bone"
+KIND_MORPH = "morph"
+
+EXACT = "exact"
+MAPPED = "mapped"
+NORMALIZED = "normalized"
+
+# 同じ対象に当たったときに残す順
+_RANK = {EXACT: 0, MAPPED: 1, NORMALIZED: 2}
+
+DEFAULT_MAP_DIR = os.path.join(_THIS_DIR, "name_maps")
+
+_SEPARATORS = re.compile(r"[\s_\-.:]+")
+_SIDE_PREFIX = re.compile(r"^(?i:left|right|l|r)(?=[\s_\-.:])|^(?:Left|Right)(?=[A-Z0-9])")
+_SIDE_SUFFIX = re.compile(r"(?<=[\s_\-.:])(?i:left|right|l|r)$|(?<=[a-z0-9])(?:Left|Right)$")
+
+_extra_paths = []
+
+
+def set_mapping_paths(paths):
+    # 既定の場所に加えて読む対応表 (ファイルかフォルダ)
+    global _extra_paths
+    _extra_paths = [str(p) for p in (paths or [])]
+    _RESOLVERS.clear()
+
+
+def mapping_files() -> list:
+    paths = [DEFAULT_MAP_DIR]
+    env = os.environ.get("VMDLOADER_NAME_MAPS")
+    if env:
+        paths += [p for p in env.split(os.pathsep) if p]
+    paths += _extra_paths
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += [os.path.join(p, n) for n in sorted(os.listdir(p))
+                      if n.lower().endswith((".csv", ".json"))]
+        elif os.path.isfile(p):
+            files.append(p)
+    return files
+
+
+def canonical_name(name: str) -> str:
+    # "基本名|左右" (左右は l / r / 空)
+    s = unicodedata.normalize("NFKC", str(name)).strip()
+    side = ""
+    if "左" in s:
+        side = "l"
+        s = s.replace("左", "")
+    elif "右" in s:
+        side = "r"
+        s = s.replace("右", "")
+    else:
+        m = _SIDE_PREFIX.search(s) or _SIDE_SUFFIX.search(s)
+        if m is not None:
+            side = m.group(0)[0].lower()
+            s = s[:m.start()] + s[m.end():]
+    return _SEPARATORS.sub("", s.casefold()) + "|" + side
+
+
+def _split_canonical(c: str):
+    base, _, side = c.rpartition("|")
+    return base, side
+
+
+def _load_csv(path: str, kind: str) -> dict:
+    out = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f):
+            row = [c.strip() for c in row]
+            if len(row) < 2 or not row[0] or row[0].startswith("#"):
+                continue
+            if len(row) >= 3 and row[2] and row[2].lower() not in (kind, kind + "s"):
+                continue
+            out[row[0]] = row[1]
+    return out
+
+
+def _load_json(path: str, kind: str) -> dict:
+    with open(path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return {}
+    if any(k in data for k in ("bones", "morphs")):
+        data = data.get(kind + "s") or {}
+    return {str(k): str(v) for k, v in data.items() if isinstance(v, str)}
+
+
+def load_mapping(files, kind: str) -> dict:
+    # 後に読んだファイルが優先
+    mapping = {}
+    for path in files:
+        try:
+            if path.lower().endswith(".json"):
+                mapping.update(_load_json(path, kind))
+            else:
+                mapping.update(_load_csv(path, kind))
+        except Exception as e:
+            print(f"名前の対応表を読めませんでした: {path}: {e}")
+    return mapping
+
+
+class NameResolver:
+    def __init__(self, target_names, mapping=None):
+        self.targets = set(str(n) for n in target_names)
+        self._table = {}
+        by_canon = {}
+        # 正規化すると同じになる対象の名前 {正規化した名前: [対象の名前, ...]}。正規化では先頭 (名前順) に当てる
+        self.ambiguous = {}
+        for t in sorted(self.targets):
+            c = canonical_name(t)
+            if c in by_canon:
+                self.ambiguous.setdefault(c, [by_canon[c]]).append(t)
+                continue
+            by_canon[c] = t
+        for c, t in by_canon.items():
+            self._table[c] = (t, NORMALIZED)
+
+        for src, dst in (mapping or {}).items():
+            if dst in self.targets:
+                self._table[canonical_name(src)] = (dst, MAPPED)
+                continue
+            src_base, src_side = _split_canonical(canonical_name(src))
+            dst_base, dst_side = _split_canonical(canonical_name(dst))
+            if src_side or dst_side:
+                t = by_canon.get(dst_base + "|" + (dst_side or src_side))
+                if t is not None:
+                    self._table[src_base + "|" + (src_side or dst_side)] = (t, MAPPED)
+                continue
+            # 左右の無い対応は、左右付きの名前にも同じ向きで当てる
+            for side in ("", "l", "r"):
+                t = by_canon.get(dst_base + "|" + side)
+                if t is not None:
+                    self._table[src_base + "|" + side] = (t, MAPPED)
+        self._memo = {}
+
+    def lookup(self, name: str):
+        # (対象の名前, 一致の種類)。見つからなければ (None, None)
+        if name in self.targets:
+            return name, EXACT
+        hit = self._memo.get(name)
+        if hit is None:
+            hit = self._table.get(canonical_name(name), (None, None))
+            self._memo[name] = hit
+        return hit
+
+    def resolve(self, name: str):
+        return self.lookup(name)[0]
+
+    def resolve_all(self, names):
+        # ({VMD の名前: 対象の名前}, 報告) 。未解決の名前と、同じ対象に当たって捨てた名前は含めない。
+        # 報告の "collisions" は [(捨てた名前, 残した名前, 対象の名前), ...]、
+        # "ambiguous" は正規化で当てたが同じ正規化の対象が複数あった [(VMD の名前, [対象の名前, ...]), ...]
+        resolved = {}
+        owner = {}
+        report = {EXACT: 0, MAPPED: 0, NORMALIZED: 0, "unresolved": [], "collisions": [], "ambiguous": []}
+        for n in names:
+            t, how = self.lookup(n)
+            if t is None:
+                report["unresolved"].append(n)
+                continue
+            prev = owner.get(t)
+            if prev is not None:
+                if _RANK[how] >= _RANK[prev[1]]:
+                    report["collisions"].append((n, prev[0], t))
+                    continue
+                del resolved[prev[0]]
+                report[prev[1]] -= 1
+                report["ambiguous"] = [a for a in report["ambiguous"] if a[0] != prev[0]]
+                report["collisions"].append((prev[0], n, t))
+            owner[t] = (n, how)
+            resolved[n] = t
+            report[how] += 1
+            if how == NORMALIZED:
+                targets = self.ambiguous.get(canonical_name(n))
+                if targets is not None:
+                    report["ambiguous"].append((n, targets))
+        return resolved, report
+
+
+def print_report(label: str, report: dict, limit: int = 20):
+    unresolved = report["unresolved"]
+    print(f"名前解決 ({label}): 完全一致 {report[EXACT]} / 対応表 {report[MAPPED]} / "
+          f"正規化 {report[NORMALIZED]} / 未解決 {len(unresolved)}")
+    if unresolved:
+        shown = ", ".join(unresolved[:limit])
+        more = f" ほか {len(unresolved) - limit} 件" if len(unresolved) > limit else ""
+        print(f"  未解決: {shown}{more}")
+    collisions = report.get("collisions") or []
+    if collisions:
+        shown = ", ".join(f"{d} ({k} を優先 → {t})" for d, k, t in collisions[:limit])
+        more = f" ほか {len(collisions) - limit} 件" if len(collisions) > limit else ""
+        print(f"  警告: 同じ名前に当たるため無視: {shown}{more}")
+    ambiguous = report.get("ambiguous") or []
+    if ambiguous:
+        shown = ", ".join(f"{n} → {targets[0]} ({' / '.join(targets[1:])} もあり)"
+                          for n, targets in ambiguous[:limit])
+        more = f" ほか {len(ambiguous) - limit} 件" if len(ambiguous) > limit else ""
+        print(f"  警告: 正規化で区別できない名前: {shown}{more}")
+
+
+_RESOLVERS = OrderedDict()
+_RESOLVERS_MAX = 16
+_lock = threading.Lock()
+
+
+def resolver_for(kind: str, target_names, key=None) -> NameResolver:
+    # key はスケルトンを表す値 (メッシュのパスと版など)。省略時は名前一式そのもの
+    target_names = frozenset(str(n) for n in target_names)
+    files = mapping_files()
+    stamp = []
+    for path in files:
+        try:
+            st = os.stat(path)
+            stamp.append((path, st.st_size, st.st_mtime_ns))
+        except Exception:
+            pass
+    cache_key = (kind, key if key is not None else target_names, tuple(stamp))
+    with _lock:
+        r = _RESOLVERS.get(cache_key)
+        if r is not None:
+            _RESOLVERS.move_to_end(cache_key)
+            return r
+    r = NameResolver(target_names, load_mapping(files, kind))
+    with _lock:
+        _RESOLVERS[cache_key] = r
+        while len(_RESOLVERS) > _RESOLVERS_MAX:
+            _RESOLVERS.popitem(last=False)
+    return r
@@ -1,14 +1,27 @@
+import gc
+import hashlib
+import json
+import mmap
 import os
 import struct
 import sys
 import math
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
 try:
     import unreal
     _HAS_UNREAL = True
 except Exception:
     unreal = None
     _HAS_UNREAL = False
-from PySide6 import QtWidgets, QtCore, QtGui
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    np = None
+    _HAS_NUMPY = False
+import VmdTrace
 
 
 
@@ -19,12 +32,511 @@ def _read_cstr_fixed(data: bytes, size: int, enc: str) -> str:
     return b.decode(enc, errors="replace")
 
 
+STREAM_CHUNK_RECORDS = 8192
+
+VmdChunk = namedtuple("VmdChunk", ["section", "records", "consumed", "total"])
+
+
+class VmdReadCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.cancelled:
+        raise VmdReadCancelled("VMDの読み込みがキャンセルされました。")
+
+
+if _HAS_NUMPY:
+    _BONE_DTYPE = np.dtype([
+        ("name", "V15"),
+        ("frame", "<u4"),
+        ("pos", "<f4", (3,)),
+        ("rot", "<f4", (4,)),
+        ("interp", "u1", (64,)),
+    ])
+    _MORPH_DTYPE = np.dtype([
+        ("name", "V15"),
+        ("frame", "<u4"),
+        ("weight", "<f4"),
+    ])
+    _CAMERA_DTYPE = np.dtype([
+        ("frame", "<u4"),
+        ("distance", "<f4"),
+        ("pos", "<f4", (3,)),
+        ("rot", "<f4", (3,)),
+        ("interp", "u1", (24,)),
+        ("fov", "<u4"),
+        ("perspective", "u1"),
+    ])
+    _LIGHT_DTYPE = np.dtype([
+        ("frame", "<u4"),
+        ("color", "<f4", (3,)),
+        ("direction", "<f4", (3,)),
+    ])
+    _SELF_SHADOW_DTYPE = np.dtype([
+        ("frame", "<u4"),
+        ("mode", "u1"),
+        ("distance", "<f4"),
+    ])
+else:
+    _BONE_DTYPE = None
+    _MORPH_DTYPE = None
+    _CAMERA_DTYPE = None
+    _LIGHT_DTYPE = None
+    _SELF_SHADOW_DTYPE = None
+
+
+# VMD の各セクション。offset はレコードの先頭 (件数の直後)、size はバイト数。
+# 表示/IK は 1 件の長さが IK の数で変わるので、rows に各レコードの位置を持つ (固定長のセクションは None)
+VmdSection = namedtuple("VmdSection", ["name", "offset", "count", "record_size", "size", "rows"])
+
+SECTION_BONE = "bone"
+SECTION_MORPH = "morph"
+SECTION_CAMERA = "camera"
+SECTION_LIGHT = "light"
+SECTION_SELF_SHADOW = "self_shadow"
+SECTION_IK = "ik"
+
+_FIXED_SECTIONS = (
+    (SECTION_BONE, 111),
+    (SECTION_MORPH, 23),
+    (SECTION_CAMERA, 61),
+    (SECTION_LIGHT, 28),
+    (SECTION_SELF_SHADOW, 9),
+)
+
+
+def scan_sections(buf) -> OrderedDict:
+    # ヘッダの件数だけを頼りにセクションの位置を 1 回で求める (レコードは読まない)。
+    # ボーンとモーフは必須。カメラ以降は古いファイルには無いので、無いか途中で切れていればそこで終わる
+    size = len(buf)
+    if size < 30 + 20 + 4:
+        raise ValueError("VMDファイルが短すぎます。")
+    sections = OrderedDict()
+    off = 50
+    for name, rec_size in _FIXED_SECTIONS:
+        if size < off + 4:
+            if name in (SECTION_BONE, SECTION_MORPH):
+                raise ValueError("VMDファイルが途中で切れています。")
+            return sections
+        count = struct.unpack_from("<I", buf, off)[0]
+        off += 4
+        fit = min(count, (size - off) // rec_size)
+        if fit < count and name in (SECTION_BONE, SECTION_MORPH):
+            raise ValueError("VMDファイルが途中で切れています。")
+        sections[name] = VmdSection(name, off, fit, rec_size, fit * rec_size, None)
+        off += fit * rec_size
+        if fit < count:
+            return sections
+
+    if size < off + 4:
+        return sections
+    count = struct.unpack_from("<I", buf, off)[0]
+    off += 4
+    start = off
+    rows = []
+    # 1 件 = フレーム (4) + 表示 (1) + IK の数 (4) + IK ごとに名前 (20) + 有効 (1)
+    for _ in range(count):
+        if size < off + 9:
+            break
+        n = struct.unpack_from("<I", buf, off + 5)[0]
+        rec_size = 9 + 21 * n
+        if size < off + rec_size:
+            break
+        rows.append(off)
+        off += rec_size
+    sections[SECTION_IK] = VmdSection(SECTION_IK, start, len(rows), None, off - start, rows)
+    return sections
+
+
+def _camera_keys_py(buf, off: int):
+    frame, distance, px, py, pz, rx, ry, rz = struct.unpack_from("<If3f3f", buf, off)
+    interp = bytes(buf[off + 32:off + 56])
+    fov, perspective = struct.unpack_from("<IB", buf, off + 56)
+    return (frame, distance, (px, py, pz), (rx, ry, rz), interp, fov, bool(perspective == 0))
+
+
+def _ik_key(buf, off: int, enc: str = "shift_jis"):
+    frame, show, n = struct.unpack_from("<IBI", buf, off)
+    off += 9
+    iks = {}
+    for _ in range(n):
+        name = _read_cstr_fixed(bytes(buf[off:off + 20]), 20, enc)
+        iks[name] = bool(buf[off + 20])
+        off += 21
+    return (frame, bool(show), iks)
+
+
+class _SectionAccess:
+    # self._mm (ファイル全体のバッファ) と self.sections を持つクラスに混ぜて使う
+    _SECTION_DTYPES = {
+        SECTION_BONE: "_BONE_DTYPE",
+        SECTION_MORPH: "_MORPH_DTYPE",
+        SECTION_CAMERA: "_CAMERA_DTYPE",
+        SECTION_LIGHT: "_LIGHT_DTYPE",
+        SECTION_SELF_SHADOW: "_SELF_SHADOW_DTYPE",
+    }
+
+    def section(self, name: str) -> VmdSection:
+        # ファイルに無いセクションは 0 件として返す
+        sec = self.sections.get(name)
+        if sec is None:
+            return VmdSection(name, 0, 0, dict(_FIXED_SECTIONS).get(name), 0, [] if name == SECTION_IK else None)
+        return sec
+
+    def section_view(self, name: str) -> memoryview:
+        # コピーせずにセクションのバイト列を返す (閉じる前に手放すこと)
+        sec = self.section(name)
+        return memoryview(self._mm)[sec.offset:sec.offset + sec.size]
+
+    def section_array(self, name: str):
+        # 固定長セクションをコピーせずに構造化配列として返す (NumPy が必要)
+        if not _HAS_NUMPY:
+            raise RuntimeError("NumPy がありません。")
+        if name == SECTION_IK:
+            raise ValueError("表示/IK セクションは可変長です。ik_keys() を使ってください。")
+        sec = self.section(name)
+        dtype = globals()[self._SECTION_DTYPES[name]]
+        return np.frombuffer(self._mm, dtype=dtype, count=sec.count, offset=sec.offset)
+
+    def camera_keys(self) -> list:
+        # [(frame, 距離, 位置 (3), 回転 (3, ラジアン), 補間 24 バイト, 視野角, パースあり), ...] をフレーム順で
+        sec = self.section(SECTION_CAMERA)
+        if _HAS_NUMPY:
+            recs = self.section_array(SECTION_CAMERA)
+            recs = recs[np.argsort(recs["frame"], kind="stable")]
+            interp = [bytes(r) for r in recs["interp"]]
+            return list(zip(recs["frame"].tolist(), recs["distance"].tolist(), map(tuple, recs["pos"].tolist()),
+                            map(tuple, recs["rot"].tolist()), interp, recs["fov"].tolist(),
+                            (recs["perspective"] == 0).tolist()))
+        keys = [_camera_keys_py(self._mm, sec.offset + i * 61) for i in range(sec.count)]
+        keys.sort(key=lambda k: k[0])
+        return keys
+
+    def light_keys(self) -> list:
+        # [(frame, 色 (3), 向き (3)), ...]
+        sec = self.section(SECTION_LIGHT)
+        keys = []
+        for i in range(sec.count):
+            v = struct.unpack_from("<I3f3f", self._mm, sec.offset + i * 28)
+            keys.append((v[0], v[1:4], v[4:7]))
+        keys.sort(key=lambda k: k[0])
+        return keys
+
+    def self_shadow_keys(self) -> list:
+        # [(frame, モード, 距離), ...]
+        sec = self.section(SECTION_SELF_SHADOW)
+        keys = [struct.unpack_from("<IBf", self._mm, sec.offset + i * 9) for i in range(sec.count)]
+        keys.sort(key=lambda k: k[0])
+        return keys
+
+    def ik_keys(self) -> list:
+        # [(frame, 表示, {IK 名: 有効}), ...]
+        keys = [_ik_key(self._mm, off) for off in self.section(SECTION_IK).rows]
+        keys.sort(key=lambda k: k[0])
+        return keys
+
+
+class VmdSections(_SectionAccess):
+    # セクションの位置だけを求めて mmap で開いておく。カメラや IK だけ使うときにボーンを解析しなくて済む
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = None
+        try:
+            if os.fstat(self._file.fileno()).st_size < 30 + 20 + 4:
+                raise ValueError("VMDファイルが短すぎます。")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header = _read_cstr_fixed(self._mm[0:30], 30, "ascii")
+            self.model = _read_cstr_fixed(self._mm[30:50], 20, "shift_jis")
+            self.sections = scan_sections(self._mm)
+        except BaseException:
+            self.close()
+            raise
+
+    def counts(self) -> dict:
+        return {name: sec.count for name, sec in self.sections.items()}
+
+    def close(self):
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # section_view / section_array の戻り値がまだ生きている
+                pass
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _group_names_np(raw_names, enc: str):
+    # raw_names: (n, 15) uint8。最初のNUL以降はゴミが入っていることがあるので消してからまとめる
+    n = raw_names.shape[0]
+    if n == 0:
+        return [], np.zeros(0, dtype=np.int64)
+    cleaned = raw_names.copy()
+    cleaned[np.cumsum(cleaned == 0, axis=1) > 0] = 0
+    keys = np.ascontiguousarray(cleaned).view("S%d" % raw_names.shape[1]).reshape(n)
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(n)
+
+    # 出現順にグループ番号を振り直す (デコード結果が同じ名前は一つにまとめる)
+    order = []
+    remap = np.empty(len(uniq), dtype=np.int64)
+    index_of = {}
+    for u in np.argsort(first, kind="stable"):
+        name = bytes(uniq[u]).decode(enc, errors="replace")
+        gid = index_of.get(name)
+        if gid is None:
+            gid = len(order)
+            index_of[name] = gid
+            order.append(name)
+        remap[u] = gid
+    return order, remap[inverse]
+
+
+def _split_groups_np(gids, frames, count: int):
+    perm = np.lexsort((frames, gids))
+    bounds = np.searchsorted(gids[perm], np.arange(count + 1))
+    return perm, bounds
+
+
+def _index_tracks_np(recs, progress=None, cancel=None, base: int = 0, rec_size: int = 0,
+                     chunk_records: int = STREAM_CHUNK_RECORDS):
+    # 名前ごとの (フレーム順に並べた) レコード番号を返す。
+    # 名前のまとめは chunk_records 件ずつ行い、その都度キャンセルを確かめて progress(base + 行 * rec_size) を呼ぶ
+    n = len(recs)
+    chunk_records = max(1, int(chunk_records))
+    order = []
+    index_of = {}
+    gids = np.empty(n, dtype=np.int64)
+    for lo in range(0, n, chunk_records):
+        _check_cancel(cancel)
+        if progress is not None:
+            progress(base + lo * rec_size)
+        hi = min(n, lo + chunk_records)
+        names, local = _group_names_np(
+            np.frombuffer(recs["name"][lo:hi].tobytes(), dtype=np.uint8).reshape(hi - lo, 15), "shift_jis")
+        # チャンクの中の番号を、前のチャンクまでに出てきた名前と合わせた通し番号に直す
+        remap = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            gid = index_of.get(name)
+            if gid is None:
+                gid = len(order)
+                index_of[name] = gid
+                order.append(name)
+            remap[i] = gid
+        gids[lo:hi] = remap[local]
+    _check_cancel(cancel)
+    perm, bounds = _split_groups_np(gids, recs["frame"].astype(np.int64), len(order))
+    return order, perm, bounds
+
+
+def _bone_keys_cols(frame, pos, rot, interp16) -> list:
+    return list(zip(
+        frame.astype(np.int64).tolist(),
+        zip(*pos.astype(np.float64).T.tolist()),
+        zip(*rot.astype(np.float64).T.tolist()),
+        np.ascontiguousarray(interp16).view("V16").reshape(len(frame)).tolist(),
+    ))
+
+
+def _morph_keys_cols(frame, weight) -> list:
+    return list(zip(frame.astype(np.int64).tolist(), weight.astype(np.float64).tolist()))
+
+
+def _bone_keys_np(recs) -> list:
+    return _bone_keys_cols(recs["frame"], recs["pos"], recs["rot"], recs["interp"][:, :16])
+
+
+def _morph_keys_np(recs) -> list:
+    return _morph_keys_cols(recs["frame"], recs["weight"])
+
+
+def _bone_columns(recs) -> dict:
+    return {"frame": recs["frame"], "pos": recs["pos"], "rot": recs["rot"]}
+
+
+def _morph_columns(recs) -> dict:
+    return {"frame": recs["frame"], "weight": recs["weight"]}
+
+
+def _index_tracks_py(data, base: int, count: int, rec_size: int, progress=None, cancel=None):
+    groups = {}
+    raw_order = []
+    max_f = -1
+    for row in range(count):
+        if row % STREAM_CHUNK_RECORDS == 0:
+            _check_cancel(cancel)
+            if progress is not None:
+                progress(base + row * rec_size)
+        off = base + row * rec_size
+        raw = bytes(data[off:off + 15]).split(b"\x00", 1)[0]
+        frame = struct.unpack_from("<I", data, off + 15)[0]
+        if frame > max_f:
+            max_f = frame
+        rows = groups.get(raw)
+        if rows is None:
+            rows = []
+            groups[raw] = rows
+            raw_order.append(raw)
+        rows.append((frame, row))
+
+    order = []
+    index = {}
+    for raw in raw_order:
+        name = raw.decode("shift_jis", errors="replace")
+        if name not in index:
+            index[name] = []
+            order.append(name)
+        index[name].extend(groups[raw])
+    for name in order:
+        index[name] = [row for _, row in sorted(index[name])]
+    return order, index, max_f
+
+
+def _bone_key_py(data, off: int):
+    frame, px, py, pz, rx, ry, rz, rw = struct.unpack_from("<I3f4f", data, off + 15)
+    return (frame, (px, py, pz), (rx, ry, rz, rw), bytes(data[off + 47:off + 63]))
+
+
+def _morph_key_py(data, off: int):
+    frame, weight = struct.unpack_from("<If", data, off + 15)
+    return (frame, weight)
+
+
+def _decode_chunk_py(buf: bytes, count: int, rec_size: int, key_fn, names: dict) -> list:
+    records = []
+    for i in range(count):
+        off = i * rec_size
+        raw = buf[off:off + 15].split(b"\x00", 1)[0]
+        name = names.get(raw)
+        if name is None:
+            name = raw.decode("shift_jis", errors="replace")
+            names[raw] = name
+        records.append((name, key_fn(buf, off)))
+    return records
+
+
+def _decode_chunk_np(buf: bytes, count: int, dtype, keys_fn) -> list:
+    recs = np.frombuffer(buf, dtype=dtype, count=count)
+    order, gids = _group_names_np(
+        np.frombuffer(recs["name"].tobytes(), dtype=np.uint8).reshape(count, 15), "shift_jis")
+    return list(zip([order[g] for g in gids.tolist()], keys_fn(recs)))
+
+
+def _iter_section(f, section: str, count: int, rec_size: int, consumed: int, total: int,
+                  chunk_records: int, cancel):
+    names = {}
+    left = count
+    while left > 0:
+        _check_cancel(cancel)
+        n = min(left, chunk_records)
+        buf = f.read(n * rec_size)
+        if len(buf) < n * rec_size:
+            raise ValueError("VMDファイルが途中で切れています。")
+        if _HAS_NUMPY:
+            if section == "bones":
+                records = _decode_chunk_np(buf, n, _BONE_DTYPE, _bone_keys_np)
+            else:
+                records = _decode_chunk_np(buf, n, _MORPH_DTYPE, _morph_keys_np)
+        else:
+            key_fn = _bone_key_py if section == "bones" else _morph_key_py
+            records = _decode_chunk_py(buf, n, rec_size, key_fn, names)
+        left -= n
+        consumed += n * rec_size
+        yield VmdChunk(section, records, consumed, total)
+
+
 class VmdReader:
     @staticmethod
     def read(path: str) -> dict:
-        with open(path, "rb") as f:
-            data = f.read()
+        with VmdTrace.span("VmdReader.read"):
+            with open(path, "rb") as f:
+                data = f.read()
+
+            if _HAS_NUMPY:
+                return VmdReader._read_numpy(data)
+            return VmdReader._read_python(data)
+
+    @staticmethod
+    def _read_numpy(data: bytes) -> dict:
+        # キー数十万個分のタプルを作るので、その間だけGCを止める
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return VmdReader._read_numpy_body(data)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
 
+    @staticmethod
+    def _read_numpy_body(data: bytes) -> dict:
+        off = 0
+        if len(data) < 30 + 20 + 4:
+            raise ValueError("VMDファイルが短すぎます。")
+
+        header = _read_cstr_fixed(data[off:off + 30], 30, "ascii")
+        off += 30
+        model = _read_cstr_fixed(data[off:off + 20], 20, "shift_jis")
+        off += 20
+
+        bone_count = struct.unpack_from("<I", data, off)[0]
+        off += 4
+        if len(data) < off + bone_count * _BONE_DTYPE.itemsize + 4:
+            raise ValueError("VMDファイルが途中で切れています。")
+        brec = np.frombuffer(data, dtype=_BONE_DTYPE, count=bone_count, offset=off)
+        off += bone_count * _BONE_DTYPE.itemsize
+
+        morph_count = struct.unpack_from("<I", data, off)[0]
+        off += 4
+        if len(data) < off + morph_count * _MORPH_DTYPE.itemsize:
+            raise ValueError("VMDファイルが途中で切れています。")
+        mrec = np.frombuffer(data, dtype=_MORPH_DTYPE, count=morph_count, offset=off)
+
+        bone_order, perm, bounds = _index_tracks_np(brec)
+        keys = _bone_keys_np(brec[perm])
+        bones = {}
+        for gi, name in enumerate(bone_order):
+            bones[name] = keys[int(bounds[gi]):int(bounds[gi + 1])]
+
+        morph_order, perm, bounds = _index_tracks_np(mrec)
+        keys = _morph_keys_np(mrec[perm])
+        morphs = {}
+        for gi, name in enumerate(morph_order):
+            morphs[name] = keys[int(bounds[gi]):int(bounds[gi + 1])]
+
+        return {
+            "header": header,
+            "model": model,
+            "bones": bones,
+            "bone_order": bone_order,
+            "morphs": morphs,
+            "morph_order": morph_order,
+        }
+
+    @staticmethod
+    def _read_python(data: bytes) -> dict:
         off = 0
         if len(data) < 30 + 20 + 4:
             raise ValueError("VMDファイルが短すぎます。")
@@ -90,19 +602,520 @@ class VmdReader:
         }
 
 
+    @staticmethod
+    def open(path: str, progress=None, cancel=None, cache=None) -> "MappedVmd":
+        # cache (VmdParseCache) を渡すと、前回の解析結果があればそれを mmap で開き、無ければ解析して書き出す
+        with VmdTrace.span("VmdReader.open"):
+            if cache is not None and _HAS_NUMPY:
+                _check_cancel(cancel)
+                with VmdTrace.span("cache_load"):
+                    cached = cache.load(path)
+                if cached is not None:
+                    if progress is not None:
+                        progress(cached.size, cached.size)
+                    return cached
+            vmd = MappedVmd(path, progress=progress, cancel=cancel)
+            if cache is not None and _HAS_NUMPY:
+                try:
+                    with VmdTrace.span("cache_store"):
+                        cache.store(path, vmd)
+                except Exception as e:
+                    print(f"解析キャッシュを書き込めませんでした: {e}")
+            return vmd
+
+    @staticmethod
+    def open_sections(path: str) -> "VmdSections":
+        # ボーン/モーフを解析せずに全セクションの位置だけを求める
+        return VmdSections(path)
+
+    @staticmethod
+    def iter_chunks(path: str, chunk_records: int = STREAM_CHUNK_RECORDS, cancel=None):
+        # 最初に ("header", [(header, model)]) を、続いて最大 chunk_records 件ずつ
+        # ("bones", [(name, key), ...]) / ("morphs", [(name, key), ...]) を返す
+        chunk_records = max(1, int(chunk_records))
+        with open(path, "rb") as f:
+            total = os.fstat(f.fileno()).st_size
+            head = f.read(30 + 20 + 4)
+            if len(head) < 30 + 20 + 4:
+                raise ValueError("VMDファイルが短すぎます。")
+            header = _read_cstr_fixed(head[0:30], 30, "ascii")
+            model = _read_cstr_fixed(head[30:50], 20, "shift_jis")
+            bone_count = struct.unpack_from("<I", head, 50)[0]
+            consumed = len(head)
+            yield VmdChunk("header", [(header, model)], consumed, total)
+
+            if consumed + bone_count * 111 + 4 > total:
+                raise ValueError("VMDファイルが途中で切れています。")
+            for chunk in _iter_section(f, "bones", bone_count, 111, consumed, total, chunk_records, cancel):
+                consumed = chunk.consumed
+                yield chunk
+
+            buf = f.read(4)
+            morph_count = struct.unpack_from("<I", buf, 0)[0]
+            consumed += 4
+            if consumed + morph_count * 23 > total:
+                raise ValueError("VMDファイルが途中で切れています。")
+            for chunk in _iter_section(f, "morphs", morph_count, 23, consumed, total, chunk_records, cancel):
+                consumed = chunk.consumed
+                yield chunk
+
+    @staticmethod
+    def read_stream(path: str, progress=None, cancel=None, chunk_records: int = STREAM_CHUNK_RECORDS) -> dict:
+        # read() と同じ辞書を返すが、ファイル全体を一度にメモリへ載せない
+        result = {
+            "header": "",
+            "model": "",
+            "bones": {},
+            "bone_order": [],
+            "morphs": {},
+            "morph_order": [],
+        }
+        for chunk in VmdReader.iter_chunks(path, chunk_records=chunk_records, cancel=cancel):
+            if chunk.section == "header":
+                result["header"], result["model"] = chunk.records[0]
+            else:
+                tracks = result[chunk.section]
+                order = result["bone_order" if chunk.section == "bones" else "morph_order"]
+                for name, key in chunk.records:
+                    keys = tracks.get(name)
+                    if keys is None:
+                        keys = []
+                        tracks[name] = keys
+                        order.append(name)
+                    keys.append(key)
+            total = chunk.total
+            if progress is not None:
+                progress(chunk.consumed, total)
+        if progress is not None:
+            progress(total, total)
+
+        for v in result["bones"].values():
+            v.sort(key=lambda t: t[0])
+        for v in result["morphs"].values():
+            v.sort(key=lambda t: t[0])
+        return result
+
+
+class _LazyTracks(Mapping):
+    _CACHE_SIZE = 8
+
+    def __init__(self, order, index, decode, columns=None):
+        self._order = order
+        self._index = index
+        self._decode = decode
+        self._columns = columns
+        self._cache = OrderedDict()
+
+    def __getitem__(self, name):
+        keys = self._cache.get(name)
+        if keys is not None:
+            self._cache.move_to_end(name)
+            return keys
+        keys = self._decode(self._index[name])
+        self._cache[name] = keys
+        if len(self._cache) > self._CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return keys
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def count(self, name) -> int:
+        return len(self._index[name])
+
+    def columns(self, name):
+        # タプルを作らずに、そのトラックの列 (NumPy 配列の dict) を返す。使えなければ None
+        if self._columns is None or name not in self._index:
+            return None
+        return self._columns(self._index[name])
+
+    def counts(self) -> dict:
+        return {name: len(self._index[name]) for name in self._order}
+
+    def clear_cache(self):
+        self._cache.clear()
+
+
+class MappedVmd(dict, _SectionAccess):
+    # VmdReader.read と同じキーを持つが、bones/morphs はトラックを要求されたときに初めてデコードする
+    def __init__(self, path: str, progress=None, cancel=None):
+        super().__init__()
+        self.path = path
+        self._file = None
+        self._mm = None
+        self._brec = None
+        self._mrec = None
+        self._file = open(path, "rb")
+        try:
+            self._build_index(progress, cancel)
+        except BaseException:
+            self.close()
+            raise
+
+    def _build_index(self, progress, cancel):
+        size = os.fstat(self._file.fileno()).st_size
+        report = None
+        if progress is not None:
+            report = lambda consumed: progress(consumed, size)
+        if size < 30 + 20 + 4:
+            raise ValueError("VMDファイルが短すぎます。")
+        mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mm = mm
+
+        header = _read_cstr_fixed(mm[0:30], 30, "ascii")
+        model = _read_cstr_fixed(mm[30:50], 20, "shift_jis")
+        self.sections = scan_sections(mm)
+        bone_off = self.sections[SECTION_BONE].offset
+        bone_count = self.sections[SECTION_BONE].count
+        morph_off = self.sections[SECTION_MORPH].offset
+        morph_count = self.sections[SECTION_MORPH].count
+
+        _check_cancel(cancel)
+        if _HAS_NUMPY:
+            self._brec = np.frombuffer(mm, dtype=_BONE_DTYPE, count=bone_count, offset=bone_off)
+            self._mrec = np.frombuffer(mm, dtype=_MORPH_DTYPE, count=morph_count, offset=morph_off)
+            bone_order, perm, bounds = _index_tracks_np(self._brec, report, cancel, bone_off, 111)
+            bone_index = {name: perm[bounds[i]:bounds[i + 1]] for i, name in enumerate(bone_order)}
+            morph_order, perm, bounds = _index_tracks_np(self._mrec, report, cancel, morph_off, 23)
+            morph_index = {name: perm[bounds[i]:bounds[i + 1]] for i, name in enumerate(morph_order)}
+            max_f = -1
+            if bone_count:
+                max_f = max(max_f, int(self._brec["frame"].max()))
+            if morph_count:
+                max_f = max(max_f, int(self._mrec["frame"].max()))
+            bones = _LazyTracks(bone_order, bone_index, lambda rows: _bone_keys_np(self._brec[rows]),
+                                lambda rows: _bone_columns(self._brec[rows]))
+            morphs = _LazyTracks(morph_order, morph_index, lambda rows: _morph_keys_np(self._mrec[rows]),
+                                 lambda rows: _morph_columns(self._mrec[rows]))
+        else:
+            bone_order, bone_index, bmax = _index_tracks_py(mm, bone_off, bone_count, 111, report, cancel)
+            morph_order, morph_index, mmax = _index_tracks_py(mm, morph_off, morph_count, 23, report, cancel)
+            max_f = max(bmax, mmax)
+            bones = _LazyTracks(
+                bone_order, bone_index,
+                lambda rows: [_bone_key_py(self._mm, bone_off + r * 111) for r in rows])
+            morphs = _LazyTracks(
+                morph_order, morph_index,
+                lambda rows: [_morph_key_py(self._mm, morph_off + r * 23) for r in rows])
+
+        self.size = size
+        self.update({
+            "header": header,
+            "model": model,
+            "bones": bones,
+            "bone_order": bone_order,
+            "morphs": morphs,
+            "morph_order": morph_order,
+            "bone_counts": bones.counts(),
+            "morph_counts": morphs.counts(),
+            "max_frame": max_f,
+        })
+        if report is not None:
+            report(size)
+
+    def _columns(self) -> dict:
+        # 解析キャッシュ用。レコードをトラック順 (名前ごと、フレーム順) に並べ替えた列
+        bones = self["bones"]
+        morphs = self["morphs"]
+        bperm = [bones._index[n] for n in self["bone_order"]]
+        mperm = [morphs._index[n] for n in self["morph_order"]]
+        bperm = np.concatenate(bperm) if bperm else np.zeros(0, dtype=np.int64)
+        mperm = np.concatenate(mperm) if mperm else np.zeros(0, dtype=np.int64)
+        brec = self._brec[bperm]
+        mrec = self._mrec[mperm]
+        return {
+            "bone_start": np.concatenate([[0], np.cumsum([len(bones._index[n]) for n in self["bone_order"]])]),
+            "bone_frame": brec["frame"],
+            "bone_pos": brec["pos"],
+            "bone_rot": brec["rot"],
+            "bone_interp": np.ascontiguousarray(brec["interp"][:, :16]),
+            "morph_start": np.concatenate([[0], np.cumsum([len(morphs._index[n]) for n in self["morph_order"]])]),
+            "morph_frame": mrec["frame"],
+            "morph_weight": mrec["weight"],
+        }
+
+    def sha256(self) -> str:
+        return hashlib.sha256(self._mm).hexdigest()
+
+    def close(self):
+        for key in ("bones", "morphs"):
+            tracks = self.get(key)
+            if isinstance(tracks, _LazyTracks):
+                tracks.clear_cache()
+        self._brec = None
+        self._mrec = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def cache_dir(kind: str) -> str:
+    # キャッシュ置き場。エディタ内では Saved/VmdLoader/<kind>、それ以外は ~/.cache/vmdloader/<kind>
+    root = os.environ.get("VMDLOADER_CACHE_DIR")
+    if not root and unreal is not None:
+        try:
+            root = os.path.join(os.path.abspath(unreal.Paths.project_saved_dir()), "VmdLoader")
+        except Exception:
+            root = None
+    if not root:
+        root = os.path.join(os.path.expanduser("~"), ".cache", "vmdloader")
+    return os.path.join(root, kind)
+
+
+# 解析キャッシュのファイル: 固定ヘッダ + JSON (名前表と列の位置) + 64 バイト境界に揃えた列
+#   列の位置は JSON の後ろ (64 バイト境界) からの相対位置
+#   ヘッダ: magic, version, 元ファイルのサイズ, 更新時刻 (ns), sha256, JSON の長さ
+_PARSE_MAGIC = b"VMDCACHE"
+_PARSE_VERSION = 1
+_PARSE_HEADER = struct.Struct("<8sIQq32sI")
+_PARSE_ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + _PARSE_ALIGN - 1) // _PARSE_ALIGN * _PARSE_ALIGN
+
+
+class CachedVmd(dict):
+    # 解析キャッシュを mmap で開いたもの。MappedVmd と同じキーを持ち、名前のデコードも並べ替えもしない
+    def __init__(self, path: str, cache_path: str, info: dict, file, mm, data_start: int):
+        super().__init__()
+        self.path = path
+        self.cache_path = cache_path
+        self.size = info["source_size"]
+        self.digest = info["sha256"]
+        self._file = file
+        self._mm = mm
+        cols = {}
+        for name, (offset, dtype, shape) in info["columns"].items():
+            count = 1
+            for d in shape:
+                count *= d
+            cols[name] = np.frombuffer(mm, dtype=np.dtype(dtype), count=count,
+                                       offset=data_start + offset).reshape(shape)
+        self._cols = cols
+
+        bone_order = info["bone_order"]
+        morph_order = info["morph_order"]
+        bstart = cols["bone_start"].tolist()
+        mstart = cols["morph_start"].tolist()
+        bone_index = {n: range(bstart[i], bstart[i + 1]) for i, n in enumerate(bone_order)}
+        morph_index = {n: range(mstart[i], mstart[i + 1]) for i, n in enumerate(morph_order)}
+        bones = _LazyTracks(bone_order, bone_index, self._bone_keys, self._bone_columns)
+        morphs = _LazyTracks(morph_order, morph_index, self._morph_keys, self._morph_columns)
+        self.update({
+            "header": info["header"],
+            "model": info["model"],
+            "bones": bones,
+            "bone_order": bone_order,
+            "morphs": morphs,
+            "morph_order": morph_order,
+            "bone_counts": bones.counts(),
+            "morph_counts": morphs.counts(),
+            "max_frame": info["max_frame"],
+        })
+
+    def _bone_keys(self, rows):
+        c = self._cols
+        sl = slice(rows.start, rows.stop)
+        return _bone_keys_cols(c["bone_frame"][sl], c["bone_pos"][sl], c["bone_rot"][sl], c["bone_interp"][sl])
+
+    def _morph_keys(self, rows):
+        c = self._cols
+        sl = slice(rows.start, rows.stop)
+        return _morph_keys_cols(c["morph_frame"][sl], c["morph_weight"][sl])
+
+    def _bone_columns(self, rows):
+        c = self._cols
+        sl = slice(rows.start, rows.stop)
+        return {"frame": c["bone_frame"][sl], "pos": c["bone_pos"][sl], "rot": c["bone_rot"][sl]}
+
+    def _morph_columns(self, rows):
+        c = self._cols
+        sl = slice(rows.start, rows.stop)
+        return {"frame": c["morph_frame"][sl], "weight": c["morph_weight"][sl]}
+
+    def sha256(self) -> str:
+        return self.digest
+
+    def close(self):
+        for key in ("bones", "morphs"):
+            tracks = self.get(key)
+            if isinstance(tracks, _LazyTracks):
+                tracks.clear_cache()
+        self._cols = {}
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class VmdParseCache:
+    # VmdReader.open(path, cache=VmdParseCache()) で使う。
+    # sidecar=True なら VMD の隣に <name>.vmd.vmdc を、それ以外は cache_dir("parse") にまとめて置く。
+    # サイズと更新時刻が一致すればそのまま使い、違えば中身のハッシュを比べて、変わっていれば捨てる。
+    SUFFIX = ".vmdc"
+
+    def __init__(self, root: str = None, sidecar: bool = False):
+        self.root = root or cache_dir("parse")
+        self.sidecar = sidecar
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, path: str) -> str:
+        path = os.path.abspath(path)
+        if self.sidecar:
+            return path + self.SUFFIX
+        name = hashlib.sha1(os.path.normcase(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, name[:2], name + self.SUFFIX)
+
+    def load(self, path: str):
+        cache_path = self.path_for(path)
+        if not os.path.isfile(cache_path):
+            self.misses += 1
+            return None
+        f = None
+        mm = None
+        try:
+            st = os.stat(path)
+            f = open(cache_path, "rb")
+            head = f.read(_PARSE_HEADER.size)
+            magic, version, size, mtime_ns, digest, meta_len = _PARSE_HEADER.unpack(head)
+            if magic != _PARSE_MAGIC or version != _PARSE_VERSION or size != st.st_size:
+                raise ValueError("stale")
+            if mtime_ns != st.st_mtime_ns:
+                # 触っただけで中身が同じなら更新時刻だけ書き換えて使う
+                if _hash_file(path) != digest.hex():
+                    raise ValueError("stale")
+                self._touch(cache_path, st.st_mtime_ns)
+            info = json.loads(f.read(meta_len).decode("utf-8"))
+            info["source_size"] = size
+            info["sha256"] = digest.hex()
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            vmd = CachedVmd(path, cache_path, info, f, mm, _align(_PARSE_HEADER.size + meta_len))
+        except Exception:
+            if mm is not None:
+                mm.close()
+            if f is not None:
+                f.close()
+            self.misses += 1
+            self.invalidate(path)
+            return None
+        self.hits += 1
+        return vmd
+
+    @staticmethod
+    def _touch(cache_path: str, mtime_ns: int):
+        with open(cache_path, "r+b") as f:
+            f.seek(8 + 4 + 8)
+            f.write(struct.pack("<q", mtime_ns))
+
+    def store(self, path: str, vmd: "MappedVmd"):
+        st = os.stat(path)
+        cols = vmd._columns()
+        cols["bone_start"] = np.asarray(cols["bone_start"], dtype=np.int64)
+        cols["morph_start"] = np.asarray(cols["morph_start"], dtype=np.int64)
+        info = {
+            "header": vmd["header"],
+            "model": vmd["model"],
+            "bone_order": list(vmd["bone_order"]),
+            "morph_order": list(vmd["morph_order"]),
+            "max_frame": int(vmd["max_frame"]),
+            "columns": {},
+        }
+        off = 0
+        for name, arr in cols.items():
+            info["columns"][name] = [off, arr.dtype.str, list(arr.shape)]
+            off = _align(off + arr.nbytes)
+        meta = json.dumps(info, ensure_ascii=False).encode("utf-8")
+        data_start = _align(_PARSE_HEADER.size + len(meta))
+
+        cache_path = self.path_for(path)
+        d = os.path.dirname(cache_path)
+        if not os.path.isdir(d):
+            os.makedirs(d, exist_ok=True)
+        tmp = cache_path + ".tmp%d.%d" % (os.getpid(), threading.get_ident())
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_PARSE_HEADER.pack(_PARSE_MAGIC, _PARSE_VERSION, st.st_size, st.st_mtime_ns,
+                                           bytes.fromhex(vmd.sha256()), len(meta)))
+                f.write(meta)
+                for name, arr in cols.items():
+                    off = data_start + info["columns"][name][0]
+                    f.write(b"\x00" * (off - f.tell()))
+                    f.write(np.ascontiguousarray(arr).tobytes())
+            os.replace(tmp, cache_path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            raise
+        return cache_path
+
+    def invalidate(self, path: str):
+        try:
+            os.remove(self.path_for(path))
+        except Exception:
+            pass
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(1 << 20)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
 
 def _infer_total_frames(vmd: dict, fps: float = None) -> int:
-    max_f = -1
-    bones = vmd.get("bones", {}) or {}
-    morphs = vmd.get("morphs", {}) or {}
-    for keys in bones.values():
-        for k in keys:
-            f = k[0]
-            if f > max_f:
-                max_f = f
-    for keys in morphs.values():
-        for k in keys:
-            f = k[0]
-            if f > max_f:
-                max_f = f
-    return max(1, int(max_f) + 1)
+    if vmd.get("max_frame") is not None:
+        return max(1, int(vmd["max_frame"]) + 1)
+    with VmdTrace.span("_infer_total_frames"):
+        max_f = -1
+        bones = vmd.get("bones", {}) or {}
+        morphs = vmd.get("morphs", {}) or {}
+        for keys in bones.values():
+            for k in keys:
+                f = k[0]
+                if f > max_f:
+                    max_f = f
+        for keys in morphs.values():
+            for k in keys:
+                f = k[0]
+                if f > max_f:
+                    max_f = f
+        return max(1, int(max_f) + 1)
@@ -0,0 +1,397 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+try:
+    import unreal
+    _HAS_UNREAL = True
+except Exception:
+    unreal = None
+    _HAS_UNREAL = False
+from VmdReader import cache_dir
+import VmdEngine
+
+# メッシュごとのボーン表 (名前 → インデックス、親、参照ポーズ) とモーフ名。
+# インポートのたびにボーン 1 本ずつエンジンに問い合わせないよう、メッシュのパスとパッケージの保存状態を
+# キーにしてメモリ (LRU) とディスクに持つ。
+# 保存状態はパッケージファイルのサイズと更新時刻。未保存の変更があるメッシュはキャッシュしない。
+# 取り出すときのエンジン呼び出しは VmdEngine 経由で数えられる。
+# ボーン名は名前解決に全部要るので最初に取る。UE 5.4 以降の SkeletonModifier (Skeletal Mesh Modeling Tools
+# プラグイン) が使えれば 1 回で、無ければ SkeletalMeshComponent で 1 本ずつ。
+# 参照ポーズと親は使うボーンの分だけ、初めて要求されたときに取ってキャッシュに足す。
+# (メッシュの参照ポーズを一度に返す API は無い。AnimPoseExtensions.get_reference_pose はスケルトンの
+# 参照ポーズで、メッシュのものとは違うことがあるので使わない)
+SKELETON_INFO_VERSION = 2
+
+
+class SkeletonInfo:
+    # ref_pos / ref_rot / parents はまだ取っていないボーンが None
+    def __init__(self, mesh_path: str, version, skeleton_path: str = "", bone_names=(), parents=None,
+                 ref_pos=None, ref_rot=None, morph_target_names=()):
+        self.mesh_path = mesh_path
+        self.version = version
+        self.skeleton_path = skeleton_path
+        self.bone_names = list(bone_names)
+        n = len(self.bone_names)
+        self.parents = [None if p is None else int(p) for p in parents] if parents is not None else [None] * n
+        self.ref_pos = [None if p is None else tuple(float(v) for v in p) for p in ref_pos] \
+            if ref_pos is not None else [None] * n
+        self.ref_rot = [None if q is None else tuple(float(v) for v in q) for q in ref_rot] \
+            if ref_rot is not None else [None] * n
+        self.morph_target_names = set(morph_target_names)
+        self.bone_index = {name: i for i, name in enumerate(self.bone_names)}
+        self._source = None
+        self._on_fill = None
+        self._lock = threading.Lock()
+
+    def attach(self, source, on_fill=None):
+        # 足りないボーンを取りに行く先 (_BoneSource) と、取ったあとに呼ぶもの (ディスクへの書き戻し)
+        self._source = source
+        self._on_fill = on_fill
+
+    def complete(self) -> bool:
+        return None not in self.ref_pos and None not in self.parents
+
+    def _fill(self, indices, pose: bool = True, parents: bool = False):
+        src = self._source
+        filled = False
+        with self._lock:
+            for i in indices:
+                name = self.bone_names[i]
+                if pose and self.ref_pos[i] is None and src is not None:
+                    self.ref_pos[i], self.ref_rot[i] = src.ref_pose(i, name)
+                    filled = True
+                if parents and self.parents[i] is None and src is not None:
+                    self.parents[i] = self.bone_index.get(src.parent(i, name), -1)
+                    filled = True
+        if filled and self._on_fill is not None:
+            self._on_fill(self)
+
+    def index(self, bone_name: str) -> int:
+        return self.bone_index.get(bone_name, -1)
+
+    def parent(self, bone_name: str):
+        i = self.index(bone_name)
+        if i < 0:
+            return None
+        self._fill([i], pose=False, parents=True)
+        p = self.parents[i]
+        if p is None or p < 0:
+            return None
+        return self.bone_names[p]
+
+    def ref_offsets(self, bone_names) -> dict:
+        # {ボーン名: 参照ポーズの位置 (x, y, z)}。メッシュに無いボーンは含めない
+        found = [(bn, self.bone_index[bn]) for bn in bone_names if bn in self.bone_index]
+        self._fill([i for _, i in found])
+        return {bn: self.ref_pos[i] if self.ref_pos[i] is not None else (0.0, 0.0, 0.0) for bn, i in found}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "format": SKELETON_INFO_VERSION,
+                "mesh_path": self.mesh_path,
+                "version": self.version,
+                "skeleton_path": self.skeleton_path,
+                "bone_names": self.bone_names,
+                "parents": list(self.parents),
+                "ref_pos": list(self.ref_pos),
+                "ref_rot": list(self.ref_rot),
+                "morph_target_names": sorted(self.morph_target_names),
+            }
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        if d.get("format") != SKELETON_INFO_VERSION:
+            raise ValueError("format")
+        return cls(d["mesh_path"], d["version"], d.get("skeleton_path", ""), d["bone_names"], d["parents"],
+                   d["ref_pos"], d["ref_rot"], d.get("morph_target_names", ()))
+
+
+def _mesh_path(skeletal_mesh) -> str:
+    try:
+        return str(skeletal_mesh.get_path_name())
+    except Exception:
+        return ""
+
+
+def _package_version(mesh_path: str):
+    # パッケージファイルの "サイズ:更新時刻"。未保存の変更があれば "dirty"、ファイルが分からなければ None
+    package = mesh_path.split(".", 1)[0]
+    try:
+        for p in unreal.EditorLoadingAndSavingUtils.get_dirty_content_packages():
+            if str(p.get_name()) == package:
+                return "dirty"
+    except Exception:
+        pass
+    if not package.startswith("/Game/"):
+        return None
+    try:
+        content = os.path.abspath(unreal.Paths.project_content_dir())
+        path = os.path.join(content, *package[len("/Game/"):].split("/")) + ".uasset"
+        st = os.stat(path)
+    except Exception:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _attach_mesh(skeletal_mesh):
+    comp = unreal.SkeletalMeshComponent()
+    if hasattr(comp, 'set_skeletal_mesh_asset'):
+        try:
+            comp.set_skeletal_mesh_asset(skeletal_mesh)
+            return comp
+        except Exception:
+            pass
+    for prop in ('skeletal_mesh', 'skinned_asset', 'skeletal_mesh_asset', 'SkeletalMesh'):
+        try:
+            comp.set_editor_property(prop, skeletal_mesh)
+            return comp
+        except Exception:
+            pass
+    return None
+
+
+class _BoneSource:
+    # エンジンからボーンの情報を取る。SkeletonModifier があればそれ、無ければ SkeletalMeshComponent。
+    # どちらも最初に要ったときに作る
+    def __init__(self, skeletal_mesh):
+        self.mesh = skeletal_mesh
+        self._modifier = None
+        self._comp = None
+        self._tried_modifier = False
+        self._tried_comp = False
+
+    def modifier(self):
+        if not self._tried_modifier:
+            self._tried_modifier = True
+            cls = getattr(unreal, "SkeletonModifier", None)
+            if cls is not None:
+                try:
+                    mod = cls()
+                    if VmdEngine.call("modifier.set_skeletal_mesh", mod.set_skeletal_mesh, self.mesh) is not False:
+                        self._modifier = mod
+                except Exception:
+                    self._modifier = None
+        return self._modifier
+
+    def component(self):
+        if not self._tried_comp:
+            self._tried_comp = True
+            try:
+                self._comp = _attach_mesh(self.mesh)
+            except Exception:
+                self._comp = None
+        return self._comp
+
+    def bone_names(self) -> list:
+        mod = self.modifier()
+        if mod is not None:
+            try:
+                return [str(n) for n in VmdEngine.call("modifier.get_all_bone_names", mod.get_all_bone_names)]
+            except Exception:
+                self._modifier = None
+        comp = self.component()
+        if comp is None:
+            return []
+        try:
+            num = int(VmdEngine.call("component.get_num_bones", comp.get_num_bones))
+        except Exception:
+            num = 0
+        names = []
+        for i in range(num):
+            try:
+                names.append(str(VmdEngine.call("component.get_bone_name", comp.get_bone_name, i)))
+            except Exception:
+                break
+        return names
+
+    def ref_pose(self, i: int, name: str):
+        # (位置, 回転)。取れなければ原点と単位回転
+        p = None
+        q = (0.0, 0.0, 0.0, 1.0)
+        mod = self.modifier()
+        comp = self.component() if mod is None else None
+        try:
+            if mod is not None:
+                t = VmdEngine.call("modifier.get_bone_transform", mod.get_bone_transform, name, False)
+            else:
+                t = VmdEngine.call("component.get_ref_pose_transform", comp.get_ref_pose_transform, i)
+            p = t.translation
+            r = t.rotation
+            q = (float(r.x), float(r.y), float(r.z), float(r.w))
+        except Exception:
+            if comp is not None:
+                try:
+                    p = VmdEngine.call("component.get_ref_pose_position", comp.get_ref_pose_position, i)
+                except Exception:
+                    p = None
+        pos = (float(p.x), float(p.y), float(p.z)) if p is not None else (0.0, 0.0, 0.0)
+        return pos, q
+
+    def parent(self, i: int, name: str) -> str:
+        mod = self.modifier()
+        try:
+            if mod is not None:
+                return str(VmdEngine.call("modifier.get_parent_name", mod.get_parent_name, name))
+            comp = self.component()
+            if comp is not None:
+                return str(VmdEngine.call("component.get_parent_bone", comp.get_parent_bone, name))
+        except Exception:
+            pass
+        return "None"
+
+
+def extract_skeleton_info(skeletal_mesh, mesh_path: str = None, version=None) -> SkeletonInfo:
+    # エンジンからボーン名とモーフ名を取り出す。参照ポーズと親は要ったときに取る。取れなかったものは空のまま返す
+    mesh_path = mesh_path if mesh_path is not None else _mesh_path(skeletal_mesh)
+    skeleton_path = ""
+    try:
+        skeleton_path = str(skeletal_mesh.get_editor_property("skeleton").get_path_name())
+    except Exception:
+        pass
+    try:
+        morph_names = [str(n) for n in VmdEngine.call("mesh.get_all_morph_target_names",
+                                                       skeletal_mesh.get_all_morph_target_names)]
+    except Exception:
+        morph_names = []
+
+    source = _BoneSource(skeletal_mesh)
+    info = SkeletonInfo(mesh_path, version, skeleton_path, source.bone_names(), morph_target_names=morph_names)
+    info.attach(source)
+    return info
+
+
+class SkeletonInfoCache:
+    def __init__(self, max_entries: int = 16, root: str = None, persist: bool = True):
+        self.max_entries = max(1, int(max_entries))
+        self.root = root
+        self.persist = persist
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, mesh_path: str) -> str:
+        root = self.root or cache_dir("skeleton")
+        return os.path.join(root, hashlib.sha1(mesh_path.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_disk(self, mesh_path: str, version):
+        try:
+            with open(self._disk_path(mesh_path), "r", encoding="utf-8") as f:
+                info = SkeletonInfo.from_dict(json.load(f))
+        except Exception:
+            return None
+        if info.mesh_path != mesh_path or info.version != version:
+            return None
+        return info
+
+    def _store_disk(self, info: SkeletonInfo):
+        path = self._disk_path(info.mesh_path)
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(info.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"スケルトン情報のキャッシュを書き込めませんでした: {e}")
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+
+    def get(self, skeletal_mesh) -> SkeletonInfo:
+        mesh_path = _mesh_path(skeletal_mesh)
+        version = _package_version(mesh_path) if mesh_path else "dirty"
+        if version == "dirty":
+            # 保存されていない変更は追えないので毎回取り直す
+            with self._lock:
+                self.misses += 1
+            return extract_skeleton_info(skeletal_mesh, mesh_path, version)
+
+        # ファイルの分からないパッケージはセッション中のメモリだけに持つ
+        persist = self.persist and version is not None
+        on_fill = self._store_disk if persist else None
+
+        with self._lock:
+            info = self._entries.get(mesh_path)
+            if info is not None and info.version == version:
+                self.hits += 1
+                self._entries.move_to_end(mesh_path)
+                if not info.complete():
+                    info.attach(_BoneSource(skeletal_mesh), on_fill)
+                return info
+        info = self._load_disk(mesh_path, version) if persist else None
+        if info is not None:
+            with self._lock:
+                self.disk_hits += 1
+            if not info.complete():
+                info.attach(_BoneSource(skeletal_mesh), on_fill)
+        else:
+            info = extract_skeleton_info(skeletal_mesh, mesh_path, version)
+            info.attach(info._source, on_fill)
+            with self._lock:
+                self.misses += 1
+            if persist and info.bone_names:
+                self._store_disk(info)
+        with self._lock:
+            self._entries[mesh_path] = info
+            self._entries.move_to_end(mesh_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def invalidate(self, skeletal_mesh=None):
+        # メッシュを指定しなければ全部
+        with self._lock:
+            if skeletal_mesh is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(_mesh_path(skeletal_mesh), None)
+
+    def clear(self):
+        self.invalidate()
+        root = self.root or cache_dir("skeleton")
+        try:
+            for n in os.listdir(root):
+                if n.endswith(".json"):
+                    os.remove(os.path.join(root, n))
+        except Exception:
+            pass
+        with self._lock:
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+_SKELETON_INFO = SkeletonInfoCache()
+
+
+def skeleton_info_cache() -> SkeletonInfoCache:
+    return _SKELETON_INFO
+
+
+def skeleton_info(skeletal_mesh):
+    # メッシュが無い、エディタ外のときは None
+    if unreal is None or skeletal_mesh is None:
+        return None
+    return _SKELETON_INFO.get(skeletal_mesh)
@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+
+# インポートの段階ごとの時間を測る入れ子の区間 (span)。
+#   with VmdTrace.session("VMDインポート"):
+#       with VmdTrace.span("apply_bones"):
+#           ...
+# session の外の span は何もしない (属性を 1 つ見るだけ) ので、計測箇所は常に置いたままでよい。
+# session はスレッドごと。ワーカースレッドの中の span は数えず、呼び出し側の区間に含まれる。
+# 区間ごとに経過時間、CPU 時間 (プロセス全体。ワーカースレッドの分も入る)、メモリのピークの増分を持つ。
+# メモリは tracemalloc を使うので重い。memory=True か環境変数 VMDLOADER_TRACE_MEMORY=1 のときだけ測る。
+# tracemalloc のピークはプロセス全体で 1 つなので reset_peak() はせず、区間の間にピークがどれだけ
+# 上がったか (終わりのピーク - 始めのピーク) を記録する。入れ子や別スレッドの区間とも干渉しないが、
+# それまでの最高値を超えなかった区間は 0 になる。別スレッドの確保も含まれる。
+# 終わると集計をログに出し、chrome_trace (か環境変数 VMDLOADER_TRACE_DIR) があれば
+# chrome://tracing / Perfetto で開ける JSON を書き出す
+SpanRecord = namedtuple("SpanRecord", ["name", "path", "start", "wall", "cpu", "mem_peak", "thread", "args"])
+
+_local = threading.local()
+# tracemalloc を使っているセッションの数。最後のセッションが終わったときだけ止める
+_memory_lock = threading.Lock()
+_memory_users = 0
+_memory_started = False
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "path", "t0", "c0", "peak0")
+
+    def __init__(self, tracer, name: str, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        tr = self.tracer
+        parent = tr._stack[-1] if tr._stack else None
+        self.path = (parent.path if parent is not None else ()) + (self.name,)
+        if tr.memory:
+            self.peak0 = tracemalloc.get_traced_memory()[1]
+        tr._stack.append(self)
+        self.c0 = time.process_time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        c1 = time.process_time()
+        tr = self.tracer
+        tr._stack.pop()
+        mem_peak = None
+        if tr.memory:
+            mem_peak = max(0, tracemalloc.get_traced_memory()[1] - self.peak0)
+        tr.records.append(SpanRecord(self.name, self.path, self.t0 - tr.t0, t1 - self.t0, c1 - self.c0,
+                                     mem_peak, threading.get_ident(), self.args))
+        return False
+
+
+class Tracer:
+    def __init__(self, name: str, memory: bool = False):
+        self.name = name
+        self.memory = bool(memory)
+        self.records = []
+        self.t0 = time.perf_counter()
+        self.wall_start = time.time()
+        self._stack = []
+
+    def span(self, name: str, **args):
+        return _Span(self, name, args or None)
+
+    def totals(self) -> OrderedDict:
+        # 同じ経路 (親の名前の並び) の区間をまとめる。{経路: [回数, 経過, CPU, ピークの増分の最大]} を最初に始まった順で
+        out = OrderedDict()
+        for r in sorted(self.records, key=lambda r: r.start):
+            t = out.get(r.path)
+            if t is None:
+                t = out[r.path] = [0, 0.0, 0.0, None]
+            t[0] += 1
+            t[1] += r.wall
+            t[2] += r.cpu
+            if r.mem_peak is not None:
+                t[3] = max(t[3] or 0, r.mem_peak)
+        return out
+
+    def summary(self, min_ms: float = 0.0) -> str:
+        totals = self.totals()
+        if not totals:
+            return f"計測 ({self.name}): 区間なし"
+        width = max(2 * (len(p) - 1) + len(p[-1]) for p in totals)
+        lines = []
+        for path, (count, wall, cpu, peak) in totals.items():
+            if len(path) > 1 and wall * 1000.0 < min_ms:
+                continue
+            label = "  " * (len(path) - 1) + path[-1]
+            line = f"  {label:<{width}}  {wall * 1000.0:9.1f}ms  cpu {cpu * 1000.0:9.1f}ms"
+            if peak is not None:
+                line += f"  peak+ {peak / (1024 * 1024):7.1f}MB"
+            if count > 1:
+                line += f"  x{count}"
+            lines.append(line)
+        return f"計測 ({self.name}):\n" + "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        # Trace Event Format の完了イベント (ph "X")。時刻はマイクロ秒
+        pid = os.getpid()
+        events = []
+        for r in self.records:
+            args = {"cpu_ms": round(r.cpu * 1000.0, 3)}
+            if r.mem_peak is not None:
+                args["mem_peak_growth_bytes"] = r.mem_peak
+            if r.args:
+                args.update({k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                             for k, v in r.args.items()})
+            events.append({"name": r.name, "ph": "X", "ts": round(r.start * 1e6, 3),
+                           "dur": round(r.wall * 1e6, 3), "pid": pid, "tid": r.thread, "args": args})
+        events.sort(key=lambda e: e["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"session": self.name, "started": self.wall_start}}
+
+    def write_chrome_trace(self, path: str) -> str:
+        # path がフォルダなら <セッション名>_<日時>.json を作る
+        if os.path.isdir(path) or path.endswith(("/", os.sep)):
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.wall_start))
+            safe = re.sub(r"[^\w\-]+", "_", self.name).strip("_") or "trace"
+            path = os.path.join(path, f"{safe}_{stamp}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+def active():
+    # このスレッドで計測中の Tracer。無ければ None
+    return getattr(_local, "tracer", None)
+
+
+def span(name: str, **args):
+    tracer = getattr(_local, "tracer", None)
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def _memory_acquire():
+    global _memory_users, _memory_started
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_started = True
+        _memory_users += 1
+
+
+def _memory_release():
+    # 自分たちで始めた tracemalloc だけを止める
+    global _memory_users, _memory_started
+    with _memory_lock:
+        _memory_users -= 1
+        if _memory_users == 0 and _memory_started:
+            tracemalloc.stop()
+            _memory_started = False
+
+
+@contextmanager
+def session(name: str, memory: bool = None, chrome_trace: str = None, log: bool = True, min_ms: float = 0.0):
+    # 計測を始めて Tracer を返す。入れ子にすると内側はそのまま外側の区間になる
+    outer = active()
+    if outer is not None:
+        with outer.span(name):
+            yield outer
+        return
+    if memory is None:
+        memory = _env_flag("VMDLOADER_TRACE_MEMORY")
+    if chrome_trace is None:
+        chrome_trace = os.environ.get("VMDLOADER_TRACE_DIR") or None
+    if memory:
+        _memory_acquire()
+    tracer = Tracer(name, memory)
+    _local.tracer = tracer
+    try:
+        with tracer.span(name):
+            yield tracer
+    finally:
+        _local.tracer = None
+        if memory:
+            _memory_release()
+        if log:
+            print(tracer.summary(min_ms))
+        if chrome_trace:
+            try:
+                print(f"トレースを書き出しました: {tracer.write_chrome_trace(chrome_trace)}")
+            except Exception as e:
+                print(f"トレースを書き出せませんでした: {e}")
@@ -0,0 +1 @@
+# エディタ無しで動くベンチマーク。使い方は run.py を参照
@@ -0,0 +1,13 @@
+import os
+import sys
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+_LOADER_DIR = os.path.dirname(_THIS_DIR)
+if _LOADER_DIR not in sys.path:
+    sys.path.insert(0, _LOADER_DIR)
+from bench.run import main
+
+if __name__ == "__main__":
+    sys.exit(main())
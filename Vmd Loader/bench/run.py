@@ -0,0 +1,665 @@
+import argparse
+import contextlib
+import fnmatch
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+_LOADER_DIR = os.path.dirname(_THIS_DIR)
+if _LOADER_DIR not in sys.path:
+    sys.path.insert(0, _LOADER_DIR)
+from bench import unreal_stub
+
+# ローダーより先に unreal の代わりを入れる
+unreal = unreal_stub.install()
+from bench import synth
+from VmdReader import VmdReader, _HAS_NUMPY, _infer_total_frames
+import VmdBaked
+import VmdBoneLoader
+import VmdEngine
+import VmdMorphLoader
+import VmdSkeletonInfo
+if _HAS_NUMPY:
+    import numpy as np
+else:
+    np = None
+
+# 解析 / ベイク / 流し込みの各段階をエディタ無しで測るベンチマーク。
+#   python -m bench run --preset medium --out before.json
+#   python -m bench run --preset medium --out after.json
+#   python -m bench compare before.json after.json
+#   python -m bench gen out.vmd --bones 200 --keys 600
+#   python -m bench budget --preset small
+#   python -m bench accuracy
+# 結果の JSON はコミットをまたいで比べられるよう、コミットと環境も一緒に書く。
+# 流し込みは RecordingController に対して測るので、エンジン側の処理時間は含まない
+RESULTS_FORMAT = 1
+
+PRESETS = {
+    "small": {"bones": 20, "keys_per_bone": 100, "morphs": 10, "keys_per_morph": 50, "frames": 600},
+    "medium": {"bones": 100, "keys_per_bone": 300, "morphs": 50, "keys_per_morph": 100, "frames": 3000},
+    "large": {"bones": 400, "keys_per_bone": 1500, "morphs": 150, "keys_per_morph": 400, "frames": 9000},
+}
+
+# 実際のモーションでは同じ補間曲線が何度も使われるので、曲線は BEZIER_CURVES 種類から選ぶ
+BEZIER_SAMPLES = 20000
+BEZIER_CURVES = 64
+
+Benchmark = namedtuple("Benchmark", ["name", "phase", "run", "needs_numpy"])
+
+
+class _Context:
+    # ベンチマーク間で共有する入力。計測の外で 1 回だけ作る
+    def __init__(self, path: str, fps: float, pos_tolerance, angle_tolerance, morph_tolerance, seed: int):
+        self.path = path
+        self.fps = float(fps)
+        self.pos_tolerance = pos_tolerance
+        self.angle_tolerance = angle_tolerance
+        self.morph_tolerance = morph_tolerance
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.vmd = VmdReader.read(path)
+        self.num_frames = _infer_total_frames(self.vmd)
+        self.morph_target_names = set(n for n in self.vmd["morphs"].keys() if n)
+        self.skeleton = unreal_stub.Skeleton()
+        self._classified = None
+        self._baked = None
+        self._mesh = None
+
+        rng = random.Random(seed)
+        curves = [tuple(rng.randint(0, 127) / 127.0 for _ in range(4)) for _ in range(BEZIER_CURVES)]
+        self.bezier = [rng.choice(curves) + (rng.random(),) for _ in range(BEZIER_SAMPLES)]
+
+    @property
+    def classified(self):
+        if self._classified is None:
+            self._classified = VmdBoneLoader.classify_tracks(self.vmd["bones"])
+        return self._classified
+
+    @property
+    def jobs(self):
+        return [(name, kind, track, None) for name, (kind, track) in self.classified.items()
+                if kind != VmdBoneLoader.TRACK_IDENTITY]
+
+    @property
+    def mesh(self):
+        # VMD のボーンとモーフが全部そろったメッシュ
+        if self._mesh is None:
+            bones = [(name, None, (0.0, 0.0, float(i))) for i, name in enumerate(self.vmd["bones"].keys())]
+            self._mesh = unreal_stub.SkeletalMesh(bones, sorted(self.morph_target_names), self.skeleton)
+        return self._mesh
+
+    @property
+    def baked(self):
+        if self._baked is None:
+            self._baked = VmdBaked.bake_motion(self.vmd, self.fps, self.pos_tolerance, self.angle_tolerance,
+                                               morph_tolerance=self.morph_tolerance)
+        return self._baked
+
+
+def _parse_read(ctx):
+    vmd = VmdReader.read(ctx.path)
+    return {"bone_tracks": len(vmd["bones"]), "morph_tracks": len(vmd["morphs"])}
+
+
+def _parse_read_py(ctx):
+    vmd = VmdReader._read_python(ctx.data)
+    return {"bone_tracks": len(vmd["bones"]), "morph_tracks": len(vmd["morphs"])}
+
+
+def _parse_open(ctx):
+    # 遅延で作られるキーも全部触る
+    with VmdReader.open(ctx.path) as vmd:
+        bone_keys = sum(len(v) for v in vmd["bones"].values())
+        morph_keys = sum(len(v) for v in vmd["morphs"].values())
+    return {"bone_keys": bone_keys, "morph_keys": morph_keys}
+
+
+def _bezier_scalar(ctx):
+    f = VmdBoneLoader._interpolate_bezier
+    for x1, y1, x2, y2, x in ctx.bezier:
+        f(x1, y1, x2, y2, x)
+    return {"samples": len(ctx.bezier)}
+
+
+def _bezier_np(ctx):
+    a = np.asarray(ctx.bezier, dtype=np.float64)
+    VmdBoneLoader._interpolate_bezier_np(a[:, 0], a[:, 1], a[:, 2], a[:, 3], a[:, 4])
+    return {"samples": len(a)}
+
+
+def _bezier_lut(ctx):
+    a = np.asarray(ctx.bezier, dtype=np.float64)
+    keys = np.rint(a[:, :4] * 127.0).astype(np.int64)
+    lut = VmdBoneLoader.bezier_lut_cache()
+    lut.evaluate_np(keys, a[:, 4])
+    return {"samples": len(a), "tables": lut.stats()["entries"]}
+
+
+def _bake_classify(ctx):
+    classified = VmdBoneLoader.classify_tracks(ctx.vmd["bones"])
+    kinds = {}
+    for kind, _ in classified.values():
+        kinds[kind] = kinds.get(kind, 0) + 1
+    return kinds
+
+
+def _bake_bones(ctx):
+    jobs = ctx.jobs
+    results = VmdBoneLoader.bake_bones(jobs, ctx.num_frames, ctx.pos_tolerance, ctx.angle_tolerance)
+    return {"tracks": len(jobs), "keys_out": sum(len(r[0]) for r in results)}
+
+
+def _bake_morphs(ctx):
+    keys_out = 0
+    curves = 0
+    for name, keys in ctx.vmd["morphs"].items():
+        times, values = VmdMorphLoader.bake_morph_curve(keys, ctx.fps)
+        prepared = VmdMorphLoader.prepare_morph_curve(times, values, ctx.morph_tolerance)
+        if prepared is not None:
+            curves += 1
+            keys_out += len(prepared[0])
+    return {"curves": curves, "keys_out": keys_out}
+
+
+def _bake_motion(ctx):
+    baked = VmdBaked.bake_motion(ctx.vmd, ctx.fps, ctx.pos_tolerance, ctx.angle_tolerance,
+                                 morph_tolerance=ctx.morph_tolerance)
+    return {"tracks": len(baked["bone_names"]), "curves": len(baked["morph_names"])}
+
+
+def _controller_metrics(ctrl, extra=None) -> dict:
+    out = dict(ctrl.key_counts())
+    out["calls"] = dict(ctrl.calls)
+    out.update(extra or {})
+    return out
+
+
+def _submit_apply_bones(ctx):
+    # ベイクから流し込みまで (apply_bones そのもの)
+    ctrl = unreal_stub.RecordingController()
+    stats = VmdBoneLoader.apply_bones(ctrl, ctx.vmd["bones"], ctx.fps, ctx.num_frames,
+                                      pos_tolerance=ctx.pos_tolerance, angle_tolerance=ctx.angle_tolerance)
+    return _controller_metrics(ctrl, {"keys_sent": stats["keys_sent"]})
+
+
+def _submit_apply_morphs(ctx):
+    ctrl = unreal_stub.RecordingController()
+    VmdMorphLoader.apply_morphs(ctrl, ctx.vmd["morphs"], ctx.skeleton, ctx.morph_target_names, ctx.fps,
+                                ctx.morph_tolerance)
+    return _controller_metrics(ctrl)
+
+
+def _submit_baked(ctx):
+    # ベイク済みを流し込むだけ
+    ctrl = unreal_stub.RecordingController()
+    baked = ctx.baked
+    VmdBaked.apply_baked(ctrl, baked, skeleton=ctx.skeleton, morph_target_names=ctx.morph_target_names)
+    return _controller_metrics(ctrl)
+
+
+BENCHMARKS = [
+    Benchmark("parse.read", "parse", _parse_read, False),
+    Benchmark("parse.read_py", "parse", _parse_read_py, False),
+    Benchmark("parse.open", "parse", _parse_open, True),
+    Benchmark("bezier.scalar", "bake", _bezier_scalar, False),
+    Benchmark("bezier.np", "bake", _bezier_np, True),
+    Benchmark("bezier.lut", "bake", _bezier_lut, True),
+    Benchmark("bake.classify", "bake", _bake_classify, False),
+    Benchmark("bake.bones", "bake", _bake_bones, False),
+    Benchmark("bake.morphs", "bake", _bake_morphs, False),
+    Benchmark("bake.motion", "bake", _bake_motion, True),
+    Benchmark("submit.apply_bones", "submit", _submit_apply_bones, False),
+    Benchmark("submit.apply_morphs", "submit", _submit_apply_morphs, False),
+    Benchmark("submit.baked", "submit", _submit_baked, True),
+]
+
+
+def select(patterns=None) -> list:
+    # patterns は名前か段階 ("parse" / "bake" / "submit") か "bezier." のような前置き
+    if not patterns:
+        return list(BENCHMARKS)
+    out = []
+    for b in BENCHMARKS:
+        if any(p == b.name or p == b.phase or (p.endswith(".") and b.name.startswith(p)) for p in patterns):
+            out.append(b)
+    return out
+
+
+def time_benchmark(bench: Benchmark, ctx: _Context, repeat: int = 5, warmup: int = 1) -> dict:
+    runs = []
+    metrics = {}
+    sink = io.StringIO()
+    for i in range(max(0, warmup) + max(1, repeat)):
+        gc.collect()
+        with contextlib.redirect_stdout(sink):
+            t0 = time.perf_counter()
+            metrics = bench.run(ctx) or {}
+            sec = time.perf_counter() - t0
+        sink.seek(0)
+        sink.truncate()
+        if i >= warmup:
+            runs.append(sec)
+    return {
+        "phase": bench.phase,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "runs": runs,
+        "metrics": metrics,
+    }
+
+
+def _git(*args) -> str:
+    try:
+        out = subprocess.run(["git", *args], cwd=_LOADER_DIR, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() if out.returncode == 0 else ""
+    except Exception:
+        return ""
+
+
+def environment() -> dict:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__ if np is not None else None,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_suite(params: dict, patterns=None, repeat: int = 5, warmup: int = 1, vmd_path: str = None,
+              fps: float = 30.0, pos_tolerance=None, angle_tolerance=None, morph_tolerance=None,
+              progress=None) -> dict:
+    # vmd_path を渡せば合成せずにそのファイルを使う
+    benches = [b for b in select(patterns) if _HAS_NUMPY or not b.needs_numpy]
+    with tempfile.TemporaryDirectory(prefix="vmdbench") as tmp:
+        summary = None
+        if vmd_path is None:
+            vmd_path = os.path.join(tmp, "synth.vmd")
+            summary = synth.write_vmd(vmd_path, **params)
+        ctx = _Context(vmd_path, fps, pos_tolerance, angle_tolerance, morph_tolerance, params.get("seed", 0))
+        results = {}
+        for b in benches:
+            if progress is not None:
+                progress(b.name)
+            results[b.name] = time_benchmark(b, ctx, repeat, warmup)
+    return {
+        "format": RESULTS_FORMAT,
+        "environment": environment(),
+        "params": {
+            "synth": params if summary is not None else None,
+            "vmd": None if summary is not None else os.path.abspath(vmd_path),
+            "summary": summary,
+            "fps": fps,
+            "pos_tolerance": pos_tolerance,
+            "angle_tolerance": angle_tolerance,
+            "morph_tolerance": morph_tolerance,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, stat: str = "median", threshold: float = 0.1):
+    # [(名前, 前, 後, 比), ...] と、threshold を超えて遅くなったものの名前
+    rows = []
+    slower = []
+    for name, r in new.get("results", {}).items():
+        o = old.get("results", {}).get(name)
+        if o is None:
+            continue
+        a = float(o[stat])
+        b = float(r[stat])
+        ratio = b / a if a > 0.0 else float("inf")
+        rows.append((name, a, b, ratio))
+        if ratio > 1.0 + threshold:
+            slower.append(name)
+    return rows, slower
+
+
+def submit_budgets(counts: dict, imports: int = 1) -> dict:
+    # 流し込みのコール予算。counts は RecordingController.key_counts()
+    return {
+        # トラック / カーブ 1 本につき作成とキー設定が 1 回ずつ
+        "ctrl.*bone_track*": 2 * counts["bone_tracks"],
+        "ctrl.*curve*": 2 * counts["curves"],
+        # キー 1 つにつき 1 個。Vector はインポートごとに共有のスケールが 1 個増える
+        "new.Vector": counts["bone_keys"] + imports,
+        "new.Quat": counts["bone_keys"],
+        "new.RichCurveKey": counts["curve_keys"],
+    }
+
+
+def _budget_apply_bones(ctx, ctrl):
+    VmdBoneLoader.apply_bones(ctrl, ctx.vmd["bones"], ctx.fps, ctx.num_frames, ctx.mesh,
+                              pos_tolerance=ctx.pos_tolerance, angle_tolerance=ctx.angle_tolerance)
+
+
+def _budget_apply_morphs(ctx, ctrl):
+    VmdMorphLoader.apply_morphs(ctrl, ctx.vmd["morphs"], ctx.skeleton, ctx.morph_target_names, ctx.fps,
+                                ctx.morph_tolerance)
+
+
+def _budget_baked(ctx, ctrl):
+    VmdBaked.apply_baked(ctrl, ctx.baked, ctx.mesh, ctx.skeleton, ctx.morph_target_names)
+
+
+def _drop_modifier():
+    unreal.__dict__.pop("SkeletonModifier", None)
+
+
+def _restore_modifier():
+    if getattr(unreal, "IS_BENCH_STUB", False):
+        unreal.SkeletonModifier = unreal_stub.SkeletonModifier
+
+
+def check_budgets(ctx: _Context) -> list:
+    # 流し込みを RecordingBackend の下で動かし、コール予算を確かめる。
+    # [(場面, RecordingBackend.stats(), 予算, 超えたもの), ...] を返す
+    bones = len(ctx.mesh.bones)
+    curves = len(ctx.morph_target_names)
+    # 参照ポーズを取るのはトラックを作るボーン (恒等以外) だけ
+    used = sum(1 for kind, _ in ctx.classified.values() if kind != VmdBoneLoader.TRACK_IDENTITY)
+    cache = VmdSkeletonInfo.skeleton_info_cache()
+    scenarios = [
+        # 初回はボーン名を SkeletonModifier で一度に取り、参照ポーズは使うボーンの分だけ。
+        # 2 回目以降はキャッシュから引くのでエンジンに聞かない
+        ("apply_bones", _budget_apply_bones, cache.invalidate,
+         {"modifier.get_all_bone_names": 1, "modifier.get_bone_transform": used, "component.*": 0,
+          "mesh.*": 1}),
+        ("apply_bones (cached)", _budget_apply_bones, None,
+         {"modifier.*": 0, "component.*": 0, "mesh.*": 0}),
+        # SkeletonModifier が無い版ではボーン名を 1 本ずつ取る
+        ("apply_bones (no SkeletonModifier)", _budget_apply_bones, lambda: (cache.invalidate(), _drop_modifier()),
+         {"component.get_num_bones": 1, "component.get_bone_name": bones,
+          "component.get_ref_pose_transform": used, "mesh.*": 1}),
+        # カーブ ID はスケルトンごとにキャッシュする
+        ("apply_morphs", _budget_apply_morphs, VmdMorphLoader.clear_curve_id_cache,
+         {"skeleton.get_curve_identifier": curves}),
+        ("apply_morphs (cached)", _budget_apply_morphs, None,
+         {"skeleton.get_curve_identifier": 0}),
+        ("baked", _budget_baked, None,
+         {"component.*": 0, "mesh.*": 0, "skeleton.get_curve_identifier": 0}),
+    ]
+    out = []
+    sink = io.StringIO()
+    for name, run, reset, extra in scenarios:
+        if reset is not None:
+            reset()
+        ctrl = unreal_stub.RecordingController()
+        with VmdEngine.recording(VmdEngine.UnrealBackend()) as rec, contextlib.redirect_stdout(sink):
+            run(ctx, ctrl)
+        budgets = submit_budgets(ctrl.key_counts())
+        budgets.update(extra)
+        out.append((name, rec.stats(), budgets, rec.check(budgets)))
+        sink.seek(0)
+        sink.truncate()
+        _restore_modifier()
+    return out
+
+
+def _legacy_bezier_np(x1, y1, x2, y2, x):
+    # VmdBoneLoader._interpolate_bezier (打ち切り付きの二分法) を配列でそのまま再現したもの。
+    # 格子全体を Python のループで回すと遅すぎるので比較にはこちらを使う
+    x1, y1, x2, y2, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (x1, y1, x2, y2, x)))
+    x = np.clip(x, 0.0, 1.0)
+    t = np.full(x.shape, 0.5)
+    s = np.full(x.shape, 0.5)
+    active = np.ones(x.shape, dtype=bool)
+    for i in range(15):
+        ft = (3.0 * s * s * t * x1) + (3.0 * s * t * t * x2) + (t * t * t) - x
+        active &= ~(np.abs(ft) < 0.0001)
+        step = 1.0 / float(4 << i)
+        t = np.where(active, np.where(ft > 0.0, t - step, t + step), t)
+        s = np.where(active, 1.0 - t, s)
+    return (3.0 * s * s * t * y1) + (3.0 * s * t * t * y2) + (t * t * t)
+
+
+def _bezier_grid(stride: int):
+    # (x1, y1, x2, y2) のバイト値の格子。0 と 127 は必ず含む
+    vals = sorted(set(range(0, 128, max(1, int(stride)))) | {127})
+    g = np.array(vals, dtype=np.int64)
+    return np.stack(np.meshgrid(g, g, g, g, indexing="ij"), axis=-1).reshape(-1, 4)
+
+
+def _worst(grid, xs, fa, fb, chunk: int = 2048):
+    # 格子の全曲線 x xs で |fa - fb| の最大と、そのときの (曲線, x)
+    worst = (0.0, None, None)
+    for lo in range(0, len(grid), chunk):
+        g = grid[lo:lo + chunk]
+        k = [g[:, c:c + 1] / 127.0 for c in range(4)]
+        d = np.abs(fa(*k, xs[None, :]) - fb(*k, xs[None, :]))
+        m = float(d.max())
+        if m > worst[0]:
+            i, j = np.unravel_index(int(d.argmax()), d.shape)
+            worst = (m, tuple(int(v) for v in g[i]), float(xs[j]))
+    return worst
+
+
+def _lut_worst(grid, xs):
+    # 補間テーブル (既定の設定) と厳密解の差の最大。表は曲線ごとに本物の BezierLutCache で作る
+    lut = VmdBoneLoader.BezierLutCache(max_entries=1)
+    worst = (0.0, None, None)
+    for key in grid:
+        k = key / 127.0
+        y = lut.evaluate_np(np.broadcast_to(key, (len(xs), 4)), xs)
+        d = np.abs(y - VmdBoneLoader._interpolate_bezier_np(k[0], k[1], k[2], k[3], xs))
+        m = float(d.max())
+        if m > worst[0]:
+            worst = (m, tuple(int(v) for v in key), float(xs[int(d.argmax())]))
+    return worst
+
+
+def check_accuracy(stride: int = 9, samples: int = 101, seed: int = 0, lut_stride: int = 18) -> list:
+    # ベジェの解き方どうしの差が文書にある上限に収まるか確かめる。
+    # [(名前, 最大の差, 上限, 曲線 (x1, y1, x2, y2), x), ...] を返す
+    rng = random.Random(seed)
+    out = []
+    # NumPy 無しの厳密解が配列版と同じ値を返すこと
+    picks = [(tuple(rng.randint(0, 127) for _ in range(4)), rng.random()) for _ in range(2000)]
+    worst = (0.0, None, None)
+    for key, x in picks:
+        k = [v / 127.0 for v in key]
+        d = abs(float(VmdBoneLoader._interpolate_bezier_np(*k, x)) - VmdBoneLoader._interpolate_bezier_exact(*k, x))
+        if d > worst[0]:
+            worst = (d, key, x)
+    out.append(("exact == bezier_np",) + (worst[0], 0.0) + worst[1:])
+    # 配列版の旧実装が本物と同じ値を返すこと
+    picks = [(tuple(rng.randint(0, 127) for _ in range(4)), rng.random()) for _ in range(2000)]
+    worst = (0.0, None, None)
+    for key, x in picks:
+        k = [v / 127.0 for v in key]
+        d = abs(float(_legacy_bezier_np(*k, x)) - VmdBoneLoader._interpolate_bezier(*k, x))
+        if d > worst[0]:
+            worst = (d, key, x)
+    out.append(("legacy_np == legacy",) + (worst[0], 0.0) + worst[1:])
+    grid = _bezier_grid(stride)
+    xs = np.linspace(0.0, 1.0, max(2, int(samples)))
+    worst = _worst(grid, xs, _legacy_bezier_np, VmdBoneLoader._interpolate_bezier_np)
+    out.append(("bezier_np vs legacy", worst[0], VmdBoneLoader.BEZIER_NP_TOLERANCE) + worst[1:])
+    # 表は区間の中ほどと端の近くで誤差が大きくなるので、等間隔の点に乱数の点を足して測る
+    lut_xs = np.concatenate([xs, np.array([rng.random() for _ in range(4 * len(xs))])])
+    worst = _lut_worst(_bezier_grid(lut_stride), lut_xs)
+    out.append(("lut vs exact", worst[0], VmdBoneLoader.BezierLutCache.LUT_TOLERANCE) + worst[1:])
+    return out
+
+
+def _print_results(res: dict):
+    width = max((len(n) for n in res["results"]), default=10)
+    for name, r in res["results"].items():
+        print(f"{name:<{width}}  min {r['min'] * 1000:10.2f} ms  median {r['median'] * 1000:10.2f} ms")
+
+
+def _synth_params(args) -> dict:
+    params = dict(PRESETS[args.preset])
+    for key, value in (("bones", args.bones), ("keys_per_bone", args.keys), ("morphs", args.morphs),
+                       ("keys_per_morph", args.morph_keys), ("frames", args.frames)):
+        if value is not None:
+            params[key] = value
+    params["seed"] = args.seed
+    if args.mix:
+        params["mix"] = synth.parse_mix(args.mix, tuple(synth.DEFAULT_MIX))
+    if args.morph_mix:
+        params["morph_mix"] = synth.parse_mix(args.morph_mix, tuple(synth.DEFAULT_MORPH_MIX))
+    return params
+
+
+def _cmd_run(args) -> int:
+    params = _synth_params(args)
+    res = run_suite(params, args.only, args.repeat, args.warmup, args.vmd, args.fps, args.pos_tolerance,
+                    args.angle_tolerance, args.morph_tolerance,
+                    progress=None if args.quiet else (lambda n: print(f"計測中: {n}", file=sys.stderr)))
+    _print_results(res)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=1)
+    return 0
+
+
+def _cmd_compare(args) -> int:
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    if old.get("params", {}).get("summary") != new.get("params", {}).get("summary"):
+        print("注意: 入力のモーションが違います。", file=sys.stderr)
+    rows, slower = compare(old, new, args.stat, args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    for name, a, b, ratio in rows:
+        mark = "  遅くなった" if name in slower else ""
+        print(f"{name:<{width}}  {a * 1000:10.2f} ms -> {b * 1000:10.2f} ms  x{ratio:5.2f}{mark}")
+    return 1 if slower else 0
+
+
+def _cmd_budget(args) -> int:
+    params = _synth_params(args)
+    with tempfile.TemporaryDirectory(prefix="vmdbench") as tmp:
+        path = args.vmd
+        if path is None:
+            path = os.path.join(tmp, "synth.vmd")
+            synth.write_vmd(path, **params)
+        ctx = _Context(path, args.fps, args.pos_tolerance, args.angle_tolerance, args.morph_tolerance, args.seed)
+        results = check_budgets(ctx)
+    failed = 0
+    report = {}
+    for name, stats, budgets, over in results:
+        print(f"{name}:")
+        for pattern, limit in budgets.items():
+            n = sum((s["objects"] if s["objects"] else s["calls"]) for op, s in stats.items()
+                    if fnmatch.fnmatchcase(op, pattern))
+            mark = "  超過" if n > limit else ""
+            print(f"  {pattern:<32} {n:>10} / {limit}{mark}")
+        failed += len(over)
+        report[name] = {"stats": stats, "budgets": budgets, "over": over}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"format": RESULTS_FORMAT, "environment": environment(), "budgets": report},
+                      f, ensure_ascii=False, indent=1)
+    return 1 if failed else 0
+
+
+def _cmd_accuracy(args) -> int:
+    if not _HAS_NUMPY:
+        print("NumPy が無いので確かめられません。")
+        return 1
+    failed = 0
+    for name, worst, bound, curve, x in check_accuracy(args.stride, args.samples, args.seed, args.lut_stride):
+        over = worst > bound
+        failed += over
+        where = f"  曲線 {curve} x={x:.4f}" if curve is not None else ""
+        print(f"{name:<24} 最大の差 {worst:.3g} / 上限 {bound:.3g}{'  超過' if over else ''}{where}")
+    return 1 if failed else 0
+
+
+def _cmd_gen(args) -> int:
+    summary = synth.write_vmd(args.out, shuffle=args.shuffle, **_synth_params(args))
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+
+def _add_synth_args(p):
+    p.add_argument("--preset", choices=sorted(PRESETS), default="medium")
+    p.add_argument("--bones", type=int, default=None, help="ボーン数")
+    p.add_argument("--keys", type=int, default=None, help="ボーンごとのキー数")
+    p.add_argument("--morphs", type=int, default=None, help="モーフ数")
+    p.add_argument("--morph-keys", type=int, default=None, help="モーフごとのキー数")
+    p.add_argument("--frames", type=int, default=None, help="モーションの長さ (MMD のフレーム)")
+    p.add_argument("--mix", default=None, help="ボーンの種類の割合 (例: bezier=0.5,linear=0.2,constant=0.2,identity=0.1)")
+    p.add_argument("--morph-mix", default=None, help="モーフの種類の割合 (例: zero=0.3,step=0.3,smooth=0.4)")
+    p.add_argument("--seed", type=int, default=0)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="bench", description="VMD Loader のベンチマーク")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="ベンチマークを実行する")
+    _add_synth_args(run)
+    run.add_argument("--vmd", default=None, help="合成せずにこの VMD を使う")
+    run.add_argument("--only", nargs="*", default=None, help="名前か段階 (parse / bake / submit) か 'bezier.' のような前置き")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--warmup", type=int, default=1)
+    run.add_argument("--fps", type=float, default=30.0)
+    run.add_argument("--pos-tolerance", type=float, default=None)
+    run.add_argument("--angle-tolerance", type=float, default=None)
+    run.add_argument("--morph-tolerance", type=float, default=None)
+    run.add_argument("--out", default=None, help="結果の JSON")
+    run.add_argument("-q", "--quiet", action="store_true")
+
+    cmp = sub.add_parser("compare", help="2 つの結果を比べる。遅くなったものがあれば終了コード 1")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+    cmp.add_argument("--stat", choices=("min", "median", "mean"), default="median")
+    cmp.add_argument("--threshold", type=float, default=0.1, help="遅くなったとみなす割合 (既定 0.1 = 10%%)")
+
+    bud = sub.add_parser("budget", help="流し込みのエンジン呼び出しがコール予算に収まるか確かめる。超えたら終了コード 1")
+    _add_synth_args(bud)
+    bud.add_argument("--vmd", default=None, help="合成せずにこの VMD を使う")
+    bud.add_argument("--fps", type=float, default=30.0)
+    bud.add_argument("--pos-tolerance", type=float, default=None)
+    bud.add_argument("--angle-tolerance", type=float, default=None)
+    bud.add_argument("--morph-tolerance", type=float, default=None)
+    bud.add_argument("--out", default=None, help="結果の JSON")
+
+    acc = sub.add_parser("accuracy", help="ベジェの解き方どうしの差が上限に収まるか確かめる。超えたら終了コード 1")
+    acc.add_argument("--stride", type=int, default=9, help="0-127 の格子の間隔 (1 で全部。とても遅い)")
+    acc.add_argument("--samples", type=int, default=101, help="曲線ごとの x の数 (0 と 1 を含む等間隔)")
+    acc.add_argument("--lut-stride", type=int, default=18, help="補間テーブルを確かめる格子の間隔 (表を曲線ごとに作るので粗め)")
+    acc.add_argument("--seed", type=int, default=0)
+
+    gen = sub.add_parser("gen", help="合成 VMD を書き出す")
+    gen.add_argument("out")
+    _add_synth_args(gen)
+    gen.add_argument("--shuffle", action="store_true", help="レコードの順を混ぜる")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return _cmd_run(args)
+    if args.command == "compare":
+        return _cmd_compare(args)
+    if args.command == "budget":
+        return _cmd_budget(args)
+    if args.command == "accuracy":
+        return _cmd_accuracy(args)
+    if args.command == "gen":
+        return _cmd_gen(args)
+    parser.print_help()
+    return 1
@@ -0,0 +1,148 @@
+import math
+import random
+import struct
+
+# ベンチマーク用の合成 VMD。同じ引数と seed からは常に同じバイト列になる。
+# ボーンの種類の割合 (mix):
+#   identity : 全キーが位置 0 / 単位回転 (トラックを作らないもの)
+#   constant : 全キーが同じ値
+#   linear   : キーごとに値が変わり、補間は直線
+#   bezier   : キーごとに値が変わり、補間はランダムなベジェ
+# モーフの種類の割合 (morph_mix):
+#   zero   : 全キーが 0
+#   step   : 0 と 1 を行き来する
+#   smooth : 0..1 のランダムな値
+DEFAULT_MIX = {"identity": 0.1, "constant": 0.2, "linear": 0.2, "bezier": 0.5}
+DEFAULT_MORPH_MIX = {"zero": 0.3, "step": 0.3, "smooth": 0.4}
+
+_HEADER = b"Vocaloid Motion Data 0002"
+_LINEAR = bytes([20] * 4 + [20] * 4 + [107] * 4 + [107] * 4)
+_BONE = struct.Struct("<15sI3f4f")
+_MORPH = struct.Struct("<15sIf")
+
+
+def parse_mix(text: str, kinds) -> dict:
+    # "bezier=0.5,linear=0.3" のような指定を割合の dict にする
+    mix = {}
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in kinds:
+            raise ValueError(f"不明な種類です: {name} ({', '.join(kinds)})")
+        mix[name] = float(value) if value.strip() else 1.0
+    return mix
+
+
+def _counts(mix: dict, total: int) -> list:
+    # 割合を合計 total の個数に丸める (端数は大きい順に配る)
+    items = [(k, max(0.0, float(v))) for k, v in mix.items()]
+    weight = sum(v for _, v in items)
+    if total <= 0 or weight <= 0.0:
+        return [(k, 0) for k, _ in items]
+    exact = [(k, v * total / weight) for k, v in items]
+    counts = {k: int(math.floor(x)) for k, x in exact}
+    rest = total - sum(counts.values())
+    for k, x in sorted(exact, key=lambda e: e[1] - math.floor(e[1]), reverse=True)[:rest]:
+        counts[k] += 1
+    return [(k, counts[k]) for k, _ in items]
+
+
+def _key_frames(rng, keys: int, frames: int) -> list:
+    # 0 と frames - 1 を必ず含む、重複の無いキーフレーム
+    keys = max(1, min(int(keys), frames))
+    if keys == 1:
+        return [0]
+    inner = rng.sample(range(1, frames - 1), keys - 2) if keys > 2 else []
+    return [0] + sorted(inner) + [frames - 1]
+
+
+def _random_quat(rng):
+    q = [rng.gauss(0.0, 1.0) for _ in range(4)]
+    m = math.sqrt(sum(v * v for v in q)) or 1.0
+    return tuple(v / m for v in q)
+
+
+def _random_bezier(rng) -> bytes:
+    # x1, y1, x2, y2 をチャンネル (X, Y, Z, 回転) ごとに
+    x1 = [rng.randint(0, 127) for _ in range(4)]
+    y1 = [rng.randint(0, 127) for _ in range(4)]
+    x2 = [rng.randint(0, 127) for _ in range(4)]
+    y2 = [rng.randint(0, 127) for _ in range(4)]
+    return bytes(x1 + y1 + x2 + y2)
+
+
+def _encode_name(name: str) -> bytes:
+    return name.encode("shift_jis")[:15]
+
+
+def vmd_bytes(bones: int = 100, keys_per_bone: int = 300, morphs: int = 50, keys_per_morph: int = 100,
+              frames: int = 3000, mix=None, morph_mix=None, seed: int = 0, shuffle: bool = False):
+    # (VMD のバイト列, 中身の集計) を返す
+    frames = max(2, int(frames))
+    rng = random.Random(seed)
+    mix = dict(DEFAULT_MIX if mix is None else mix)
+    morph_mix = dict(DEFAULT_MORPH_MIX if morph_mix is None else morph_mix)
+    summary = {"bones": {k: 0 for k in mix}, "morphs": {k: 0 for k in morph_mix},
+               "bone_keys": 0, "morph_keys": 0, "frames": frames}
+
+    bone_recs = []
+    i = 0
+    for kind, n in _counts(mix, bones):
+        for _ in range(n):
+            name = _encode_name(f"ボーン{i:04d}")
+            i += 1
+            summary["bones"][kind] += 1
+            key_frames = _key_frames(rng, keys_per_bone, frames)
+            pos = (rng.uniform(-2.0, 2.0), rng.uniform(-2.0, 2.0), rng.uniform(-2.0, 2.0))
+            rot = _random_quat(rng)
+            for f in key_frames:
+                if kind == "identity":
+                    p, q, interp = (0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0), _LINEAR
+                elif kind == "constant":
+                    p, q, interp = pos, rot, _LINEAR
+                else:
+                    p = (rng.uniform(-2.0, 2.0), rng.uniform(-2.0, 2.0), rng.uniform(-2.0, 2.0))
+                    q = _random_quat(rng)
+                    interp = _LINEAR if kind == "linear" else _random_bezier(rng)
+                bone_recs.append(_BONE.pack(name, f, *p, *q) + interp + bytes(48))
+    summary["bone_keys"] = len(bone_recs)
+
+    morph_recs = []
+    i = 0
+    for kind, n in _counts(morph_mix, morphs):
+        for _ in range(n):
+            name = _encode_name(f"モーフ{i:04d}")
+            i += 1
+            summary["morphs"][kind] += 1
+            for j, f in enumerate(_key_frames(rng, keys_per_morph, frames)):
+                if kind == "zero":
+                    w = 0.0
+                elif kind == "step":
+                    w = float((j // 2) % 2)
+                else:
+                    w = rng.random()
+                morph_recs.append(_MORPH.pack(name, f, w))
+    summary["morph_keys"] = len(morph_recs)
+
+    if shuffle:
+        rng.shuffle(bone_recs)
+        rng.shuffle(morph_recs)
+    parts = [_HEADER.ljust(30, b"\x00"), _encode_name("合成モデル").ljust(20, b"\x00"),
+             struct.pack("<I", len(bone_recs))]
+    parts += bone_recs
+    parts.append(struct.pack("<I", len(morph_recs)))
+    parts += morph_recs
+    # カメラ / 照明 / セルフ影 / 表示・IK は空
+    parts.append(struct.pack("<4I", 0, 0, 0, 0))
+    return b"".join(parts), summary
+
+
+def write_vmd(path: str, **params) -> dict:
+    data, summary = vmd_bytes(**params)
+    with open(path, "wb") as f:
+        f.write(data)
+    summary["size"] = len(data)
+    return summary
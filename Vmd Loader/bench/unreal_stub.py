@@ -0,0 +1,260 @@
+import sys
+import types
+from collections import Counter
+
+# エディタの外でローダーを動かすための最小限の unreal の代わり。
+# ローダーのモジュールは import 時に unreal を掴むので、install() はそれより先に呼ぶ。
+# RecordingController は渡されたキーを数えるだけで、エンジン側の処理時間は含まない
+
+
+class Vector:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class Quat:
+    __slots__ = ("x", "y", "z", "w")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = w
+
+
+class Transform:
+    def __init__(self, translation=None, rotation=None):
+        self.translation = translation if translation is not None else Vector()
+        self.rotation = rotation if rotation is not None else Quat()
+
+
+class RichCurveInterpMode:
+    RCIM_LINEAR = "RCIM_LINEAR"
+    RCIM_CONSTANT = "RCIM_CONSTANT"
+    RCIM_CUBIC = "RCIM_CUBIC"
+
+
+class RichCurveKey:
+    __slots__ = ("time", "value", "interp_mode")
+
+    def __init__(self, time=0.0, value=0.0, interp_mode=RichCurveInterpMode.RCIM_CUBIC):
+        self.time = time
+        self.value = value
+        self.interp_mode = interp_mode
+
+
+class RawCurveTrackTypes:
+    RCT_FLOAT = 0
+
+
+class FrameRate:
+    def __init__(self, numerator=30, denominator=1):
+        self.numerator = numerator
+        self.denominator = denominator
+
+
+class FrameNumber:
+    def __init__(self, value=0):
+        self.value = value
+
+
+class AnimationCurveIdentifier:
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+
+class Skeleton:
+    def __init__(self, path="/Game/Bench/Skeleton.Skeleton"):
+        self.path = path
+        self.calls = Counter()
+
+    def get_path_name(self):
+        return self.path
+
+    def get_curve_identifier(self, name, curve_type):
+        self.calls["get_curve_identifier"] += 1
+        return AnimationCurveIdentifier(name)
+
+
+class SkeletalMesh:
+    # bones は [(ボーン名, 親の名前か None, (x, y, z)), ...]
+    def __init__(self, bones=(), morph_target_names=(), skeleton=None, path="/Game/Bench/Mesh.Mesh"):
+        self.bones = list(bones)
+        self.morph_target_names = list(morph_target_names)
+        self.skeleton = skeleton if skeleton is not None else Skeleton()
+        self.path = path
+
+    def get_path_name(self):
+        return self.path
+
+    def get_editor_property(self, name):
+        if name == "skeleton":
+            return self.skeleton
+        raise AttributeError(name)
+
+    def get_all_morph_target_names(self):
+        return list(self.morph_target_names)
+
+
+class SkeletalMeshComponent:
+    def __init__(self):
+        self.mesh = None
+
+    def set_skeletal_mesh_asset(self, mesh):
+        self.mesh = mesh
+
+    def get_num_bones(self):
+        return len(self.mesh.bones)
+
+    def get_bone_name(self, index):
+        return self.mesh.bones[index][0]
+
+    def get_parent_bone(self, name):
+        for bone, parent, _ in self.mesh.bones:
+            if bone == name:
+                return parent or "None"
+        return "None"
+
+    def get_ref_pose_transform(self, index):
+        x, y, z = self.mesh.bones[index][2]
+        return Transform(Vector(x, y, z), Quat())
+
+
+class SkeletonModifier:
+    # UE 5.4 以降の SkeletonModifier の読み取り側だけ。module(bulk_bones=False) では入れない
+    def __init__(self):
+        self.mesh = None
+
+    def set_skeletal_mesh(self, mesh):
+        self.mesh = mesh
+        return True
+
+    def get_all_bone_names(self):
+        return [b[0] for b in self.mesh.bones]
+
+    def get_bone_transform(self, name, use_global=False):
+        for bone, _, pos in self.mesh.bones:
+            if bone == name:
+                return Transform(Vector(*pos), Quat())
+        return Transform()
+
+    def get_parent_name(self, name):
+        for bone, parent, _ in self.mesh.bones:
+            if bone == name:
+                return parent or "None"
+        return "None"
+
+
+class RecordingController:
+    # AnimationDataController の代わり。呼ばれた回数と受け取ったキー数を持つ。
+    # keep_keys=True なら受け取ったキーも残す (確認用。ベンチマークでは使わない)
+    def __init__(self, keep_keys: bool = False):
+        self.keep_keys = keep_keys
+        self.calls = Counter()
+        self.bone_tracks = {}
+        self.curves = {}
+        self.frame_rate = None
+        self.num_frames = None
+        self.bracket_depth = 0
+
+    def open_bracket(self, description, should_transact=True):
+        self.calls["open_bracket"] += 1
+        self.bracket_depth += 1
+
+    def close_bracket(self, should_transact=True):
+        self.calls["close_bracket"] += 1
+        self.bracket_depth -= 1
+
+    def set_frame_rate(self, rate, should_transact=True):
+        self.calls["set_frame_rate"] += 1
+        self.frame_rate = rate
+
+    def set_number_of_frames(self, frames, should_transact=True):
+        self.calls["set_number_of_frames"] += 1
+        self.num_frames = frames.value if isinstance(frames, FrameNumber) else int(frames)
+
+    def insert_bone_track(self, name, index=0, should_transact=True):
+        self.calls["insert_bone_track"] += 1
+        self.bone_tracks.setdefault(str(name), None)
+        return index
+
+    def set_bone_track_keys(self, name, pos_keys, rot_keys, scale_keys, should_transact=True):
+        self.calls["set_bone_track_keys"] += 1
+        if self.keep_keys:
+            self.bone_tracks[str(name)] = (list(pos_keys), list(rot_keys), list(scale_keys))
+        else:
+            self.bone_tracks[str(name)] = len(pos_keys)
+        return True
+
+    def add_curve(self, curve_id, flags=0, should_transact=True):
+        self.calls["add_curve"] += 1
+        self.curves.setdefault(curve_id.get_name(), None)
+        return True
+
+    def set_curve_keys(self, curve_id, keys, should_transact=True):
+        self.calls["set_curve_keys"] += 1
+        self.curves[curve_id.get_name()] = list(keys) if self.keep_keys else len(keys)
+        return True
+
+    def key_counts(self) -> dict:
+        def n(v):
+            if v is None:
+                return 0
+            return len(v[0]) if isinstance(v, tuple) else (len(v) if isinstance(v, list) else int(v))
+        return {
+            "bone_tracks": len(self.bone_tracks),
+            "bone_keys": sum(n(v) for v in self.bone_tracks.values()),
+            "curves": len(self.curves),
+            "curve_keys": sum(n(v) for v in self.curves.values()),
+        }
+
+
+def _log(msg):
+    print(msg)
+
+
+def module(bulk_bones: bool = True) -> types.ModuleType:
+    m = types.ModuleType("unreal")
+    m.__dict__.update({
+        "Vector": Vector,
+        "Quat": Quat,
+        "RichCurveKey": RichCurveKey,
+        "RichCurveInterpMode": RichCurveInterpMode,
+        "RawCurveTrackTypes": RawCurveTrackTypes,
+        "FrameRate": FrameRate,
+        "FrameNumber": FrameNumber,
+        "AnimationCurveIdentifier": AnimationCurveIdentifier,
+        "Skeleton": Skeleton,
+        "Transform": Transform,
+        "SkeletalMesh": SkeletalMesh,
+        "SkeletalMeshComponent": SkeletalMeshComponent,
+        "log": _log,
+        "log_warning": _log,
+        "log_error": _log,
+        "IS_BENCH_STUB": True,
+    })
+    if bulk_bones:
+        m.SkeletonModifier = SkeletonModifier
+    return m
+
+
+def install(force: bool = False):
+    # 本物の unreal が読めるとき (エディタ内) はそちらを使う。force なら必ず差し替える
+    if not force:
+        if "unreal" in sys.modules:
+            return sys.modules["unreal"]
+        try:
+            import unreal
+            return unreal
+        except Exception:
+            pass
+    m = module()
+    sys.modules["unreal"] = m
+    return m
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import struct
 import sys
@@ -15,9 +16,237 @@ except Exception:
     unreal = None
     _HAS_UNREAL = False
 from PySide6 import QtWidgets, QtCore, QtGui
-from VmdReader import VmdReader, _infer_total_frames
+from VmdReader import (VmdReader, CachedVmd, VmdParseCache, VmdSections, CancelToken, VmdReadCancelled,
+                       _infer_total_frames, SECTION_CAMERA)
+import VmdAsset
 import VmdBoneLoader
+import VmdEngine
 import VmdMorphLoader
+import VmdTrace
+try:
+    import VmdBaked
+    import VmdBakeCache
+    import VmdBatch
+    _HAS_BAKE_CACHE = True
+except Exception:
+    VmdBaked = None
+    VmdBakeCache = None
+    VmdBatch = None
+    _HAS_BAKE_CACHE = False
+try:
+    import VmdCameraLoader
+    _HAS_CAMERA = True
+except Exception:
+    VmdCameraLoader = None
+    _HAS_CAMERA = False
+
+class _KeyTableModel(QtCore.QAbstractTableModel):
+    # キーの表。文字列は見えている行を描くときに data() で初めて作る
+    def __init__(self, headers, aligns, parent=None):
+        super().__init__(parent)
+        self._headers = headers
+        self._aligns = [int(a) for a in aligns]
+        self._rows = 0
+        self._text = None
+
+    def set_rows(self, rows: int, text):
+        # text(row, column) -> str
+        self.beginResetModel()
+        self._rows = rows
+        self._text = text
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows(0, None)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            return self._text(index.row(), index.column())
+        if role == QtCore.Qt.TextAlignmentRole:
+            return self._aligns[index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self._headers[section]
+        return None
+
+
+class _TrackListModel(QtCore.QAbstractListModel):
+    # bone_order / morph_order の名前とキー数。表示文字列から名前を取り直さずに NameRole で引く
+    NameRole = QtCore.Qt.UserRole + 1
+    CountRole = QtCore.Qt.UserRole + 2
+    OrderRole = QtCore.Qt.UserRole + 3
+    PresentRole = QtCore.Qt.UserRole + 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+        self._counts = []
+        self._present = None
+
+    def set_tracks(self, order, counts):
+        self.beginResetModel()
+        self._names = list(order)
+        self._counts = [int(counts.get(n, 0)) for n in self._names]
+        self.endResetModel()
+
+    def set_present(self, names):
+        # スケルトン (メッシュ) にある名前の集合。None なら不明として全部あることにする
+        self._present = None if names is None else set(names)
+        if self._names:
+            self.dataChanged.emit(self.index(0), self.index(len(self._names) - 1))
+
+    def is_present(self, row: int) -> bool:
+        return self._present is None or self._names[row] in self._present
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r = index.row()
+        if role == QtCore.Qt.DisplayRole:
+            return f"{self._names[r]} [{self._counts[r]}]"
+        if role == self.NameRole:
+            return self._names[r]
+        if role == self.CountRole:
+            return self._counts[r]
+        if role == self.OrderRole:
+            return r
+        if role == self.PresentRole:
+            return self.is_present(r)
+        if role == QtCore.Qt.ForegroundRole and not self.is_present(r):
+            return QtGui.QColor("#707070")
+        return None
+
+
+class _TrackFilterProxy(QtCore.QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._search = ""
+        self._present_only = False
+        self.setSortRole(_TrackListModel.OrderRole)
+
+    def set_search(self, text: str):
+        self._search = text.strip().casefold()
+        self.invalidateFilter()
+
+    def set_present_only(self, on: bool):
+        self._present_only = bool(on)
+        self.invalidateFilter()
+
+    def set_sort_by_count(self, on: bool):
+        if on:
+            self.setSortRole(_TrackListModel.CountRole)
+            self.sort(0, QtCore.Qt.DescendingOrder)
+        else:
+            self.setSortRole(_TrackListModel.OrderRole)
+            self.sort(0, QtCore.Qt.AscendingOrder)
+
+    def filterAcceptsRow(self, row, parent):
+        src = self.sourceModel()
+        if self._present_only and not src.is_present(row):
+            return False
+        if self._search:
+            return self._search in src.data(src.index(row), _TrackListModel.NameRole).casefold()
+        return True
+
+
+def _bone_key_text(vmd, name):
+    # (行数, text(row, column)) を返す。列が取れればタプルのリストは作らない
+    tracks = vmd["bones"]
+    cols = tracks.columns(name) if hasattr(tracks, "columns") else None
+    if cols is not None:
+        frame, pos, rot = cols["frame"], cols["pos"], cols["rot"]
+        rows = len(frame)
+    else:
+        keys = tracks.get(name, [])
+        frame = [k[0] for k in keys]
+        pos = [k[1] for k in keys]
+        rot = [k[2] for k in keys]
+        rows = len(keys)
+
+    def text(r, c):
+        if c == 0:
+            return f"{int(frame[r])}"
+        if c == 1:
+            p = pos[r]
+            return f"{float(p[0]):.4f}, {float(p[1]):.4f}, {float(p[2]):.4f}"
+        q = rot[r]
+        return f"{float(q[0]):.4f}, {float(q[1]):.4f}, {float(q[2]):.4f}, {float(q[3]):.4f}"
+    return rows, text
+
+
+def _morph_key_text(vmd, name):
+    tracks = vmd["morphs"]
+    cols = tracks.columns(name) if hasattr(tracks, "columns") else None
+    if cols is not None:
+        frame, weight = cols["frame"], cols["weight"]
+    else:
+        keys = tracks.get(name, [])
+        frame = [k[0] for k in keys]
+        weight = [k[1] for k in keys]
+
+    def text(r, c):
+        if c == 0:
+            return f"{int(frame[r])}"
+        return f"{float(weight[r]):.4f}"
+    return len(frame), text
+
+
+class _ParseSignals(QtCore.QObject):
+    # 先頭の引数はそのワーカーの CancelToken。古いドロップの結果を見分けるのに使う
+    progress = QtCore.Signal(object, int, int)
+    finished = QtCore.Signal(object, object, object)
+    failed = QtCore.Signal(object, str)
+    cancelled = QtCore.Signal(object)
+
+
+class _ParseWorker(QtCore.QRunnable):
+    # VMD を開いて集計まで済ませる。UI には触らずシグナルで返す
+    def __init__(self, path: str, cancel: CancelToken, cache=None):
+        super().__init__()
+        # 終わるまでビュー側で参照を持つので、プールには消させない
+        self.setAutoDelete(False)
+        self.path = path
+        self.cancel = cancel
+        self.cache = cache
+        self.signals = _ParseSignals()
+
+    def run(self):
+        cancel = self.cancel
+        try:
+            with VmdTrace.session("VMD解析"):
+                vmd = VmdReader.open(self.path, progress=lambda c, t: self.signals.progress.emit(cancel, c, t),
+                                     cancel=cancel, cache=self.cache)
+        except VmdReadCancelled:
+            self.signals.cancelled.emit(cancel)
+            return
+        except Exception as e:
+            self.signals.failed.emit(cancel, str(e))
+            return
+        summary = {
+            "bone_keys": sum(vmd["bone_counts"].values()),
+            "morph_keys": sum(vmd["morph_counts"].values()),
+            "bone_tracks": len(vmd["bone_order"]),
+            "morph_tracks": len(vmd["morph_order"]),
+        }
+        if cancel.cancelled:
+            vmd.close()
+            self.signals.cancelled.emit(cancel)
+            return
+        self.signals.finished.emit(cancel, vmd, summary)
+
 
 class VmdViewer(QtWidgets.QWidget):
     def __init__(self):
@@ -33,6 +262,12 @@ class VmdViewer(QtWidgets.QWidget):
         self.vmd = None
         self.skeletal_mesh = None
         self.drag_hover = False
+        self._load_cancel = None
+        self._parse_cache = VmdParseCache()
+        self._batch_vmds = []
+        self._batch_meshes = []
+        self._batch_cancel = None
+        self._parse_workers = {}
 
         self._morph_target_names = set()
 
@@ -90,17 +325,27 @@ class VmdViewer(QtWidgets.QWidget):
             QLineEdit:focus {
                 border: 1px solid #569cd6;
             }
-            QTableWidget {
+            QDoubleSpinBox, QSpinBox, QComboBox {
+                background-color: #2d2d2d;
+                border: 1px solid #404040;
+                border-radius: 3px;
+                padding: 4px 6px;
+                color: #d4d4d4;
+            }
+            QDoubleSpinBox:focus, QSpinBox:focus, QComboBox:focus {
+                border: 1px solid #569cd6;
+            }
+            QTableView {
                 border: 1px solid #404040;
                 border-radius: 3px;
                 background-color: #1e1e1e;
                 gridline-color: #333333;
                 color: #d4d4d4;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 4px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #094771;
                 color: white;
             }
@@ -112,23 +357,23 @@ class VmdViewer(QtWidgets.QWidget):
                 border-bottom: 1px solid #404040;
                 font-weight: 600;
             }
-            QListWidget {
+            QListView {
                 border: 1px solid #404040;
                 border-radius: 3px;
                 background-color: #1e1e1e;
                 padding: 2px;
                 color: #d4d4d4;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 6px;
                 border-radius: 2px;
                 margin: 1px;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #094771;
                 color: white;
             }
-            QListWidget::item:hover:!selected {
+            QListView::item:hover:!selected {
                 background-color: #2a2a2a;
             }
             QTabWidget::pane {
@@ -185,13 +430,16 @@ class VmdViewer(QtWidgets.QWidget):
         self.tab_info = QtWidgets.QWidget()
         self.tab_bone = QtWidgets.QWidget()
         self.tab_morph = QtWidgets.QWidget()
+        self.tab_batch = QtWidgets.QWidget()
         self.tabs.addTab(self.tab_info, "情報")
         self.tabs.addTab(self.tab_bone, "ボーン")
         self.tabs.addTab(self.tab_morph, "モーフ")
+        self.tabs.addTab(self.tab_batch, "一括")
 
         self._build_info_tab()
         self._build_bone_tab()
         self._build_morph_tab()
+        self._build_batch_tab()
 
         self.progress = QtWidgets.QProgressBar()
         self.progress.setVisible(False)
@@ -210,11 +458,13 @@ class VmdViewer(QtWidgets.QWidget):
         self.lb_model = QtWidgets.QLabel("モデル名：")
         self.lb_bone_keys = QtWidgets.QLabel("ボーンキー数：")
         self.lb_morph_keys = QtWidgets.QLabel("モーフキー数：")
+        self.lb_camera_keys = QtWidgets.QLabel("カメラキー数：")
         
         vmd_layout.addWidget(self.lb_vmd_file)
         vmd_layout.addWidget(self.lb_model)
         vmd_layout.addWidget(self.lb_bone_keys)
         vmd_layout.addWidget(self.lb_morph_keys)
+        vmd_layout.addWidget(self.lb_camera_keys)
 
         self.grp_settings = QtWidgets.QGroupBox("インポートオプション")
         set_layout = QtWidgets.QVBoxLayout(self.grp_settings)
@@ -257,9 +507,67 @@ class VmdViewer(QtWidgets.QWidget):
         folder_container.addWidget(self.ed_folder, 1)
         folder_container.addWidget(self.btn_pick_folder)
 
+        reduce_container = QtWidgets.QHBoxLayout()
+        reduce_container.setSpacing(8)
+        self.chk_reduce = QtWidgets.QCheckBox("キー削減")
+        self.chk_reduce.setMinimumWidth(180)
+        self.chk_reduce.setChecked(False)
+        self.sp_pos_tol = QtWidgets.QDoubleSpinBox()
+        self.sp_pos_tol.setDecimals(3)
+        self.sp_pos_tol.setRange(0.0, 100.0)
+        self.sp_pos_tol.setSingleStep(0.01)
+        self.sp_pos_tol.setValue(0.01)
+        self.sp_pos_tol.setSuffix(" cm")
+        self.sp_angle_tol = QtWidgets.QDoubleSpinBox()
+        self.sp_angle_tol.setDecimals(3)
+        self.sp_angle_tol.setRange(0.0, 180.0)
+        self.sp_angle_tol.setSingleStep(0.01)
+        self.sp_angle_tol.setValue(0.05)
+        self.sp_angle_tol.setSuffix(" °")
+        self.sp_morph_tol = QtWidgets.QDoubleSpinBox()
+        self.sp_morph_tol.setDecimals(3)
+        self.sp_morph_tol.setRange(0.0, 1.0)
+        self.sp_morph_tol.setSingleStep(0.001)
+        self.sp_morph_tol.setValue(0.001)
+        reduce_container.addWidget(self.chk_reduce)
+        reduce_container.addWidget(QtWidgets.QLabel("位置"))
+        reduce_container.addWidget(self.sp_pos_tol, 1)
+        reduce_container.addWidget(QtWidgets.QLabel("角度"))
+        reduce_container.addWidget(self.sp_angle_tol, 1)
+        reduce_container.addWidget(QtWidgets.QLabel("モーフ"))
+        reduce_container.addWidget(self.sp_morph_tol, 1)
+
+        workers_container = QtWidgets.QHBoxLayout()
+        workers_container.setSpacing(8)
+        workers_label = QtWidgets.QLabel("ベイク並列数")
+        workers_label.setMinimumWidth(180)
+        self.sp_workers = QtWidgets.QSpinBox()
+        self.sp_workers.setRange(1, max(1, os.cpu_count() or 1))
+        self.sp_workers.setValue(min(4, max(1, os.cpu_count() or 1)))
+        workers_container.addWidget(workers_label)
+        workers_container.addWidget(self.sp_workers)
+        workers_container.addStretch(1)
+
+        cache_container = QtWidgets.QHBoxLayout()
+        cache_container.setSpacing(8)
+        self.chk_cache = QtWidgets.QCheckBox("ベイクキャッシュ")
+        self.chk_cache.setMinimumWidth(180)
+        self.chk_cache.setChecked(_HAS_BAKE_CACHE)
+        self.chk_cache.setEnabled(_HAS_BAKE_CACHE)
+        self.cmb_cache_precision = QtWidgets.QComboBox()
+        self.cmb_cache_precision.addItems(["float32", "float16", "int16"])
+        self.cmb_cache_precision.setEnabled(_HAS_BAKE_CACHE)
+        cache_container.addWidget(self.chk_cache)
+        cache_container.addWidget(QtWidgets.QLabel("精度"))
+        cache_container.addWidget(self.cmb_cache_precision)
+        cache_container.addStretch(1)
+
         set_layout.addLayout(mesh_container)
         set_layout.addLayout(skeleton_container)
         set_layout.addLayout(folder_container)
+        set_layout.addLayout(reduce_container)
+        set_layout.addLayout(workers_container)
+        set_layout.addLayout(cache_container)
 
         btn_row = QtWidgets.QHBoxLayout()
         btn_row.setSpacing(8)
@@ -267,6 +575,12 @@ class VmdViewer(QtWidgets.QWidget):
         self.btn_import.setEnabled(False)
         self.btn_import.clicked.connect(self._on_import_clicked)
         btn_row.addWidget(self.btn_import)
+        self.btn_import_camera = QtWidgets.QPushButton("カメラをインポート (Level Sequence)")
+        self.btn_import_camera.setEnabled(False)
+        self.btn_import_camera.clicked.connect(self._on_import_camera_clicked)
+        btn_row.addWidget(self.btn_import_camera)
+        self.lb_cache = QtWidgets.QLabel("")
+        btn_row.addWidget(self.lb_cache)
 
         layout.addWidget(self.grp_vmd)
         layout.addWidget(self.grp_settings)
@@ -278,12 +592,20 @@ class VmdViewer(QtWidgets.QWidget):
         layout.setContentsMargins(12, 12, 12, 12)
         layout.setSpacing(10)
 
-        self.lst_bone = QtWidgets.QListWidget()
-        self.lst_bone.currentRowChanged.connect(self._on_bone_selected)
-
-        self.tbl_bone = QtWidgets.QTableWidget(0, 3)
-        self.tbl_bone.setHorizontalHeaderLabels(["frame", "pos (x, y, z)", "rot (x, y, z, w)"])
+        pane_bone, self.lst_bone, self.mdl_bone_names, self.prx_bone_names = self._build_track_list(
+            "スケルトンにあるもののみ")
+        self.lst_bone.selectionModel().currentChanged.connect(self._on_bone_selected)
+
+        self.mdl_bone = _KeyTableModel(
+            ["frame", "pos (x, y, z)", "rot (x, y, z, w)"],
+            [QtCore.Qt.AlignCenter,
+             QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter,
+             QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter],
+            self)
+        self.tbl_bone = QtWidgets.QTableView()
+        self.tbl_bone.setModel(self.mdl_bone)
         self.tbl_bone.verticalHeader().setVisible(False)
+        self.tbl_bone.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
         self.tbl_bone.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tbl_bone.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.tbl_bone.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
@@ -295,13 +617,13 @@ class VmdViewer(QtWidgets.QWidget):
         
         self.tbl_bone.setAlternatingRowColors(True)
         self.tbl_bone.setStyleSheet(self.tbl_bone.styleSheet() + """
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #212121;
             }
         """)
 
         split = QtWidgets.QSplitter()
-        split.addWidget(self.lst_bone)
+        split.addWidget(pane_bone)
         split.addWidget(self.tbl_bone)
         split.setStretchFactor(0, 0)
         split.setStretchFactor(1, 1)
@@ -313,12 +635,15 @@ class VmdViewer(QtWidgets.QWidget):
         layout.setContentsMargins(12, 12, 12, 12)
         layout.setSpacing(10)
 
-        self.lst_morph = QtWidgets.QListWidget()
-        self.lst_morph.currentRowChanged.connect(self._on_morph_selected)
+        pane_morph, self.lst_morph, self.mdl_morph_names, self.prx_morph_names = self._build_track_list(
+            "メッシュにあるもののみ")
+        self.lst_morph.selectionModel().currentChanged.connect(self._on_morph_selected)
 
-        self.tbl_morph = QtWidgets.QTableWidget(0, 2)
-        self.tbl_morph.setHorizontalHeaderLabels(["frame", "value"])
+        self.mdl_morph = _KeyTableModel(["frame", "value"], [QtCore.Qt.AlignCenter, QtCore.Qt.AlignCenter], self)
+        self.tbl_morph = QtWidgets.QTableView()
+        self.tbl_morph.setModel(self.mdl_morph)
         self.tbl_morph.verticalHeader().setVisible(False)
+        self.tbl_morph.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
         self.tbl_morph.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tbl_morph.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.tbl_morph.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
@@ -329,25 +654,233 @@ class VmdViewer(QtWidgets.QWidget):
         
         self.tbl_morph.setAlternatingRowColors(True)
         self.tbl_morph.setStyleSheet(self.tbl_morph.styleSheet() + """
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #212121;
             }
         """)
 
         split = QtWidgets.QSplitter()
-        split.addWidget(self.lst_morph)
+        split.addWidget(pane_morph)
         split.addWidget(self.tbl_morph)
         split.setStretchFactor(0, 0)
         split.setStretchFactor(1, 1)
         split.setSizes([200, 500])
         layout.addWidget(split)
 
+    def _build_track_list(self, present_label: str):
+        # 検索欄 + 並び替え + 絞り込みの付いた名前リスト
+        model = _TrackListModel(self)
+        proxy = _TrackFilterProxy(self)
+        proxy.setSourceModel(model)
+
+        pane = QtWidgets.QWidget()
+        v = QtWidgets.QVBoxLayout(pane)
+        v.setContentsMargins(0, 0, 0, 0)
+        v.setSpacing(6)
+        ed_search = QtWidgets.QLineEdit()
+        ed_search.setPlaceholderText("検索")
+        ed_search.setClearButtonEnabled(True)
+        ed_search.textChanged.connect(proxy.set_search)
+        row = QtWidgets.QHBoxLayout()
+        row.setSpacing(6)
+        cmb_sort = QtWidgets.QComboBox()
+        cmb_sort.addItems(["ファイル順", "キー数順"])
+        cmb_sort.currentIndexChanged.connect(lambda i: proxy.set_sort_by_count(i == 1))
+        chk_present = QtWidgets.QCheckBox(present_label)
+        chk_present.toggled.connect(proxy.set_present_only)
+        row.addWidget(cmb_sort)
+        row.addWidget(chk_present, 1)
+
+        view = QtWidgets.QListView()
+        view.setModel(proxy)
+        view.setUniformItemSizes(True)
+        view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        v.addWidget(ed_search)
+        v.addLayout(row)
+        v.addWidget(view, 1)
+        return pane, view, model, proxy
+
+    def _build_batch_tab(self):
+        layout = QtWidgets.QVBoxLayout(self.tab_batch)
+        layout.setContentsMargins(12, 12, 12, 12)
+        layout.setSpacing(10)
+
+        grp_vmd = QtWidgets.QGroupBox("VMD (ドロップでも追加)")
+        vmd_layout = QtWidgets.QVBoxLayout(grp_vmd)
+        vmd_layout.setContentsMargins(10, 10, 10, 10)
+        self.lst_batch_vmd = QtWidgets.QListWidget()
+        self.lst_batch_vmd.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        vmd_btns = QtWidgets.QHBoxLayout()
+        vmd_btns.setSpacing(8)
+        self.btn_batch_add_files = QtWidgets.QPushButton("ファイル追加")
+        self.btn_batch_add_files.clicked.connect(self._on_batch_add_files)
+        self.btn_batch_add_folder = QtWidgets.QPushButton("フォルダ追加")
+        self.btn_batch_add_folder.clicked.connect(self._on_batch_add_folder)
+        self.btn_batch_remove_vmd = QtWidgets.QPushButton("削除")
+        self.btn_batch_remove_vmd.clicked.connect(self._on_batch_remove_vmd)
+        vmd_btns.addWidget(self.btn_batch_add_files)
+        vmd_btns.addWidget(self.btn_batch_add_folder)
+        vmd_btns.addWidget(self.btn_batch_remove_vmd)
+        vmd_layout.addWidget(self.lst_batch_vmd, 1)
+        vmd_layout.addLayout(vmd_btns)
+
+        grp_mesh = QtWidgets.QGroupBox("スケルタルメッシュ")
+        mesh_layout = QtWidgets.QVBoxLayout(grp_mesh)
+        mesh_layout.setContentsMargins(10, 10, 10, 10)
+        self.lst_batch_mesh = QtWidgets.QListWidget()
+        self.lst_batch_mesh.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        mesh_btns = QtWidgets.QHBoxLayout()
+        mesh_btns.setSpacing(8)
+        self.btn_batch_add_mesh = QtWidgets.QPushButton("選択状態を追加")
+        self.btn_batch_add_mesh.clicked.connect(self._on_batch_add_mesh)
+        self.btn_batch_remove_mesh = QtWidgets.QPushButton("削除")
+        self.btn_batch_remove_mesh.clicked.connect(self._on_batch_remove_mesh)
+        mesh_btns.addWidget(self.btn_batch_add_mesh)
+        mesh_btns.addWidget(self.btn_batch_remove_mesh)
+        mesh_layout.addWidget(self.lst_batch_mesh, 1)
+        mesh_layout.addLayout(mesh_btns)
+
+        split = QtWidgets.QSplitter()
+        split.addWidget(grp_vmd)
+        split.addWidget(grp_mesh)
+        split.setSizes([350, 250])
+
+        btn_row = QtWidgets.QHBoxLayout()
+        btn_row.setSpacing(8)
+        self.btn_batch_run = QtWidgets.QPushButton("一括インポート")
+        self.btn_batch_run.setEnabled(False)
+        self.btn_batch_run.clicked.connect(self._on_batch_run)
+        self.lb_batch = QtWidgets.QLabel("")
+        btn_row.addWidget(self.btn_batch_run)
+        btn_row.addWidget(self.lb_batch, 1)
+
+        layout.addWidget(split, 1)
+        layout.addLayout(btn_row)
+
+    def _batch_add_paths(self, paths):
+        known = set(os.path.normcase(os.path.abspath(p)) for p in self._batch_vmds)
+        for p in VmdBatch.collect_vmd_files(paths) if VmdBatch is not None else []:
+            if not p.lower().endswith(".vmd"):
+                continue
+            key = os.path.normcase(os.path.abspath(p))
+            if key in known:
+                continue
+            known.add(key)
+            self._batch_vmds.append(os.path.normpath(p))
+            self.lst_batch_vmd.addItem(os.path.basename(p))
+        self._update_batch_state()
+
+    def _update_batch_state(self):
+        n = len(self._batch_vmds)
+        m = len(self._batch_meshes)
+        self.lb_batch.setText(f"VMD {n} × メッシュ {m} = {n * m} 件")
+        self.btn_batch_run.setEnabled(_HAS_BAKE_CACHE and n > 0 and m > 0 and self._batch_cancel is None)
+
+    def _on_batch_add_files(self):
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(self, "VMDファイルを追加", "", "VMD (*.vmd)")
+        self._batch_add_paths(paths)
+
+    def _on_batch_add_folder(self):
+        folder = QtWidgets.QFileDialog.getExistingDirectory(self, "VMDフォルダを追加")
+        if folder:
+            self._batch_add_paths([folder])
+
+    def _on_batch_remove_vmd(self):
+        rows = sorted((self.lst_batch_vmd.row(i) for i in self.lst_batch_vmd.selectedItems()), reverse=True)
+        for r in rows:
+            self.lst_batch_vmd.takeItem(r)
+            del self._batch_vmds[r]
+        self._update_batch_state()
+
+    def _on_batch_add_mesh(self):
+        if unreal is None:
+            print("Unreal環境ではありません。")
+            return
+        for a in unreal.EditorUtilityLibrary.get_selected_assets():
+            try:
+                if not isinstance(a, unreal.SkeletalMesh):
+                    continue
+            except Exception:
+                continue
+            if any(a == m for m in self._batch_meshes):
+                continue
+            self._batch_meshes.append(a)
+            try:
+                self.lst_batch_mesh.addItem(a.get_path_name())
+            except Exception:
+                self.lst_batch_mesh.addItem(str(a))
+        self._update_batch_state()
+
+    def _on_batch_remove_mesh(self):
+        rows = sorted((self.lst_batch_mesh.row(i) for i in self.lst_batch_mesh.selectedItems()), reverse=True)
+        for r in rows:
+            self.lst_batch_mesh.takeItem(r)
+            del self._batch_meshes[r]
+        self._update_batch_state()
+
+    def _on_batch_run(self):
+        if unreal is None:
+            print("Unreal環境ではありません。")
+            return
+        if not self._batch_vmds or not self._batch_meshes:
+            return
+        folder = self.ed_folder.text().strip() or "/Game"
+        pos_tol = None
+        angle_tol = None
+        morph_tol = None
+        if self.chk_reduce.isChecked():
+            pos_tol = self.sp_pos_tol.value()
+            angle_tol = self.sp_angle_tol.value()
+            morph_tol = self.sp_morph_tol.value()
+
+        vmds = list(self._batch_vmds)
+        row_of = {p: i for i, p in enumerate(vmds)}
+        per_vmd = {p: [0, 0] for p in vmds}
+        n_mesh = len(self._batch_meshes)
+
+        def on_progress(done, total, label):
+            self.progress.setValue(int(done * 100 / max(1, total)))
+            self.lb_batch.setText(f"{done}/{total} {label}")
+            QtWidgets.QApplication.processEvents()
+
+        def on_item(result):
+            ok_fail = per_vmd[result.vmd_path]
+            ok_fail[0 if result.error is None else 1] += 1
+            item = self.lst_batch_vmd.item(row_of[result.vmd_path])
+            state = f"{ok_fail[0]}/{n_mesh}"
+            if ok_fail[1]:
+                state += f" (失敗 {ok_fail[1]})"
+                print(f"失敗: {os.path.basename(result.vmd_path)}: {result.error}")
+            item.setText(f"{os.path.basename(result.vmd_path)}  [{state}]")
+
+        self._batch_cancel = CancelToken()
+        self._update_batch_state()
+        self.progress.setVisible(True)
+        self.progress.setValue(0)
+        for i, p in enumerate(vmds):
+            self.lst_batch_vmd.item(i).setText(os.path.basename(p))
+        try:
+            with VmdTrace.session("VMD一括インポート"):
+                results = VmdBatch.run_batch(
+                    vmds, self._batch_meshes, folder, 30, pos_tol, angle_tol, morph_tolerance=morph_tol,
+                    workers=self.sp_workers.value(), progress=on_progress, cancel=self._batch_cancel,
+                    parse_cache=self._parse_cache, item_done=on_item)
+        finally:
+            self._batch_cancel = None
+            self._update_batch_state()
+        ok = sum(1 for r in results if r.error is None)
+        print(f"一括インポート: {ok}/{len(results)} 件完了")
+        self.lb_batch.setText(f"{ok}/{len(results)} 件完了")
+        self.progress.setValue(100)
+        QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+
     def dragEnterEvent(self, event):
         md = event.mimeData()
         if md.hasUrls():
             for u in md.urls():
                 p = u.toLocalFile()
-                if p and p.lower().endswith(".vmd"):
+                if p and (p.lower().endswith(".vmd")
+                          or (self.tabs.currentWidget() is self.tab_batch and os.path.isdir(p))):
                     self.drag_hover = True
                     self.update()
                     event.acceptProposedAction()
@@ -384,78 +917,129 @@ class VmdViewer(QtWidgets.QWidget):
             event.ignore()
             return
 
+        if self.tabs.currentWidget() is self.tab_batch:
+            # 一括タブではキューに積むだけ (複数ファイルやフォルダも可)
+            self._batch_add_paths([u.toLocalFile() for u in md.urls() if u.toLocalFile()])
+            event.acceptProposedAction()
+            return
+
         for u in md.urls():
             p = u.toLocalFile()
             if p and p.lower().endswith(".vmd"):
+                if self._load_cancel is not None:
+                    self._load_cancel.cancel()
+                cancel = CancelToken()
+                self._load_cancel = cancel
+
                 self.vmd_path = os.path.normpath(p)
-                self.vmd = None
+                self._close_vmd()
 
                 self.progress.setVisible(True)
                 self.progress.setValue(0)
-                QtWidgets.QApplication.processEvents()
-                
-                try:
-                    self.progress.setValue(10)
-                    QtWidgets.QApplication.processEvents()
-                    
-                    self.vmd = VmdReader.read(self.vmd_path)
-                    
-                    self.progress.setValue(50)
-                    QtWidgets.QApplication.processEvents()
-                    
-                    bones = self.vmd["bones"]
-                    morphs = self.vmd["morphs"]
-
-                    bone_keys_total = sum(len(v) for v in bones.values())
-                    morph_keys_total = sum(len(v) for v in morphs.values())
-
-                    self.lb_vmd_file.setText(f"ファイル名: {os.path.basename(self.vmd_path)}")
-                    self.lb_model.setText(f"モデル名: {self.vmd.get('model', '-')}")
-                    self.lb_bone_keys.setText(f"ボーンキー: {bone_keys_total}")
-                    self.lb_morph_keys.setText(f"モーフキー: {morph_keys_total}")
-
-                    self.progress.setValue(70)
-                    QtWidgets.QApplication.processEvents()
-
-                    self.lst_bone.clear()
-                    for name in self.vmd["bone_order"]:
-                        count = len(bones[name])
-                        self.lst_bone.addItem(f"{name} [{count}]")
-
-                    self.lst_morph.clear()
-                    for name in self.vmd["morph_order"]:
-                        count = len(morphs[name])
-                        self.lst_morph.addItem(f"{name} [{count}]")
-
-                    self.progress.setValue(90)
-                    QtWidgets.QApplication.processEvents()
-
-                    if self.lst_bone.count() > 0:
-                        self.lst_bone.setCurrentRow(0)
-                    if self.lst_morph.count() > 0:
-                        self.lst_morph.setCurrentRow(0)
-
-                    self.progress.setValue(100)
-                    QtWidgets.QApplication.processEvents()
-                    
-                except Exception as e:
-                    self.vmd = None
-                    self.lb_vmd_file.setText(f"ファイル名: {os.path.basename(self.vmd_path)}")
-                    self.lb_model.setText("モデル名:")
-                    self.lb_bone_keys.setText("ボーンキー数:")
-                    self.lb_morph_keys.setText("モーフキー数:")
-                    self.lst_bone.clear()
-                    self.lst_morph.clear()
-                    self.tbl_bone.setRowCount(0)
-                    self.tbl_morph.setRowCount(0)
-                    print(f"解析失敗: {e}")
-                
-                QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+
+                # 解析はワーカースレッドで行い、終わったらシグナルでタブを埋める
+                worker = _ParseWorker(self.vmd_path, cancel, self._parse_cache)
+                worker.signals.progress.connect(self._on_read_progress)
+                worker.signals.finished.connect(self._on_parse_finished)
+                worker.signals.failed.connect(self._on_parse_failed)
+                worker.signals.cancelled.connect(self._on_parse_cancelled)
+                self._parse_workers[cancel] = worker
+                QtCore.QThreadPool.globalInstance().start(worker)
                 event.acceptProposedAction()
                 return
 
         event.ignore()
 
+    def _on_read_progress(self, cancel, consumed: int, total: int):
+        if cancel is not self._load_cancel:
+            return
+        self.progress.setValue(int(80 * consumed / max(1, total)))
+
+    def _on_parse_finished(self, cancel, vmd, summary):
+        self._parse_workers.pop(cancel, None)
+        if cancel is not self._load_cancel:
+            # 解析中に別のファイルがドロップされた
+            vmd.close()
+            return
+        self._load_cancel = None
+        self.vmd = vmd
+        if isinstance(self.vmd, CachedVmd):
+            print(f"解析キャッシュから開きました: {self.vmd.cache_path}")
+
+        bone_counts = self.vmd["bone_counts"]
+        morph_counts = self.vmd["morph_counts"]
+
+        self.lb_vmd_file.setText(f"ファイル名: {os.path.basename(self.vmd_path)}")
+        self.lb_model.setText(f"モデル名: {self.vmd.get('model', '-')}")
+        self.lb_bone_keys.setText(f"ボーンキー: {summary['bone_keys']}")
+        self.lb_morph_keys.setText(f"モーフキー: {summary['morph_keys']}")
+        camera_keys = self._camera_key_count()
+        self.lb_camera_keys.setText(f"カメラキー: {camera_keys}")
+        self.btn_import_camera.setEnabled(_HAS_CAMERA and camera_keys > 0)
+
+        self.mdl_bone_names.set_tracks(self.vmd["bone_order"], bone_counts)
+        self.mdl_morph_names.set_tracks(self.vmd["morph_order"], morph_counts)
+
+        self.progress.setValue(90)
+
+        for view in (self.lst_bone, self.lst_morph):
+            if view.model().rowCount() > 0:
+                view.setCurrentIndex(view.model().index(0, 0))
+
+        self.progress.setValue(100)
+        QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+
+    def _on_parse_failed(self, cancel, message: str):
+        self._parse_workers.pop(cancel, None)
+        if cancel is not self._load_cancel:
+            return
+        self._load_cancel = None
+        self._reset_vmd_info()
+        print(f"解析失敗: {message}")
+        QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+
+    def _on_parse_cancelled(self, cancel):
+        self._parse_workers.pop(cancel, None)
+        if cancel is not self._load_cancel:
+            return
+        self._load_cancel = None
+        self._reset_vmd_info()
+        print("解析中止")
+        QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+
+    def keyPressEvent(self, event):
+        if event.key() == QtCore.Qt.Key_Escape and self._load_cancel is not None:
+            self._load_cancel.cancel()
+            event.accept()
+            return
+        if event.key() == QtCore.Qt.Key_Escape and self._batch_cancel is not None:
+            self._batch_cancel.cancel()
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    def _reset_vmd_info(self):
+        self._close_vmd()
+        self.lb_vmd_file.setText(f"ファイル名: {os.path.basename(self.vmd_path)}")
+        self.lb_model.setText("モデル名:")
+        self.lb_bone_keys.setText("ボーンキー数:")
+        self.lb_morph_keys.setText("モーフキー数:")
+        self.lb_camera_keys.setText("カメラキー数:")
+        self.btn_import_camera.setEnabled(False)
+        self.lb_cache.setText("")
+        self.mdl_bone_names.set_tracks([], {})
+        self.mdl_morph_names.set_tracks([], {})
+        self.mdl_bone.clear()
+        self.mdl_morph.clear()
+
+    def _close_vmd(self):
+        if self.vmd is not None and hasattr(self.vmd, "close"):
+            try:
+                self.vmd.close()
+            except Exception:
+                pass
+        self.vmd = None
+
     def _on_pick_mesh(self):
         if unreal is None:
             print("Unreal環境ではありません。")
@@ -474,6 +1058,8 @@ class VmdViewer(QtWidgets.QWidget):
             self.ed_mesh.setText("")
             self.ed_skeleton.setText("")
             self.btn_import.setEnabled(False)
+            self.mdl_bone_names.set_present(None)
+            self.mdl_morph_names.set_present(None)
             return
         self.skeletal_mesh = mesh
         try:
@@ -498,11 +1084,9 @@ class VmdViewer(QtWidgets.QWidget):
                     self.ed_skeleton.setText("")
         else:
             self.ed_skeleton.setText("")
-        try:
-            names = mesh.get_all_morph_target_names()
-            self._morph_target_names = set(str(n) for n in names)
-        except Exception:
-            self._morph_target_names = set()
+        self._morph_target_names = VmdAsset.mesh_morph_target_names(mesh)
+        self.mdl_bone_names.set_present(VmdAsset.mesh_bone_names(mesh))
+        self.mdl_morph_names.set_present(self._morph_target_names)
         self.btn_import.setEnabled(self.vmd is not None)
 
     def _on_pick_folder(self):
@@ -542,148 +1126,227 @@ class VmdViewer(QtWidgets.QWidget):
         self.progress.setValue(0)
         QtWidgets.QApplication.processEvents()
 
-        base_name = os.path.splitext(os.path.basename(self.vmd_path))[0]
-        asset_name = f"{base_name}_Anim"
-        asset_path = f"{folder}/{asset_name}"
-        if unreal.EditorAssetLibrary.does_asset_exist(asset_path):
-            i = 1
-            while True:
-                asset_name = f"{base_name}_Anim_{i:02d}"
-                asset_path = f"{folder}/{asset_name}"
-                if not unreal.EditorAssetLibrary.does_asset_exist(asset_path):
-                    break
-                i += 1
+        # 段階ごとの時間を測ってログに出す (VMDLOADER_TRACE_DIR があればトレースも書き出す)
+        with VmdTrace.session("VMDインポート"):
+            self._import_vmd(folder, skeleton)
 
-        factory = unreal.AnimSequenceFactory()
-        try:
-            factory.target_skeleton = skeleton
-        except Exception:
-            try:
-                factory.set_editor_property("target_skeleton", skeleton)
-            except Exception:
-                pass
-        try:
-            factory.preview_skeletal_mesh = self.skeletal_mesh
-        except Exception:
-            try:
-                factory.set_editor_property("preview_skeletal_mesh", self.skeletal_mesh)
-            except Exception:
-                pass
-
-        anim_seq = unreal.AssetToolsHelpers.get_asset_tools().create_asset(
-            asset_name=asset_name,
-            package_path=folder,
-            asset_class=unreal.AnimSequence,
-            factory=factory,
-        )
+    def _import_vmd(self, folder: str, skeleton):
+        base_name = os.path.splitext(os.path.basename(self.vmd_path))[0]
+        with VmdTrace.span("create_asset"):
+            anim_seq = VmdAsset.create_anim_sequence(folder, base_name, skeleton, self.skeletal_mesh)
         if anim_seq is None:
             self.progress.setVisible(False)
             self.btn_import.setEnabled(True)
             return
 
-        try:
-            anim_seq.set_editor_property("interpolation", unreal.AnimInterpolationType.LINEAR)
-        except Exception:
-            pass
-
         fps = 30
         num_frames = _infer_total_frames(self.vmd)
+        pos_tol = None
+        angle_tol = None
+        morph_tol = None
+        if self.chk_reduce.isChecked():
+            pos_tol = self.sp_pos_tol.value()
+            angle_tol = self.sp_angle_tol.value()
+            morph_tol = self.sp_morph_tol.value()
+
+        baked = None
+        if _HAS_BAKE_CACHE and self.chk_cache.isChecked():
+            with VmdTrace.span("bake_cache"):
+                baked = self._bake_with_cache(fps, pos_tol, angle_tol, morph_tol)
+            if baked is not None:
+                num_frames = int(baked["meta"]["num_frames"])
+
         ctrl = anim_seq.get_editor_property("controller")
+        # 流し込みの間のエンジン呼び出しを数える
+        engine_calls = VmdEngine.RecordingBackend(VmdEngine.backend())
+        prev_backend = VmdEngine.set_backend(engine_calls)
         ctrl.open_bracket("VMDモーフ取り込み", False)
         try:
-            try:
-                ctrl.set_frame_rate(unreal.FrameRate(fps, 1), False)
-            except Exception:
-                pass
-            try:
-                ctrl.set_number_of_frames(unreal.FrameNumber(num_frames), False)
-            except Exception:
-                try:
-                    ctrl.set_number_of_frames(num_frames, False)
-                except Exception:
-                    pass
+            VmdAsset.set_frame_range(ctrl, fps, num_frames)
 
             bones = self.vmd.get("bones", {}) or {}
-            if bones:
+            if baked is not None:
+                # キャッシュ (かその場でベイクした結果) を流し込むだけ。参照ポーズの位置は足してある
+                names = VmdBoneLoader.resolve_bone_names(
+                    self.skeletal_mesh, [str(n) for n in baked["bone_names"]], report=False)
+                VmdBoneLoader.apply_baked_bones(ctrl, VmdBaked.iter_bone_tracks(baked), names=names)
+                self._print_bone_stats(baked["meta"]["stats"])
+                self.progress.setValue(50)
+                QtWidgets.QApplication.processEvents()
+            elif bones:
                 self.progress.setValue(10)
                 QtWidgets.QApplication.processEvents()
-                VmdBoneLoader.apply_bones(ctrl, bones, fps, num_frames, self.skeletal_mesh)
+                bone_stats = VmdBoneLoader.apply_bones(
+                    ctrl, bones, fps, num_frames, self.skeletal_mesh,
+                    pos_tolerance=pos_tol, angle_tolerance=angle_tol,
+                    workers=self.sp_workers.value())
+                if bone_stats:
+                    self._print_bone_stats(bone_stats)
+                lut = VmdBoneLoader.bezier_lut_cache().stats()
+                print(f"補間テーブル: {lut['entries']}件 (hit {lut['hits']} / miss {lut['misses']})")
 
                 self.progress.setValue(50)
                 QtWidgets.QApplication.processEvents()
 
             if not self._morph_target_names:
-                try:
-                    self._morph_target_names = set(str(n) for n in self.skeletal_mesh.get_all_morph_target_names())
-                except Exception:
-                    self._morph_target_names = set()
+                with VmdTrace.span("morph_targets"):
+                    self._morph_target_names = VmdAsset.mesh_morph_target_names(self.skeletal_mesh)
 
-            morphs = self.vmd["morphs"]
+            if baked is not None:
+                # ベイク時に間引き済み
+                VmdMorphLoader.apply_baked_morphs(
+                    ctrl, VmdBaked.iter_morph_curves(baked), skeleton, self._morph_target_names)
+            else:
+                morphs = self.vmd["morphs"]
 
-            VmdMorphLoader.apply_morphs(ctrl, morphs, skeleton, self._morph_target_names, fps)
+                morph_stats = VmdMorphLoader.apply_morphs(
+                    ctrl, morphs, skeleton, self._morph_target_names, fps, tolerance=morph_tol)
+                print(f"モーフカーブ: {morph_stats['curves']} (全部 0 で省略 {morph_stats['zero_curves']}) / "
+                      f"キー {morph_stats['keys_in']} → {morph_stats['keys_out']}")
 
         finally:
+            with VmdTrace.span("close_bracket"):
+                try:
+                    ctrl.close_bracket(False)
+                except Exception:
+                    pass
+            VmdEngine.set_backend(prev_backend)
+        print(engine_calls.summary())
+
+        with VmdTrace.span("save"):
             try:
-                ctrl.close_bracket(False)
+                unreal.EditorAssetLibrary.save_loaded_asset(anim_seq)
             except Exception:
                 pass
 
-        try:
-            unreal.EditorAssetLibrary.save_loaded_asset(anim_seq)
-        except Exception:
-            pass
-
         self.progress.setValue(100)
         QtWidgets.QApplication.processEvents()
         QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
         self.btn_import.setEnabled(True)
 
-    def _on_bone_selected(self, row: int):
-        self.tbl_bone.setRowCount(0)
-        if self.vmd is None or row < 0:
+    def _camera_key_count(self) -> int:
+        # 解析キャッシュから開いたときはカメラの位置を持っていないので、ファイルのセクションを数え直す
+        sections = getattr(self.vmd, "sections", None)
+        if sections is not None:
+            sec = sections.get(SECTION_CAMERA)
+            return sec.count if sec is not None else 0
+        try:
+            with VmdSections(self.vmd_path) as s:
+                return s.section(SECTION_CAMERA).count
+        except Exception:
+            return 0
+
+    def _on_import_camera_clicked(self):
+        if unreal is None:
+            print("Unreal環境ではありません。")
             return
-        item = self.lst_bone.item(row).text()
-        name = item.rsplit(" [", 1)[0]
-        keys = self.vmd["bones"].get(name, [])
-
-        self.tbl_bone.setRowCount(len(keys))
-        for i, key in enumerate(keys):
-            frame = key[0]
-            pos = key[1]
-            rot = key[2]
-            it0 = QtWidgets.QTableWidgetItem(f"{frame}")
-            it1 = QtWidgets.QTableWidgetItem(f"{pos[0]:.4f}, {pos[1]:.4f}, {pos[2]:.4f}")
-            it2 = QtWidgets.QTableWidgetItem(f"{rot[0]:.4f}, {rot[1]:.4f}, {rot[2]:.4f}, {rot[3]:.4f}")
-            
-            it0.setTextAlignment(QtCore.Qt.AlignCenter)
-            it1.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-            it2.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-            
-            self.tbl_bone.setItem(i, 0, it0)
-            self.tbl_bone.setItem(i, 1, it1)
-            self.tbl_bone.setItem(i, 2, it2)
+        if not self.vmd_path or not _HAS_CAMERA:
+            return
+        folder = self.ed_folder.text().strip() or "/Game"
+        pos_tol = None
+        angle_tol = None
+        if self.chk_reduce.isChecked():
+            pos_tol = self.sp_pos_tol.value()
+            angle_tol = self.sp_angle_tol.value()
+
+        self.btn_import_camera.setEnabled(False)
+        self.progress.setVisible(True)
+        self.progress.setValue(0)
+        QtWidgets.QApplication.processEvents()
+        try:
+            with VmdSections(self.vmd_path) as s:
+                keys = s.camera_keys()
+            baked = VmdCameraLoader.bake_camera(keys, 30, pos_tol, angle_tol)
+            if baked is None:
+                return
+            self.progress.setValue(30)
+            QtWidgets.QApplication.processEvents()
+            base_name = os.path.splitext(os.path.basename(self.vmd_path))[0]
+            with unreal.ScopedEditorTransaction("VMDカメラ取り込み"):
+                seq, written = VmdCameraLoader.create_camera_sequence(folder, base_name, baked)
+            if seq is None:
+                print("Level Sequence を作成できませんでした。")
+                return
+            VmdAsset.save_assets([seq])
+            st = baked["stats"]
+            print(f"カメラ: キー {st['source_keys']} → ベイク {st['baked_keys']} フレーム → "
+                  f"トランスフォーム {st['transform_keys']} / 焦点距離 {st['fov_keys']} / "
+                  f"カット {st.get('cuts', 0)} (add_key で 1 キーずつ書き込み {written})")
+            if st["orthographic_keys"]:
+                print(f"  パース無しのキーが {st['orthographic_keys']} 個ありますが、透視投影のまま取り込みました。")
+        except Exception as e:
+            print(f"カメラの取り込みに失敗しました: {e}")
+        finally:
+            self.progress.setValue(100)
+            QtCore.QTimer.singleShot(500, lambda: self.progress.setVisible(False))
+            self.btn_import_camera.setEnabled(True)
+
+    def _bake_with_cache(self, fps, pos_tol, angle_tol, morph_tol=None):
+        # 参照ポーズの位置まで含めてキーにし、ヒットすればベイクを丸ごと飛ばす
+        cache = VmdBakeCache.bake_cache()
+        cache.precision = self.cmb_cache_precision.currentText()
+        bone_names = list(self.vmd.get("bone_order") or (self.vmd.get("bones", {}) or {}).keys())
+        # メッシュに当たらないボーンはベイクしない。残すボーンの一式もキーに含める
+        names = VmdBoneLoader.resolve_bone_names(self.skeletal_mesh, bone_names)
+        if names is not None:
+            bone_names = [bn for bn in bone_names if bn in names]
+        ref_offsets = VmdBoneLoader.ref_pose_offsets(self.skeletal_mesh, bone_names)
+        options = {"pos_tolerance": pos_tol, "angle_tolerance": angle_tol, "morph_tolerance": morph_tol,
+                   "precision": cache.precision}
+        if names is not None:
+            options["bones"] = hashlib.sha1("\n".join(sorted(bone_names)).encode("utf-8")).hexdigest()
+        try:
+            if hasattr(self.vmd, "sha256"):
+                digest = self.vmd.sha256()
+            else:
+                digest = VmdBakeCache.hash_file(self.vmd_path)
+            key = VmdBakeCache.make_key(digest, ref_offsets, fps, options)
+        except Exception as e:
+            print(f"ベイクキャッシュのキーを作れませんでした: {e}")
+            return None
+
+        baked = cache.get(key)
+        hit = baked is not None
+        if not hit:
+            self.progress.setValue(10)
+            QtWidgets.QApplication.processEvents()
+            baked = VmdBaked.bake_motion(self.vmd, fps, pos_tol, angle_tol, workers=self.sp_workers.value(),
+                                         source=self.vmd_path, ref_offsets=ref_offsets,
+                                         bone_names=bone_names if names is not None else None,
+                                         morph_tolerance=morph_tol)
+            try:
+                cache.put(key, baked)
+            except Exception as e:
+                print(f"ベイクキャッシュに書き込めませんでした: {e}")
+        state = "ヒット" if hit else "ミス"
+        self.lb_cache.setText(f"キャッシュ: {state}")
+        st = cache.stats()
+        print(f"ベイクキャッシュ: {state} ({st['entries']}件, {st['bytes'] / (1024 * 1024):.1f} MB)")
+        return baked
+
+    def _print_bone_stats(self, bone_stats):
+        print(f"ボーントラック: 恒等 {bone_stats['identity']} (スキップ) / "
+              f"定数 {bone_stats['constant']} / アニメーション {bone_stats['animated']}")
+        if self.chk_reduce.isChecked():
+            print(f"ボーンキー: {bone_stats['keys_baked']} → 送信 {bone_stats['keys_sent']} "
+                  f"(1 キーに定数化 {bone_stats['collapsed_tracks']} トラック)")
+
+    def _on_bone_selected(self, index, previous=None):
+        if self.vmd is None or not index.isValid():
+            self.mdl_bone.clear()
+            return
+        name = index.data(_TrackListModel.NameRole)
+        self.mdl_bone.set_rows(*_bone_key_text(self.vmd, name))
 
         table_width = self.tbl_bone.viewport().width()
         self.tbl_bone.setColumnWidth(0, int(table_width * 0.15))
 
-    def _on_morph_selected(self, row: int):
-        self.tbl_morph.setRowCount(0)
-        if self.vmd is None or row < 0:
+    def _on_morph_selected(self, index, previous=None):
+        if self.vmd is None or not index.isValid():
+            self.mdl_morph.clear()
             return
-        item = self.lst_morph.item(row).text()
-        name = item.rsplit(" [", 1)[0]
-        keys = self.vmd["morphs"].get(name, [])
-
-        self.tbl_morph.setRowCount(len(keys))
-        for i, (frame, w) in enumerate(keys):
-            it0 = QtWidgets.QTableWidgetItem(f"{frame}")
-            it1 = QtWidgets.QTableWidgetItem(f"{float(w):.4f}")
-            
-            it0.setTextAlignment(QtCore.Qt.AlignCenter)
-            it1.setTextAlignment(QtCore.Qt.AlignCenter)
-            
-            self.tbl_morph.setItem(i, 0, it0)
-            self.tbl_morph.setItem(i, 1, it1)
+        name = index.data(_TrackListModel.NameRole)
+        self.mdl_morph.set_rows(*_morph_key_text(self.vmd, name))
 
         table_width = self.tbl_morph.viewport().width()
         self.tbl_morph.setColumnWidth(0, int(table_width * 0.15))
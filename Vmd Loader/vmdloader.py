@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+try:
+    _THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+except Exception:
+    _THIS_DIR = os.path.abspath(os.getcwd())
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+from VmdReader import VmdReader
+import VmdBaked
+from VmdBatch import collect_vmd_files
+
+# エディタ無しでベイクするコマンドライン
+#   python -m vmdloader bake in.vmd --fps 30 --out motion.npz
+#   python -m vmdloader bake motions/ --out baked/ --jobs 8
+# 出力は VmdBaked.apply_baked でエディタから一括で流し込める
+
+
+def _output_path(src: str, out, single: bool) -> str:
+    base = os.path.splitext(os.path.basename(src))[0] + ".npz"
+    if out is None:
+        return os.path.join(os.path.dirname(os.path.abspath(src)), base)
+    if single and out.lower().endswith(".npz"):
+        return out
+    return os.path.join(out, base)
+
+
+def _bake_one(src: str, dst: str, fps: float, pos_tolerance, angle_tolerance, workers: int,
+              morph_tolerance=None):
+    t0 = time.perf_counter()
+    vmd = VmdReader.open(src)
+    try:
+        baked = VmdBaked.bake_motion(vmd, fps, pos_tolerance, angle_tolerance, workers=workers, source=src,
+                                     morph_tolerance=morph_tolerance)
+    finally:
+        vmd.close()
+    VmdBaked.save_baked(dst, baked)
+    return len(baked["bone_names"]), len(baked["morph_names"]), baked["meta"]["num_frames"], time.perf_counter() - t0
+
+
+def _cmd_bake(args) -> int:
+    files = collect_vmd_files(args.inputs)
+    if not files:
+        print("VMDファイルがありません。", file=sys.stderr)
+        return 1
+    single = len(files) == 1
+    tasks = [(src, _output_path(src, args.out, single)) for src in files]
+    jobs = max(1, int(args.jobs))
+    pos_tol = args.pos_tolerance
+    angle_tol = args.angle_tolerance
+    morph_tol = args.morph_tolerance
+
+    failed = 0
+    if jobs > 1 and len(tasks) > 1:
+        # ファイル単位でプロセスに分ける (1 ファイル内のボーンは並列にしない)
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            futures = [(src, dst, ex.submit(_bake_one, src, dst, args.fps, pos_tol, angle_tol, 1, morph_tol))
+                       for src, dst in tasks]
+            for src, dst, fut in futures:
+                failed += _report(src, dst, fut.result, args.quiet)
+    else:
+        # 1 ファイルだけならボーン単位で並列にする
+        for src, dst in tasks:
+            failed += _report(src, dst, lambda: _bake_one(src, dst, args.fps, pos_tol, angle_tol, jobs, morph_tol),
+                              args.quiet)
+    return 1 if failed else 0
+
+
+def _report(src: str, dst: str, run, quiet: bool) -> int:
+    try:
+        bones, morphs, frames, sec = run()
+    except Exception as e:
+        print(f"失敗: {src}: {e}", file=sys.stderr)
+        return 1
+    if not quiet:
+        print(f"{src} -> {dst} (ボーン {bones} / モーフ {morphs} / {frames} フレーム, {sec:.2f}s)")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="vmdloader", description="VMD をエディタ無しでベイクする")
+    sub = parser.add_subparsers(dest="command")
+    bake = sub.add_parser("bake", help="VMD をベイクして .npz に書き出す")
+    bake.add_argument("inputs", nargs="+", help="VMD ファイルかフォルダ")
+    bake.add_argument("--fps", type=float, default=VmdBaked.MMD_FPS, help="出力のフレームレート (既定 30)")
+    bake.add_argument("--out", default=None, help="出力ファイル (.npz) かフォルダ。省略時は VMD と同じ場所")
+    bake.add_argument("--jobs", type=int, default=1, help="並列数")
+    bake.add_argument("--pos-tolerance", type=float, default=None, help="ボーントラックを 1 キーに定数化する位置の許容誤差 (cm)")
+    bake.add_argument("--angle-tolerance", type=float, default=None, help="ボーントラックを 1 キーに定数化する回転の許容誤差 (度)")
+    bake.add_argument("--morph-tolerance", type=float, default=None, help="モーフのキー削減の許容誤差 (値)")
+    bake.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    if args.command == "bake":
+        if args.fps <= 0:
+            parser.error("--fps は正の値にしてください")
+        return _cmd_bake(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())